@@ -0,0 +1,274 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Optional, Any, AsyncIterator, Callable, Iterable
+from passwordManager import PasswordManager, Session
+
+
+class AsyncPasswordManager:
+    def __init__(self, manager: PasswordManager, max_workers: Optional[int] = None,
+                 timeout: Optional[float] = None) -> None:
+        '''
+        Costruttore della classe AsyncPasswordManager.
+        Versione asyncio del gestore: ogni metodo esegue quello di PasswordManager su un pool di
+        thread limitato (query, KDF e Fernet non bloccano mai il ciclo di eventi). Con un pool grande
+        quanto quello delle connessioni, più `get_password` concorrenti procedono in parallelo,
+        ognuna sulla propria connessione.
+
+        Una chiamata annullata (o scaduta) prima di partire non viene eseguita; una già in corso
+        termina nel suo thread e il risultato viene scartato (una sessione aperta nel frattempo viene chiusa).
+
+        Parametri:
+        manager (PasswordManager) -> gestore condiviso
+        max_workers (int | None) -> thread del pool (default: dimensione del pool di connessioni,
+                                    altrimenti core disponibili, minimo 4)
+        timeout (float | None) -> secondi massimi per ogni chiamata (None per nessun limite);
+                                  allo scadere viene sollevato asyncio.TimeoutError
+        '''
+        self.manager = manager
+        self.timeout = timeout
+        self.max_workers = max_workers or getattr(manager.db, "pool_size", None) or max(4, os.cpu_count() or 4)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="pm-async")
+        self.session: Optional[AsyncSession] = None
+        # Senza login si usa una sessione chiusa, che segnala "Devi prima effettuare il login!"
+        self._closed_session = AsyncSession(self, Session(manager, None, [], 0))
+
+    async def _call(self, fn: Callable, *args: Any, cleanup: Optional[Callable[[Any], None]] = None) -> Any:
+        '''
+        Esegue `fn(*args)` nel pool e ne attende il risultato rispettando timeout e annullamento.
+
+        Parametri:
+        fn -> funzione bloccante
+        *args -> argomenti posizionali per `fn`
+        cleanup -> funzione (risultato) chiamata se il risultato arriva dopo che il chiamante ha rinunciato
+
+        Valore di ritorno:
+        Any -> risultato di `fn`
+        '''
+        future = self._executor.submit(fn, *args)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            # Se non è ancora partita non parte più; altrimenti il risultato viene scartato
+            if not future.cancel() and cleanup is not None:
+                future.add_done_callback(lambda f: _discard(f, cleanup))
+            raise
+
+    async def register_user(self, username: str, master_password: str) -> bool:
+        '''Come `PasswordManager.register_user`.'''
+        return await self._call(self.manager.register_user, username, master_password)
+
+    async def open_session(self, username: str, master_password: str) -> Optional["AsyncSession"]:
+        '''
+        Come `PasswordManager.open_session`: la sessione restituita ha versioni awaitable
+        di tutti i metodi di `Session` e usa lo stesso pool di thread.
+
+        Valore di ritorno:
+        AsyncSession -> sessione dell'utente
+        None -> se le credenziali non sono valide o in caso di errore
+        '''
+        session = await self._call(self.manager.open_session, username, master_password, cleanup=Session.close)
+        return AsyncSession(self, session) if session is not None else None
+
+    async def login(self, username: str, master_password: str) -> Optional["AsyncSession"]:
+        '''
+        Come `open_session`, ma la nuova sessione diventa quella corrente (la precedente viene chiusa).
+        '''
+        session = await self.open_session(username, master_password)
+        if session is not None:
+            previous, self.session = self.session, session
+            if previous is not None:
+                previous.session.close()
+        return session
+
+    async def logout(self) -> None:
+        '''Chiude la sessione corrente.'''
+        session, self.session = self.session, None
+        if session is not None:
+            session.session.close()
+
+    async def close(self) -> None:
+        '''
+        Chiude la sessione corrente e il pool di thread; gestore e motore di persistenza restano aperti.
+        '''
+        await self.logout()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _current(self) -> "AsyncSession":
+        return self.session or self._closed_session
+
+    async def add_password(self, service: str, password: str) -> bool:
+        '''Come `Session.add_password`, sulla sessione corrente.'''
+        return await self._current().add_password(service, password)
+
+    async def upsert_password(self, service: str, password: str) -> bool:
+        '''Come `Session.upsert_password`, sulla sessione corrente.'''
+        return await self._current().upsert_password(service, password)
+
+    async def import_credentials(self, source, fmt: Optional[str] = None, on_duplicate: str = "skip",
+                                 batch_size: int = 1000,
+                                 progress: Optional[Callable[[dict[str, int]], None]] = None) -> dict[str, int]:
+        '''Come `Session.import_credentials`, sulla sessione corrente.'''
+        return await self._current().import_credentials(source, fmt, on_duplicate, batch_size, progress)
+
+    async def export_vault(self, path: str, passphrase: Optional[str] = None, incremental: bool = False,
+                           batch_size: int = 500) -> Optional[int]:
+        '''Come `Session.export_vault`, sulla sessione corrente.'''
+        return await self._current().export_vault(path, passphrase, incremental, batch_size)
+
+    async def import_vault(self, path: str, passphrase: Optional[str] = None, on_duplicate: str = "overwrite",
+                           batch_size: int = 1000) -> dict[str, int]:
+        '''Come `Session.import_vault`, sulla sessione corrente.'''
+        return await self._current().import_vault(path, passphrase, on_duplicate, batch_size)
+
+    async def get_password(self, service: str) -> Optional[str]:
+        '''Come `Session.get_password`, sulla sessione corrente.'''
+        return await self._current().get_password(service)
+
+    async def get_passwords(self, services: Iterable[str], chunk_size: int = 500,
+                            parallel_threshold: int = 64) -> dict[str, Optional[str]]:
+        '''Come `Session.get_passwords`, sulla sessione corrente.'''
+        return await self._current().get_passwords(services, chunk_size, parallel_threshold)
+
+    async def list_services(self) -> list[tuple[int, str]]:
+        '''Come `Session.list_services`, sulla sessione corrente.'''
+        return await self._current().list_services()
+
+    async def list_services_page(self, after: Optional[str] = None,
+                                 limit: int = 200) -> tuple[list[tuple[int, str]], Optional[str]]:
+        '''Come `Session.list_services_page`, sulla sessione corrente.'''
+        return await self._current().list_services_page(after, limit)
+
+    async def search_services(self, keyword: str) -> list[tuple[int, str]]:
+        '''Come `Session.search_services`, sulla sessione corrente.'''
+        return await self._current().search_services(keyword)
+
+    async def update_password(self, service: str, new_password: str) -> bool:
+        '''Come `Session.update_password`, sulla sessione corrente.'''
+        return await self._current().update_password(service, new_password)
+
+    async def delete_password(self, service: str) -> bool:
+        '''Come `Session.delete_password`, sulla sessione corrente.'''
+        return await self._current().delete_password(service)
+
+    async def rotate_key(self) -> Optional[int]:
+        '''Come `Session.rotate_key`, sulla sessione corrente.'''
+        return await self._current().rotate_key()
+
+    async def key_rotation_status(self) -> dict[str, Any]:
+        '''Come `Session.key_rotation_status`, sulla sessione corrente.'''
+        return await self._current().key_rotation_status()
+
+    async def change_master_password(self, old_password: str, new_password: str, batch_size: int = 2000) -> bool:
+        '''Come `Session.change_master_password`, sulla sessione corrente.'''
+        return await self._current().change_master_password(old_password, new_password, batch_size)
+
+
+class AsyncSession:
+    def __init__(self, owner: AsyncPasswordManager, session: Session) -> None:
+        '''
+        Costruttore della classe AsyncSession.
+        Versioni awaitable dei metodi di una `Session`, eseguite sul pool di AsyncPasswordManager.
+
+        Parametri:
+        owner (AsyncPasswordManager) -> gestore asincrono che ha aperto la sessione
+        session (Session) -> sessione sincrona
+        '''
+        self.owner = owner
+        self.session = session
+
+    @property
+    def user_id(self) -> Optional[int]:
+        return self.session.user_id
+
+    async def close(self) -> None:
+        '''Come `Session.close`; se è la sessione corrente del gestore, il gestore non ne ha più una.'''
+        if self.owner.session is self:
+            await self.owner.logout()
+        else:
+            self.session.close()
+
+    async def add_password(self, service: str, password: str) -> bool:
+        '''Come `Session.add_password`.'''
+        return await self.owner._call(self.session.add_password, service, password)
+
+    async def upsert_password(self, service: str, password: str) -> bool:
+        '''Come `Session.upsert_password`.'''
+        return await self.owner._call(self.session.upsert_password, service, password)
+
+    async def import_credentials(self, source, fmt: Optional[str] = None, on_duplicate: str = "skip",
+                                 batch_size: int = 1000,
+                                 progress: Optional[Callable[[dict[str, int]], None]] = None) -> dict[str, int]:
+        '''Come `Session.import_credentials`; `progress` viene chiamata dal thread del pool.'''
+        return await self.owner._call(self.session.import_credentials, source, fmt, on_duplicate, batch_size, progress)
+
+    async def export_vault(self, path: str, passphrase: Optional[str] = None, incremental: bool = False,
+                           batch_size: int = 500) -> Optional[int]:
+        '''Come `Session.export_vault`.'''
+        return await self.owner._call(self.session.export_vault, path, passphrase, incremental, batch_size)
+
+    async def import_vault(self, path: str, passphrase: Optional[str] = None, on_duplicate: str = "overwrite",
+                           batch_size: int = 1000) -> dict[str, int]:
+        '''Come `Session.import_vault`.'''
+        return await self.owner._call(self.session.import_vault, path, passphrase, on_duplicate, batch_size)
+
+    async def get_password(self, service: str) -> Optional[str]:
+        '''Come `Session.get_password`.'''
+        return await self.owner._call(self.session.get_password, service)
+
+    async def get_passwords(self, services: Iterable[str], chunk_size: int = 500,
+                            parallel_threshold: int = 64) -> dict[str, Optional[str]]:
+        '''Come `Session.get_passwords`.'''
+        return await self.owner._call(self.session.get_passwords, list(services), chunk_size, parallel_threshold)
+
+    async def list_services(self) -> list[tuple[int, str]]:
+        '''Come `Session.list_services`.'''
+        return await self.owner._call(self.session.list_services)
+
+    async def list_services_page(self, after: Optional[str] = None,
+                                 limit: int = 200) -> tuple[list[tuple[int, str]], Optional[str]]:
+        '''Come `Session.list_services_page`.'''
+        return await self.owner._call(self.session.list_services_page, after, limit)
+
+    async def iter_services(self, page_size: int = 500) -> AsyncIterator[list[tuple[int, str]]]:
+        '''
+        Generatore asincrono che restituisce tutti i servizi dell'utente una pagina alla volta
+        (vedi `Session.iter_services`).
+        '''
+        token = None
+        while True:
+            page, token = await self.list_services_page(token, page_size)
+            if page:
+                yield page
+            if token is None:
+                return
+
+    async def search_services(self, keyword: str) -> list[tuple[int, str]]:
+        '''Come `Session.search_services`.'''
+        return await self.owner._call(self.session.search_services, keyword)
+
+    async def update_password(self, service: str, new_password: str) -> bool:
+        '''Come `Session.update_password`.'''
+        return await self.owner._call(self.session.update_password, service, new_password)
+
+    async def delete_password(self, service: str) -> bool:
+        '''Come `Session.delete_password`.'''
+        return await self.owner._call(self.session.delete_password, service)
+
+    async def rotate_key(self) -> Optional[int]:
+        '''Come `Session.rotate_key`.'''
+        return await self.owner._call(self.session.rotate_key)
+
+    async def key_rotation_status(self) -> dict[str, Any]:
+        '''Come `Session.key_rotation_status`.'''
+        return await self.owner._call(self.session.key_rotation_status)
+
+    async def change_master_password(self, old_password: str, new_password: str, batch_size: int = 2000) -> bool:
+        '''Come `Session.change_master_password`.'''
+        return await self.owner._call(self.session.change_master_password, old_password, new_password, batch_size)
+
+
+def _discard(future: Future, cleanup: Callable[[Any], None]) -> None:
+    # Risultato arrivato quando nessuno lo aspettava più: libera le risorse che rappresenta
+    if not future.cancelled() and future.exception() is None and future.result() is not None:
+        cleanup(future.result())
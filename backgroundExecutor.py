@@ -0,0 +1,146 @@
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+
+class BackgroundExecutor:
+    def __init__(self, root, max_workers: int = 2, poll_interval: int = 15,
+                 on_busy_change: Optional[Callable[[bool], None]] = None) -> None:
+        '''
+        Costruttore della classe BackgroundExecutor.
+        Esegue le chiamate bloccanti (KDF, database) su un pool di thread e riporta
+        i risultati sul thread di Tk tramite `root.after`, senza congelare la finestra.
+
+        Parametri:
+        root -> finestra principale Tkinter/CustomTkinter
+        max_workers (int) -> numero di thread del pool
+        poll_interval (int) -> millisecondi tra due controlli dei risultati pronti
+        on_busy_change -> funzione (bool) chiamata sul thread di Tk quando lo stato "occupato" cambia
+        '''
+        self.root = root
+        self.poll_interval = poll_interval
+        self.on_busy_change = on_busy_change
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pm-gui")
+        self._results: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._generations: dict[str, int] = {}
+        self._futures: dict[str, Future] = {}
+        self._pending = 0
+        self._polling = False
+
+    @property
+    def busy(self) -> bool:
+        '''
+        True se almeno una richiesta è ancora in corso.
+        '''
+        return self._pending > 0
+
+    def submit(self, fn: Callable[..., Any], *args: Any, on_success: Optional[Callable[[Any], None]] = None,
+               on_error: Optional[Callable[[BaseException], None]] = None, key: Optional[str] = None) -> Future:
+        '''
+        Esegue `fn(*args)` in background.
+        Da chiamare solo dal thread di Tk.
+
+        Parametri:
+        fn -> funzione bloccante da eseguire
+        *args -> argomenti posizionali per `fn`
+        on_success -> funzione (risultato) chiamata sul thread di Tk al termine
+        on_error -> funzione (eccezione) chiamata sul thread di Tk in caso di errore
+        key (str | None) -> identificativo della richiesta: una nuova richiesta con la stessa chiave
+                            rende obsoleta la precedente, il cui risultato viene scartato
+
+        Valore di ritorno:
+        Future -> future della richiesta
+        '''
+        generation = None
+        if key is not None:
+            self.cancel(key)
+            with self._lock:
+                generation = self._generations.get(key, 0) + 1
+                self._generations[key] = generation
+
+        future = self._pool.submit(fn, *args)
+        if key is not None:
+            with self._lock:
+                self._futures[key] = future
+        self._set_pending(self._pending + 1)
+
+        def done(f: Future) -> None:
+            self._results.put((f, key, generation, on_success, on_error))
+
+        future.add_done_callback(done)
+        self._schedule_poll()
+        return future
+
+    def cancel(self, key: str) -> None:
+        '''
+        Rende obsoleta la richiesta associata a `key`; se non è ancora partita non verrà eseguita.
+
+        Parametri:
+        key (str) -> identificativo della richiesta
+        '''
+        with self._lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            future = self._futures.pop(key, None)
+        if future is not None:
+            future.cancel()
+
+    def cancel_all(self) -> None:
+        '''
+        Rende obsolete tutte le richieste con chiave ancora in corso.
+        '''
+        with self._lock:
+            keys = list(self._futures)
+        for key in keys:
+            self.cancel(key)
+
+    def _is_stale(self, key: Optional[str], generation: Optional[int]) -> bool:
+        if key is None:
+            return False
+        with self._lock:
+            stale = self._generations.get(key) != generation
+            if not stale:
+                self._futures.pop(key, None)
+            return stale
+
+    def _schedule_poll(self) -> None:
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_interval, self._poll)
+
+    def _poll(self) -> None:
+        '''
+        Consegna sul thread di Tk i risultati pronti e si riprogramma finché ci sono richieste in corso.
+        '''
+        self._polling = False
+        while True:
+            try:
+                future, key, generation, on_success, on_error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._set_pending(self._pending - 1)
+            if future.cancelled() or self._is_stale(key, generation):
+                continue
+            error = future.exception()
+            if error is not None:
+                if on_error is not None:
+                    on_error(error)
+                else:
+                    print(f"Errore in background: {error}")
+            elif on_success is not None:
+                on_success(future.result())
+        if self._pending > 0:
+            self._schedule_poll()
+
+    def _set_pending(self, value: int) -> None:
+        was_busy = self._pending > 0
+        self._pending = value
+        if self.on_busy_change is not None and was_busy != (value > 0):
+            self.on_busy_change(value > 0)
+
+    def shutdown(self) -> None:
+        '''
+        Annulla le richieste in attesa e chiude il pool di thread.
+        '''
+        self._pool.shutdown(wait=False, cancel_futures=True)
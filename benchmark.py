@@ -0,0 +1,226 @@
+# ---------------- BENCHMARK ----------------
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from typing import Callable, Optional
+from storage import SQLiteStorage
+from passwordManager import PasswordManager
+from security import SecurityUtils
+
+OPERATIONS = ("register_user", "login", "add_password", "get_password", "list_services",
+              "list_services_page", "search_services", "update_password", "delete_password")
+DEFAULT_SIZES = (10, 1_000, 100_000, 1_000_000)
+
+
+def percentile(samples: list[float], q: float) -> float:
+    '''
+    Percentile di una serie di misure (interpolazione lineare tra i due valori più vicini).
+
+    Parametri:
+    samples (list[float]) -> misure, non necessariamente ordinate
+    q (float) -> percentile tra 0 e 100
+
+    Valore di ritorno:
+    float -> valore del percentile (0.0 se non ci sono misure)
+    '''
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    position = (len(ordered) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def summarize(samples: list[float]) -> dict[str, float]:
+    '''
+    Riassume una serie di durate in secondi.
+
+    Parametri:
+    samples (list[float]) -> durate in secondi
+
+    Valore di ritorno:
+    dict[str, float] -> n, mean_ms, p50_ms, p95_ms, p99_ms, max_ms e ops_per_s
+    '''
+    total = sum(samples)
+    return {
+        "n": len(samples),
+        "mean_ms": round(total * 1000 / len(samples), 4) if samples else 0.0,
+        "p50_ms": round(percentile(samples, 50) * 1000, 4),
+        "p95_ms": round(percentile(samples, 95) * 1000, 4),
+        "p99_ms": round(percentile(samples, 99) * 1000, 4),
+        "max_ms": round(max(samples) * 1000, 4) if samples else 0.0,
+        "ops_per_s": round(len(samples) / total, 2) if total else 0.0,
+    }
+
+
+def _time(samples: list[float], fn: Callable, *args) -> None:
+    start = time.perf_counter()
+    fn(*args)
+    samples.append(time.perf_counter() - start)
+
+
+def bench_size(size: int, repeat: int, kdf_repeat: int, memory: bool, kdf_params: Optional[dict]) -> dict[str, dict]:
+    '''
+    Misura le operazioni del gestore su un vault di `size` credenziali, su un database nuovo.
+    Le stampe del gestore vengono soppresse durante le misure.
+
+    Parametri:
+    size (int) -> numero di credenziali nel vault
+    repeat (int) -> ripetizioni delle operazioni sul vault
+    kdf_repeat (int) -> ripetizioni di register_user e login (dominate dalla KDF)
+    memory (bool) -> True per usare SQLite in memoria invece di un file temporaneo
+    kdf_params (dict | None) -> parametri KDF (default SecurityUtils.DEFAULT_KDF_PARAMS)
+
+    Valore di ritorno:
+    dict[str, dict] -> riepilogo (vedi `summarize`) per operazione
+    '''
+    rng = random.Random(size)
+    samples: dict[str, list[float]] = {operation: [] for operation in OPERATIONS}
+    with tempfile.TemporaryDirectory() as directory:
+        db = SQLiteStorage(":memory:" if memory else os.path.join(directory, "benchmark.db"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            db.open()
+            pm = PasswordManager(db, kdf_params)
+            try:
+                for i in range(kdf_repeat):
+                    _time(samples["register_user"], pm.register_user, f"bench-user-{i}", "bench-password")
+                for _ in range(kdf_repeat):
+                    _time(samples["login"], pm.login, "bench-user-0", "bench-password")
+
+                names = [f"service-{i:07d}.example.com" for i in range(size)]
+                pm.import_credentials(((name, f"password-{i}") for i, name in enumerate(names)), batch_size=5000)
+                # L'indice di ricerca viene ricostruito in background dopo l'import: si attende
+                # quella ricostruzione, non solo un indice qualsiasi (quello del login è già pronto)
+                pm.wait_index(60)
+
+                added = [f"zz-bench-{i:05d}" for i in range(repeat)]
+                for name in added:
+                    _time(samples["add_password"], pm.add_password, name, "added-password")
+                for _ in range(repeat):
+                    _time(samples["get_password"], pm.get_password, rng.choice(names))
+                for _ in range(max(1, min(repeat, 2_000_000 // max(size, 1)))):
+                    _time(samples["list_services"], pm.list_services)
+                for _ in range(repeat):
+                    _time(samples["list_services_page"], pm.list_services_page, None, 200)
+                for _ in range(repeat):
+                    name = rng.choice(names)
+                    _time(samples["search_services"], pm.search_services, name[8:12])
+                for _ in range(repeat):
+                    _time(samples["update_password"], pm.update_password, rng.choice(names), "updated-password")
+                for name in added:
+                    _time(samples["delete_password"], pm.delete_password, name)
+            finally:
+                pm.logout()
+                db.close()
+    return {operation: summarize(values) for operation, values in samples.items()}
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    '''
+    Confronta i risultati con una baseline salvata, sulla mediana di ogni operazione.
+
+    Parametri:
+    results (dict) -> risultati correnti ({"results": {dimensione: {operazione: riepilogo}}})
+    baseline (dict) -> baseline nello stesso formato
+    threshold (float) -> rallentamento relativo tollerato (0.2 = +20%)
+
+    Valore di ritorno:
+    list[str] -> descrizione delle regressioni trovate
+    '''
+    regressions = []
+    for size, operations in results["results"].items():
+        for operation, current in operations.items():
+            previous = baseline.get("results", {}).get(size, {}).get(operation)
+            if not previous or not previous["p50_ms"]:
+                continue
+            ratio = current["p50_ms"] / previous["p50_ms"]
+            marker = ""
+            if ratio > 1 + threshold:
+                marker = "  << REGRESSIONE"
+                regressions.append(f"{operation} @ {size}: {previous['p50_ms']} -> {current['p50_ms']} ms")
+            print(f"  {operation:<20} {size:>9}  {previous['p50_ms']:>10.3f} -> {current['p50_ms']:>10.3f} ms"
+                  f"  ({ratio:.2f}x){marker}")
+    return regressions
+
+
+def main() -> int:
+    '''
+    Esegue i micro-benchmark delle operazioni di PasswordManager su SQLite.
+
+    - Per ogni dimensione del vault crea un database nuovo e lo popola
+    - Misura le operazioni e stampa mediana e p95
+    - Salva i risultati come baseline JSON e/o li confronta con una baseline esistente
+
+    Valore di ritorno:
+    int -> codice di uscita del processo (1 se sono state trovate regressioni)
+    '''
+    parser = argparse.ArgumentParser(description="Micro-benchmark del Password Manager")
+    parser.add_argument("--sizes", type=lambda value: [int(size) for size in value.split(",")],
+                        default=list(DEFAULT_SIZES), help="dimensioni del vault (default: 10,1000,100000,1000000)")
+    parser.add_argument("--repeat", type=int, default=200, help="ripetizioni per operazione (default: 200)")
+    parser.add_argument("--kdf-repeat", type=int, default=5, help="ripetizioni di register_user e login (default: 5)")
+    parser.add_argument("--memory", action="store_true", help="usa SQLite in memoria invece di un file temporaneo")
+    parser.add_argument("--fast-kdf", action="store_true",
+                        help="usa i parametri KDF minimi (per misurare solo il resto del login)")
+    parser.add_argument("--save", metavar="PATH", help="salva i risultati come baseline JSON")
+    parser.add_argument("--compare", metavar="PATH", help="confronta i risultati con una baseline JSON")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="rallentamento relativo oltre cui segnalare una regressione (default: 0.2)")
+    args = parser.parse_args()
+
+    kdf_params = None
+    if args.fast_kdf:
+        kdf_params = {"time_cost": 1, "memory_cost": SecurityUtils.MIN_MEMORY_COST, "parallelism": 1,
+                      "iterations": SecurityUtils.MIN_ITERATIONS}
+
+    results = {
+        "meta": {
+            "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "engine": "sqlite-memory" if args.memory else "sqlite-file",
+            "kdf_params": kdf_params or SecurityUtils.DEFAULT_KDF_PARAMS,
+            "repeat": args.repeat,
+        },
+        "results": {},
+    }
+    for size in args.sizes:
+        print(f"Vault di {size} credenziali...", flush=True)
+        summary = bench_size(size, args.repeat, args.kdf_repeat, args.memory, kdf_params)
+        results["results"][str(size)] = summary
+        for operation, stats in summary.items():
+            print(f"  {operation:<20} p50 {stats['p50_ms']:>10.3f} ms   p95 {stats['p95_ms']:>10.3f} ms"
+                  f"   {stats['ops_per_s']:>10.1f} op/s")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline salvata in '{args.save}'")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"Confronto con '{args.compare}' (soglia +{args.threshold:.0%}):")
+        for key in ("engine", "kdf_params", "python"):
+            if baseline.get("meta", {}).get(key) != results["meta"][key]:
+                print(f"  Attenzione: la baseline è stata misurata con {key} diverso, il confronto non è omogeneo")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regressioni:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("Nessuna regressione")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,53 +1,398 @@
 import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional, Any, Iterator
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, errorcode
 from dotenv import load_dotenv
-from typing import Optional, Any
+from storage import StorageEngine, Transaction
+from queryStats import QueryStats
+
+
+class _PoolEntry:
+    '''
+    Connessione fisica gestita dal pool, con i tempi necessari per l'eviction.
+    '''
+    __slots__ = ("conn", "created_at", "last_used")
+
+    def __init__(self, conn) -> None:
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class ConnectionPool:
+    def __init__(self, factory, size: int = 5, idle_timeout: Optional[float] = 300.0,
+                 max_lifetime: Optional[float] = 3600.0, checkout_timeout: Optional[float] = 10.0,
+                 validate=None, validate_after: Optional[float] = 30.0) -> None:
+        '''
+        Costruttore della classe ConnectionPool.
+        Le connessioni vengono create su richiesta fino a `size` e riutilizzate.
+
+        Parametri:
+        factory -> funzione senza argomenti che apre una nuova connessione
+        size (int) -> numero massimo di connessioni aperte contemporaneamente
+        idle_timeout (float | None) -> secondi di inattività dopo cui una connessione viene chiusa
+        max_lifetime (float | None) -> secondi di vita massimi di una connessione
+        checkout_timeout (float | None) -> secondi di attesa massima per ottenere una connessione
+        validate -> funzione (conn) -> bool che verifica una connessione rimasta inattiva
+        validate_after (float | None) -> secondi di inattività oltre cui `validate` viene chiamata
+        '''
+        if size < 1:
+            raise ValueError("La dimensione del pool deve essere almeno 1")
+        self.factory = factory
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.checkout_timeout = checkout_timeout
+        self.validate = validate
+        self.validate_after = validate_after
+        self._idle: deque[_PoolEntry] = deque()
+        self._in_use: dict[int, _PoolEntry] = {}
+        self._opened = 0
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def _expired(self, entry: _PoolEntry, now: float) -> bool:
+        if self.max_lifetime is not None and now - entry.created_at > self.max_lifetime:
+            return True
+        if self.idle_timeout is not None and now - entry.last_used > self.idle_timeout:
+            return True
+        return False
+
+    @staticmethod
+    def _discard(entries: list[_PoolEntry]) -> None:
+        # Chiamato senza il lock: chiudere una connessione può attendere la rete
+        for entry in entries:
+            try:
+                entry.conn.close()
+            except Exception:
+                pass
+
+    def _evict_expired(self, now: float) -> list[_PoolEntry]:
+        # Chiamato con il lock acquisito: toglie dal pool le connessioni scadute e le restituisce
+        # da chiudere. Il prelievo e la restituzione avvengono a destra (LIFO), quindi a sinistra
+        # restano le connessioni inattive da più tempo
+        expired = [entry for entry in self._idle if self._expired(entry, now)]
+        for entry in expired:
+            self._idle.remove(entry)
+        self._opened -= len(expired)
+        return expired
+
+    def checkout(self):
+        '''
+        Preleva una connessione dal pool, aprendone una nuova se necessario.
+
+        Valore di ritorno:
+        connessione al database
+
+        Eccezioni:
+        TimeoutError -> se nessuna connessione si libera entro `checkout_timeout`
+        '''
+        deadline = None if self.checkout_timeout is None else time.monotonic() + self.checkout_timeout
+        expired: list[_PoolEntry] = []
+        try:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Il pool di connessioni è chiuso")
+                    now = time.monotonic()
+                    expired += self._evict_expired(now)
+                    if self._idle:
+                        entry = self._idle.pop()
+                        self._in_use[id(entry.conn)] = entry
+                        break
+                    if self._opened < self.size:
+                        # Riserva il posto e apre la connessione fuori dal lock
+                        self._opened += 1
+                        entry = None
+                        break
+                    remaining = None if deadline is None else deadline - now
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError("Nessuna connessione disponibile nel pool")
+                    self._cond.wait(remaining)
+        finally:
+            self._discard(expired)
+        if entry is None:
+            try:
+                entry = _PoolEntry(self.factory())
+            except Exception:
+                with self._cond:
+                    self._opened -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._in_use[id(entry.conn)] = entry
+            return entry.conn
+        # Health check pigro, fuori dal lock: solo per connessioni rimaste ferme a lungo
+        if (self.validate is not None and self.validate_after is not None
+                and time.monotonic() - entry.last_used > self.validate_after
+                and not self.validate(entry.conn)):
+            self.release(entry.conn, broken=True)
+            return self.checkout()
+        return entry.conn
+
+    def release(self, conn, broken: bool = False) -> None:
+        '''
+        Restituisce una connessione al pool.
+
+        Parametri:
+        conn -> connessione ottenuta con `checkout`
+        broken (bool) -> True se la connessione non è più utilizzabile e va chiusa
+        '''
+        with self._cond:
+            entry = self._in_use.pop(id(conn), None)
+            if entry is None:
+                return
+            now = time.monotonic()
+            entry.last_used = now
+            discard = broken or self._closed or self._expired(entry, now)
+            if discard:
+                self._opened -= 1
+            else:
+                self._idle.append(entry)
+            self._cond.notify()
+        if discard:
+            self._discard([entry])
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        '''
+        Context manager che preleva una connessione e la restituisce al termine.
+        Se durante l'uso la connessione risulta caduta, viene scartata.
+        '''
+        conn = self.checkout()
+        broken = False
+        try:
+            yield conn
+        except Error:
+            broken = not conn.is_connected()
+            raise
+        finally:
+            self.release(conn, broken)
+
+    def close(self) -> None:
+        '''
+        Chiude tutte le connessioni inattive e impedisce nuovi prelievi.
+        Le connessioni in uso vengono chiuse al momento della restituzione.
+        '''
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._opened -= len(idle)
+            self._cond.notify_all()
+        self._discard(idle)
+
+
+# Errori che indicano una connessione caduta (socket chiuso o server riavviato)
+_CONNECTION_LOST = {errorcode.CR_SERVER_GONE_ERROR, errorcode.CR_SERVER_LOST, errorcode.CR_SERVER_LOST_EXTENDED}
+# Errori per cui l'istruzione non ha sicuramente raggiunto il server: sicuri da ripetere anche in scrittura
+_NOT_SENT = {errorcode.CR_SERVER_GONE_ERROR}
+# Errori DDL di una modifica già presente: in MySQL le DDL non sono transazionali, quindi una
+# migrazione interrotta a metà viene ripresa saltando le istruzioni già eseguite
+_SCHEMA_EXISTS = {errorcode.ER_TABLE_EXISTS_ERROR, errorcode.ER_DUP_FIELDNAME, errorcode.ER_DUP_KEYNAME,
+                  errorcode.ER_CANT_DROP_FIELD_OR_KEY}
+
+
+class DatabaseConnection(StorageEngine):
+    dialect = "mysql"
+    timestamp_sql = "CURRENT_TIMESTAMP(6)"
+
+    def is_duplicate_error(self, error: Exception) -> bool:
+        return isinstance(error, Error) and error.errno == errorcode.ER_DUP_ENTRY
+
+    def is_schema_exists_error(self, error: Exception) -> bool:
+        return isinstance(error, Error) and error.errno in _SCHEMA_EXISTS
+
+    def upsert_query(self, table: str, columns: tuple[str, ...], keys: tuple[str, ...],
+                     updates: tuple[str, ...] = (), stamp: Optional[str] = None) -> str:
+        placeholders = ", ".join(["%s"] * len(columns))
+        if not updates:
+            # Assegnazione neutra: la riga esistente resta invariata
+            return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders}) "
+                    f"ON DUPLICATE KEY UPDATE {keys[0]} = {keys[0]}")
+        # Alias di riga (MySQL 8.0.19+) al posto della funzione VALUES(), deprecata da MySQL 8.0.20
+        assignments = [f"{column} = new.{column}" for column in updates]
+        if stamp:
+            assignments.append(f"{stamp} = {self.timestamp_sql}")
+        return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders}) AS new "
+                "ON DUPLICATE KEY UPDATE " + ", ".join(assignments))
 
-class DatabaseConnection:
     # Credenziali caricate da .env (non hardcoded)
-    def __init__(self, host: str = None, user: str = None, password: str = None, database: str = None) -> None:
+    def __init__(self, host: str = None, user: str = None, password: str = None, database: str = None,
+                 pool_size: int = None, idle_timeout: float = None, max_lifetime: float = None,
+                 health_check_after: float = None, max_retries: int = 3,
+                 backoff_base: float = 0.05, backoff_max: float = 2.0) -> None:
         '''
         Costruttore della classe DatabaseConnection.
-        Legge credenziali da variabili d'ambiente (.env).
-        
+        Legge credenziali e impostazioni del pool da variabili d'ambiente (.env).
+
         Parametri:
         host (str) -> indirizzo del server del database
         user (str) -> nome utente per la connessione
         password (str) -> password per la connessione
         database (str) -> nome del database da utilizzare
+        pool_size (int) -> numero massimo di connessioni nel pool (DB_POOL_SIZE, default 5)
+        idle_timeout (float) -> secondi di inattività prima di chiudere una connessione (DB_POOL_IDLE_TIMEOUT, default 300)
+        max_lifetime (float) -> secondi di vita massimi di una connessione (DB_POOL_MAX_LIFETIME, default 3600)
+        health_check_after (float) -> secondi di inattività oltre cui una connessione viene verificata con un ping
+                                      prima dell'uso (DB_HEALTH_CHECK_AFTER, default 30)
+        max_retries (int) -> tentativi di riconnessione quando una query fallisce su una connessione caduta
+        backoff_base (float) -> attesa iniziale in secondi tra i tentativi, raddoppiata a ogni tentativo
+        backoff_max (float) -> attesa massima in secondi tra due tentativi
         '''
         load_dotenv()
         self.host = host or os.getenv("DB_HOST")
         self.user = user or os.getenv("DB_USER")
         self.password = password or os.getenv("DB_PASSWORD")
         self.database = database or os.getenv("DB_NAME")
-        self.conn = None
-        self.cursor = None
+        self.pool_size = pool_size or int(os.getenv("DB_POOL_SIZE", "5"))
+        self.idle_timeout = idle_timeout if idle_timeout is not None else float(os.getenv("DB_POOL_IDLE_TIMEOUT", "300"))
+        self.max_lifetime = max_lifetime if max_lifetime is not None else float(os.getenv("DB_POOL_MAX_LIFETIME", "3600"))
+        self.health_check_after = (health_check_after if health_check_after is not None
+                                   else float(os.getenv("DB_HEALTH_CHECK_AFTER", "30")))
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.pool: Optional[ConnectionPool] = None
+        self.stats = {"pings": 0, "failed_pings": 0, "reconnects": 0, "failed_reconnects": 0}
+        self._stats_lock = threading.Lock()
+        self.query_stats = QueryStats.from_env()
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def _connect(self):
+        '''
+        Apre una nuova connessione fisica verso il server MySQL.
+        Le connessioni lavorano in autocommit: ogni istruzione di scrittura è già atomica
+        e una SELECT non lascia transazioni aperte sulla connessione restituita al pool.
+
+        Valore di ritorno:
+        connessione mysql.connector
+        '''
+        return mysql.connector.connect(
+            host=self.host,
+            user=self.user,
+            password=self.password,
+            database=self.database,
+            autocommit=True
+        )
+
+    def _ping(self, conn) -> bool:
+        '''
+        Verifica una connessione rimasta inattiva oltre `health_check_after`.
+
+        Parametri:
+        conn -> connessione da verificare
+
+        Valore di ritorno:
+        bool -> True se la connessione risponde, False altrimenti
+        '''
+        self._count("pings")
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Error:
+            self._count("failed_pings")
+            return False
 
     def open(self) -> None:
         '''
-        Apre la connessione al database.
+        Apre il pool di connessioni al database, verifica che il server sia raggiungibile
+        e applica le migrazioni mancanti.
 
         Valore di ritorno:
         None
         '''
+        pool = ConnectionPool(self._connect, self.pool_size, self.idle_timeout, self.max_lifetime,
+                              validate=self._ping, validate_after=self.health_check_after)
         try:
-            self.conn = mysql.connector.connect(
-                host=self.host,
-                user=self.user,
-                password=self.password,
-                database=self.database
-            )
-            if self.conn.is_connected():
-                self.cursor = self.conn.cursor()
+            # Apre subito la prima connessione per segnalare gli errori all'avvio
+            with pool.connection() as conn:
+                if conn.is_connected():
+                    self.pool = pool
+            if self.pool is not None:
+                self.ensure_schema()
                 print("Connection established successfully!")
         except Error as e:
+            pool.close()
+            self.pool = None
             print("Connection error:", e)
 
+    def is_open(self) -> bool:
+        '''
+        Controlla se il pool di connessioni è stato aperto.
+
+        Valore di ritorno:
+        bool -> True se il server ha risposto all'apertura
+        '''
+        return self.pool is not None
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        '''
+        Context manager che presta una connessione del pool al chiamante.
+
+        Valore di ritorno:
+        connessione mysql.connector, restituita al pool all'uscita dal blocco
+        '''
+        if self.pool is None:
+            raise Error("Connection is not active.")
+        with self.pool.connection() as conn:
+            yield conn
+
+    def _run(self, operation, retry_errors: set[int]):
+        '''
+        Esegue `operation(cursor)` su una connessione del pool senza ping preventivo.
+        Se la connessione risulta caduta (errno in `retry_errors`) viene scartata e
+        l'operazione ripetuta su una nuova connessione, con backoff esponenziale limitato.
+
+        Parametri:
+        operation -> funzione (cursor) -> risultato
+        retry_errors (set[int]) -> codici di errore per cui è sicuro ripetere l'operazione
+
+        Valore di ritorno:
+        risultato di `operation`
+        '''
+        if self.pool is None:
+            raise Error("Connection is not active.")
+        attempt = 0
+        while True:
+            try:
+                conn = self.pool.checkout()
+            except Error:
+                # Il server non accetta nuove connessioni: anche questo conta come tentativo
+                self._count("failed_reconnects")
+                if attempt >= self.max_retries:
+                    raise
+                conn = None
+            if conn is not None:
+                broken = False
+                try:
+                    cursor = conn.cursor()
+                    try:
+                        return operation(cursor)
+                    finally:
+                        cursor.close()
+                except Error as e:
+                    broken = e.errno in _CONNECTION_LOST
+                    if not broken or e.errno not in retry_errors or attempt >= self.max_retries:
+                        raise
+                finally:
+                    self.pool.release(conn, broken)
+            self._count("reconnects")
+            time.sleep(min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+            attempt += 1
+
     def execute_query(self, query: str, params: Optional[tuple[Any, ...]] = None) -> Optional[list[tuple[Any, ...]]]:
         '''
         Esegue una query SQL sul database.
+        Le letture vengono ripetute in modo trasparente se la connessione è caduta.
 
         Parametri:
         query (str) -> stringa contenente la query SQL
@@ -57,25 +402,107 @@ class DatabaseConnection:
         list[tuple[Any, ...]] -> risultati della query
         None -> se la connessione non è attiva o si verifica un errore
         '''
-        if self.conn is None or not self.conn.is_connected():
+        if self.pool is None:
             print("Connection is not active.")
             return None
+
+        def operation(cursor):
+            cursor.execute(query, params or ())
+            return cursor.fetchall()
+
         try:
-            self.cursor.execute(query, params or ())
-            return self.cursor.fetchall()
-        except Error as e:
+            # Il tempo misurato comprende eventuali riconnessioni: è la latenza vista dal chiamante
+            with self.query_stats.measure(query) as sample:
+                result = self._run(operation, _CONNECTION_LOST)
+                sample.rows = len(result)
+                return result
+        except (Error, TimeoutError) as e:
             print("Error while executing query:", e)
             return None
 
+    def execute_write(self, query: str, params: Optional[tuple[Any, ...]] = None) -> int:
+        '''
+        Esegue un'istruzione di scrittura (INSERT, UPDATE, DELETE) sul database.
+        A differenza di `execute_query` gli errori vengono propagati al chiamante.
+        L'istruzione viene ripetuta solo se non ha mai raggiunto il server.
+
+        Parametri:
+        query (str) -> stringa contenente l'istruzione SQL
+        params (tuple[Any, ...] | None) -> parametri opzionali per l'istruzione
+
+        Valore di ritorno:
+        int -> numero di righe modificate
+        '''
+        def operation(cursor):
+            cursor.execute(query, params or ())
+            return cursor.rowcount
+
+        with self.query_stats.measure(query) as sample:
+            sample.rows = self._run(operation, _NOT_SENT)
+            return sample.rows
+
+    def execute_insert(self, query: str, params: Optional[tuple[Any, ...]] = None) -> int:
+        '''
+        Esegue una INSERT sul database e restituisce l'id generato.
+        Gli errori vengono propagati al chiamante, come in `execute_write`.
+
+        Parametri:
+        query (str) -> stringa contenente l'istruzione SQL
+        params (tuple[Any, ...] | None) -> parametri opzionali per l'istruzione
+
+        Valore di ritorno:
+        int -> id AUTO_INCREMENT della riga inserita
+        '''
+        def operation(cursor):
+            cursor.execute(query, params or ())
+            return cursor.lastrowid
+
+        with self.query_stats.measure(query) as sample:
+            sample.rows = 1
+            return self._run(operation, _NOT_SENT)
+
+    @contextmanager
+    def transaction(self) -> Iterator[Transaction]:
+        '''
+        Context manager che apre una transazione su una connessione riservata del pool.
+        Le istruzioni vengono confermate all'uscita dal blocco, annullate in caso di errore.
+
+        Valore di ritorno:
+        Transaction -> oggetto per eseguire le istruzioni della transazione
+        '''
+        if self.pool is None:
+            raise Error("Connection is not active.")
+        conn = self.pool.checkout()
+        broken = False
+        try:
+            conn.start_transaction()
+            cursor = conn.cursor()
+            try:
+                yield Transaction(cursor, stats=self.query_stats)
+                conn.commit()
+            except BaseException:
+                try:
+                    conn.rollback()
+                except Error:
+                    # Connessione caduta: il server ha già annullato la transazione
+                    broken = True
+                raise
+            finally:
+                cursor.close()
+        except Error as e:
+            broken = broken or e.errno in _CONNECTION_LOST
+            raise
+        finally:
+            self.pool.release(conn, broken)
+
     def close(self) -> None:
         '''
-        Chiude la connessione al database.
+        Chiude tutte le connessioni del pool.
 
         Valore di ritorno:
         None
         '''
-        if self.cursor:
-            self.cursor.close()
-        if self.conn and self.conn.is_connected():
-            self.conn.close()
-            print("Connection closed.")
\ No newline at end of file
+        if self.pool:
+            self.pool.close()
+            self.pool = None
+            print("Connection closed.")
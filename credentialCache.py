@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class CredentialCache:
+    def __init__(self, ttl: float = 30.0, max_entries: int = 128) -> None:
+        '''
+        Costruttore della classe CredentialCache.
+        Cache in memoria delle password decifrate, con scadenza (TTL) ed eviction LRU.
+        I valori sono tenuti in bytearray e azzerati quando escono dalla cache.
+
+        Parametri:
+        ttl (float) -> secondi di validità di una voce
+        max_entries (int) -> numero massimo di voci; oltre questo limite si scarta la meno usata
+        '''
+        if max_entries < 1:
+            raise ValueError("La cache deve contenere almeno una voce")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[bytearray, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _wipe(value: bytearray) -> None:
+        for i in range(len(value)):
+            value[i] = 0
+
+    def get(self, key: str) -> Optional[str]:
+        '''
+        Restituisce il valore in cache, se presente e non scaduto.
+
+        Parametri:
+        key (str) -> chiave della voce (nome del servizio)
+
+        Valore di ritorno:
+        str -> password decifrata
+        None -> se la voce non è presente o è scaduta
+        '''
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] < time.monotonic():
+                del self._entries[key]
+                self._wipe(entry[0])
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0].decode()
+
+    def put(self, key: str, value: str) -> None:
+        '''
+        Inserisce o sostituisce una voce, scartando le meno usate se la cache è piena.
+
+        Parametri:
+        key (str) -> chiave della voce (nome del servizio)
+        value (str) -> password decifrata
+        '''
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._wipe(old[0])
+            self._entries[key] = (bytearray(value.encode()), time.monotonic() + self.ttl)
+            while len(self._entries) > self.max_entries:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._wipe(evicted)
+                self.evictions += 1
+
+    def invalidate(self, key: str) -> None:
+        '''
+        Rimuove e azzera una voce.
+
+        Parametri:
+        key (str) -> chiave della voce (nome del servizio)
+        '''
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._wipe(entry[0])
+
+    def clear(self) -> None:
+        '''
+        Rimuove e azzera tutte le voci.
+        '''
+        with self._lock:
+            for value, _ in self._entries.values():
+                self._wipe(value)
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        '''
+        Statistiche di utilizzo della cache.
+
+        Valore di ritorno:
+        dict[str, int] -> hits, misses, evictions e numero di voci presenti
+        '''
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": len(self._entries)}
@@ -0,0 +1,56 @@
+# ---------------- IMPORT ----------------
+import argparse
+import getpass
+import os
+import sys
+from storage import create_storage
+from passwordManager import PasswordManager
+
+
+def main() -> int:
+    '''
+    Importa in blocco le credenziali da un export CSV/JSON di un altro password manager.
+
+    - Apre la connessione al database
+    - Effettua il login dell'utente (la master password viene chiesta a terminale)
+    - Importa le credenziali mostrando l'avanzamento
+    - Chiude la connessione al database alla fine
+
+    Valore di ritorno:
+    int -> codice di uscita del processo (0 se l'import è riuscito, anche con un file vuoto)
+    '''
+    parser = argparse.ArgumentParser(description="Importa credenziali nel Password Manager")
+    parser.add_argument("path", help="file CSV o JSON esportato da un altro password manager")
+    parser.add_argument("-u", "--username", required=True, help="utente in cui importare le credenziali")
+    parser.add_argument("-f", "--format", choices=("csv", "json"), help="formato del file (default: dall'estensione)")
+    parser.add_argument("--on-duplicate", choices=("skip", "overwrite"), default="skip",
+                        help="cosa fare se un servizio esiste già (default: skip)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="righe per transazione (default: 1000)")
+    args = parser.parse_args()
+
+    # Formato controllato prima di chiedere la master password
+    fmt = (args.format or os.path.splitext(args.path)[1].lstrip(".")).lower()
+    if fmt not in ("csv", "json"):
+        print(f"Formato di import non supportato: '{fmt}' (usa un file .csv o .json, oppure --format)")
+        return 2
+
+    db = create_storage()
+    db.open()
+    try:
+        pm = PasswordManager(db)
+        if not pm.login(args.username, getpass.getpass("Master password: ")):
+            return 1
+
+        def progress(counters: dict[str, int]) -> None:
+            print(f"\r{counters['read']} lette, {counters['written']} importate, "
+                  f"{counters['skipped']} ignorate", end="", flush=True)
+
+        counters = pm.import_credentials(args.path, fmt, args.on_duplicate, args.batch_size, progress)
+        print()
+        return 1 if counters["errors"] else 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
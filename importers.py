@@ -0,0 +1,188 @@
+import csv
+import json
+import os
+from typing import Iterator, Optional
+from urllib.parse import urlparse
+
+# Colonne riconosciute negli export CSV dei password manager più diffusi
+# (Chrome/Edge, Firefox, Bitwarden, LastPass, 1Password, KeePass), in ordine di preferenza.
+SERVICE_COLUMNS = ("service", "name", "title", "account")
+URL_COLUMNS = ("url", "login_uri", "origin_url", "web site", "website")
+PASSWORD_COLUMNS = ("password", "login_password")
+
+
+def _host(url: str) -> str:
+    parsed = urlparse(url if "://" in url else f"https://{url}")
+    return parsed.hostname or url
+
+
+def _pick(row: dict, columns: tuple[str, ...]) -> Optional[str]:
+    for column in columns:
+        value = row.get(column)
+        if value:
+            return value.strip()
+    return None
+
+
+class _JsonReader:
+    # Lettore JSON incrementale: legge il file a blocchi e decodifica un valore alla volta con
+    # JSONDecoder.raw_decode, quindi in memoria resta solo la voce corrente e non l'intero export
+    _decoder = json.JSONDecoder()
+
+    def __init__(self, f, chunk_size: int = 1 << 16) -> None:
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        # Primo carattere significativo, "" a fine file
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self._fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f"JSON non valido: atteso '{char}'")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buffer, self.pos)
+                # Un numero alla fine del blocco potrebbe continuare nel successivo
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def array(self) -> Iterator:
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == "]":
+                self.pos += 1
+                return
+            self.expect(",")
+
+    def member_array(self, name: str) -> Iterator:
+        # Elementi della lista `name` di un oggetto, saltando gli altri membri
+        self.expect("{")
+        if self.peek() == "}":
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            if key == name and self.peek() == "[":
+                yield from self.array()
+                return
+            self.value()
+            if self.peek() == "}":
+                return
+            self.expect(",")
+
+
+def read_csv(path: str) -> Iterator[tuple[str, str]]:
+    '''
+    Legge un export CSV una riga alla volta.
+    Il servizio è preso dalla colonna nome/titolo oppure, se manca, dall'host dell'URL.
+
+    Parametri:
+    path (str) -> percorso del file CSV
+
+    Valore di ritorno:
+    Iterator[tuple[str, str]] -> coppie (servizio, password); le righe incomplete vengono saltate
+                                 e un file vuoto (senza intestazione) non ne restituisce nessuna
+    '''
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames is None:
+            return
+        reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+        if not any(column in reader.fieldnames for column in PASSWORD_COLUMNS):
+            raise ValueError("Colonna password non trovata nel file CSV")
+        for row in reader:
+            password = _pick(row, PASSWORD_COLUMNS)
+            service = _pick(row, SERVICE_COLUMNS)
+            if not service:
+                url = _pick(row, URL_COLUMNS)
+                service = _host(url) if url else None
+            if service and password:
+                yield service, password
+
+
+def read_json(path: str) -> Iterator[tuple[str, str]]:
+    '''
+    Legge un export JSON: formato Bitwarden ({"items": [...]}) oppure una lista di
+    oggetti con chiavi servizio/nome/titolo e password.
+    Le voci vengono decodificate una alla volta durante la lettura del file.
+
+    Parametri:
+    path (str) -> percorso del file JSON
+
+    Valore di ritorno:
+    Iterator[tuple[str, str]] -> coppie (servizio, password); le voci incomplete vengono saltate
+                                 e un file vuoto non ne restituisce nessuna
+    '''
+    with open(path, encoding="utf-8-sig") as f:
+        reader = _JsonReader(f)
+        first = reader.peek()
+        if not first:
+            return
+        if first == "[":
+            items = reader.array()
+        elif first == "{":
+            items = reader.member_array("items")
+        else:
+            raise ValueError("Il file JSON deve contenere una lista o un oggetto con 'items'")
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            login = item.get("login") if isinstance(item.get("login"), dict) else {}
+            lowered = {str(key).lower(): value for key, value in item.items() if isinstance(value, str)}
+            password = login.get("password") or _pick(lowered, PASSWORD_COLUMNS)
+            service = _pick(lowered, SERVICE_COLUMNS)
+            if not service:
+                uris = login.get("uris") or []
+                url = uris[0].get("uri") if uris and isinstance(uris[0], dict) else _pick(lowered, URL_COLUMNS)
+                service = _host(url) if url else None
+            if service and password:
+                yield service.strip(), password
+
+
+def read_credentials(path: str, fmt: Optional[str] = None) -> Iterator[tuple[str, str]]:
+    '''
+    Legge un export di credenziali, scegliendo il formato dall'estensione se non indicato.
+
+    Parametri:
+    path (str) -> percorso del file
+    fmt (str | None) -> "csv" oppure "json"
+
+    Valore di ritorno:
+    Iterator[tuple[str, str]] -> coppie (servizio, password)
+    '''
+    fmt = (fmt or os.path.splitext(path)[1].lstrip(".")).lower()
+    if fmt == "csv":
+        return read_csv(path)
+    if fmt == "json":
+        return read_json(path)
+    raise ValueError(f"Formato di import non supportato: {fmt}")
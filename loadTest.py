@@ -0,0 +1,247 @@
+# ---------------- LOAD TEST ----------------
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from typing import Optional
+from storage import SQLiteStorage, StorageEngine, create_storage
+from passwordManager import PasswordManager
+from security import SecurityUtils
+from benchmark import summarize
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+OPERATIONS = ("register", "login", "add", "get", "list", "search", "update", "delete")
+DEFAULT_MIX = "add=15,get=40,list=5,search=20,update=15,delete=5"
+
+
+def parse_mix(value: str) -> dict[str, int]:
+    '''
+    Legge il mix di operazioni, ad esempio "add=15,get=40,search=20".
+
+    Parametri:
+    value (str) -> coppie operazione=peso separate da virgole
+
+    Valore di ritorno:
+    dict[str, int] -> peso per operazione
+    '''
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in OPERATIONS[2:]:
+            raise argparse.ArgumentTypeError(f"Operazione sconosciuta nel mix: {name}")
+        mix[name.strip()] = int(weight or 1)
+    return mix
+
+
+def _peak_rss_mib() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux riporta KiB, macOS byte
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class _UserResult:
+    def __init__(self) -> None:
+        self.samples: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+
+    def record(self, operation: str, seconds: float, ok: bool) -> None:
+        self.samples.setdefault(operation, []).append(seconds)
+        if not ok:
+            self.errors[operation] = self.errors.get(operation, 0) + 1
+
+
+def simulate_user(pm: PasswordManager, username: str, mix: dict[str, int], operations: int, seed: int,
+                  barrier: threading.Barrier, result: _UserResult) -> None:
+    '''
+    Simula un utente: registrazione, login, popolamento iniziale del vault e una sequenza
+    casuale di operazioni secondo il mix. Tutti gli utenti condividono lo stesso PasswordManager
+    (e quindi motore di persistenza e pool di worker), ognuno con la propria sessione.
+
+    Parametri:
+    pm (PasswordManager) -> gestore condiviso
+    username (str) -> nome dell'utente simulato
+    mix (dict[str, int]) -> peso delle operazioni
+    operations (int) -> operazioni da eseguire dopo il login
+    seed (int) -> credenziali inserite prima delle misure
+    barrier (threading.Barrier) -> fa partire tutti gli utenti insieme
+    result (_UserResult) -> dove registrare durate ed errori
+    '''
+    rng = random.Random(username)
+    password = "load-test-password"
+
+    def timed(operation: str, fn, *args):
+        start = time.perf_counter()
+        try:
+            value = fn(*args)
+        except Exception:
+            value = None
+        result.record(operation, time.perf_counter() - start, value not in (None, False))
+        return value
+
+    barrier.wait()
+    timed("register", pm.register_user, username, password)
+    session = timed("login", pm.open_session, username, password)
+    if session is None:
+        return
+
+    services = [f"seed-{i:06d}.example.com" for i in range(seed)]
+    session.import_credentials((name, f"pw-{i}") for i, name in enumerate(services))
+    names, weights = list(mix), list(mix.values())
+    counter = 0
+    for _ in range(operations):
+        operation = rng.choices(names, weights)[0]
+        if operation in ("get", "update", "delete") and not services:
+            operation = "add"
+        if operation == "add":
+            counter += 1
+            service = f"added-{counter:06d}.example.com"
+            if timed("add", session.add_password, service, "added-password"):
+                services.append(service)
+        elif operation == "get":
+            timed("get", session.get_password, rng.choice(services))
+        elif operation == "list":
+            timed("list", session.list_services)
+        elif operation == "search":
+            service = rng.choice(services) if services else "example"
+            start = rng.randrange(max(1, len(service) - 4))
+            # La ricerca non fallisce mai: una lista vuota è un risultato valido
+            timed("search", lambda keyword: session.search_services(keyword) is not None, service[start:start + 4])
+        elif operation == "update":
+            timed("update", session.update_password, rng.choice(services), "updated-password")
+        elif operation == "delete":
+            service = services.pop(rng.randrange(len(services)))
+            timed("delete", session.delete_password, service)
+    session.close()
+
+
+def run_stage(db: StorageEngine, users: int, mix: dict[str, int], operations: int, seed: int,
+              kdf_params: Optional[dict], stage: int) -> dict:
+    '''
+    Esegue un livello di concorrenza: `users` utenti simulati in parallelo.
+
+    Parametri:
+    db (StorageEngine) -> motore condiviso
+    users (int) -> utenti concorrenti
+    mix (dict[str, int]) -> peso delle operazioni
+    operations (int) -> operazioni per utente
+    seed (int) -> credenziali iniziali per utente
+    kdf_params (dict | None) -> parametri KDF
+    stage (int) -> numero del livello, usato per rendere unici gli username
+
+    Valore di ritorno:
+    dict -> users, seconds, throughput (op/s), error_rate e riepilogo per operazione
+    '''
+    pm = PasswordManager(db, kdf_params)
+    barrier = threading.Barrier(users)
+    results = [_UserResult() for _ in range(users)]
+    threads = [
+        threading.Thread(target=simulate_user, name=f"load-user-{i}",
+                         args=(pm, f"load-{stage}-{i}-{os.getpid()}", mix, operations, seed, barrier, results[i]))
+        for i in range(users)
+    ]
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    pm.close()
+    elapsed = time.perf_counter() - start
+
+    samples: dict[str, list[float]] = {}
+    errors: dict[str, int] = {}
+    for result in results:
+        for operation, values in result.samples.items():
+            samples.setdefault(operation, []).extend(values)
+        for operation, count in result.errors.items():
+            errors[operation] = errors.get(operation, 0) + count
+    total = sum(len(values) for values in samples.values())
+    summary = {}
+    for operation in sorted(samples, key=OPERATIONS.index):
+        values = samples[operation]
+        summary[operation] = summarize(values)
+        summary[operation]["error_rate"] = round(errors.get(operation, 0) / len(values), 4)
+    return {
+        "users": users,
+        "seconds": round(elapsed, 3),
+        "throughput": round(total / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round(sum(errors.values()) / total, 4) if total else 0.0,
+        "peak_rss_mib": _peak_rss_mib(),
+        "operations": summary,
+    }
+
+
+def main() -> int:
+    '''
+    Generatore di carico: simula utenti concorrenti con livelli di concorrenza crescenti.
+
+    - Apre il database (SQLite in un file temporaneo, in memoria oppure il motore configurato)
+    - Per ogni livello avvia gli utenti simulati in parallelo
+    - Stampa throughput, latenze p50/p95/p99 ed errori per operazione
+
+    Valore di ritorno:
+    int -> codice di uscita del processo (1 se si sono verificati errori)
+    '''
+    parser = argparse.ArgumentParser(description="Test di carico del Password Manager")
+    parser.add_argument("--users", type=lambda value: [int(n) for n in value.split(",")], default=[1, 2, 4, 8, 16],
+                        help="livelli di concorrenza (default: 1,2,4,8,16)")
+    parser.add_argument("--operations", type=int, default=200, help="operazioni per utente (default: 200)")
+    parser.add_argument("--seed", type=int, default=100, help="credenziali iniziali per utente (default: 100)")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"pesi delle operazioni (default: {DEFAULT_MIX})")
+    parser.add_argument("--engine", choices=("sqlite", "memory", "configured"), default="sqlite",
+                        help="SQLite in un file temporaneo, in memoria, oppure il motore di DB_ENGINE (default: sqlite)")
+    parser.add_argument("--fast-kdf", action="store_true",
+                        help="usa i parametri KDF minimi (per misurare il resto del sistema)")
+    parser.add_argument("--output", metavar="PATH", help="salva i risultati in JSON")
+    args = parser.parse_args()
+
+    kdf_params = None
+    if args.fast_kdf:
+        kdf_params = {"time_cost": 1, "memory_cost": SecurityUtils.MIN_MEMORY_COST, "parallelism": 1,
+                      "iterations": SecurityUtils.MIN_ITERATIONS}
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.engine == "configured":
+            db = create_storage()
+        else:
+            db = SQLiteStorage(":memory:" if args.engine == "memory" else os.path.join(directory, "load.db"))
+        db.open()
+        stages = []
+        try:
+            for stage, users in enumerate(args.users):
+                print(f"{users} utenti concorrenti...", flush=True)
+                report = run_stage(db, users, args.mix, args.operations, args.seed, kdf_params, stage)
+                stages.append(report)
+                print(f"  {report['throughput']:.1f} op/s, errori {report['error_rate']:.2%}, "
+                      f"{report['seconds']} s, picco RSS {report['peak_rss_mib']} MiB")
+                for operation, stats in report["operations"].items():
+                    print(f"    {operation:<9} n={stats['n']:<6} p50 {stats['p50_ms']:>9.3f} ms  "
+                          f"p95 {stats['p95_ms']:>9.3f} ms  p99 {stats['p99_ms']:>9.3f} ms  "
+                          f"errori {stats['error_rate']:.2%}")
+        finally:
+            db.close()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"engine": args.engine, "mix": args.mix, "operations": args.operations,
+                       "seed": args.seed, "kdf_params": kdf_params or SecurityUtils.DEFAULT_KDF_PARAMS,
+                       "stages": stages}, f, indent=2)
+        print(f"Risultati salvati in '{args.output}'")
+    return 1 if any(stage["error_rate"] for stage in stages) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,26 +1,108 @@
 # ---------------- MAIN ----------------
-from connection import DatabaseConnection
+import time
+_STARTED = time.perf_counter()
+
+# Solo i moduli necessari a disegnare la finestra di login: crittografia, argon2 e driver
+# del database vengono importati in background da `open_backend`
+import argparse
+import os
+import sys
+from startupTimer import StartupTimer, check_import_budget
 from passwordManagerGUI import PasswordManagerGUI
-from passwordManager import PasswordManager
 import customtkinter as ctk
 
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Password Manager")
+    parser.add_argument("--profile", action="store_true",
+                        help="attiva la modalità profiling (come PM_PROFILE=1)")
+    parser.add_argument("--profile-trace", help="file JSON lines delle trace (PM_PROFILE_TRACE)")
+    parser.add_argument("--profile-cprofile", type=lambda value: value.split(","),
+                        help="azioni da profilare con cProfile, separate da virgole oppure '*' (PM_PROFILE_CPROFILE)")
+    parser.add_argument("--profile-tracemalloc", type=lambda value: value.split(","),
+                        help="azioni di cui misurare le allocazioni con tracemalloc (PM_PROFILE_TRACEMALLOC)")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="stampa i tempi delle fasi di avvio quando il gestore è pronto")
+    parser.add_argument("--recalibrate-kdf", action="store_true",
+                        help="con KDF_TARGET_MS, misura di nuovo la macchina invece di usare i parametri salvati")
+    parser.add_argument("--check-import-budget", type=float, metavar="MS",
+                        help="verifica che l'import di main resti entro MS millisecondi senza caricare "
+                             "crittografia e database, poi esce (codice 1 se il budget non è rispettato)")
+    return parser.parse_args()
+
+
+def open_backend(startup: StartupTimer, recalibrate: bool = False):
+    '''
+    Carica i moduli pesanti e prepara il gestore delle password.
+    Viene eseguita in background mentre la finestra di login è già visibile.
+
+    - Importa motore di persistenza, KDF e crittografia
+    - Apre la connessione al database (solleva RuntimeError se non riesce)
+    - Se KDF_TARGET_MS è impostata, usa i parametri KDF calibrati per questa macchina
+      (la calibrazione avviene solo la prima volta o su richiesta e viene salvata nel database)
+    - Inizializza il gestore delle password (cache delle password decifrate attiva se CACHE_TTL è impostata)
+
+    Parametri:
+    startup (StartupTimer) -> timer su cui registrare le fasi
+    recalibrate (bool) -> se True ricalibra i parametri KDF anche se già salvati
+
+    Valore di ritorno:
+    PasswordManager -> gestore pronto all'uso
+    '''
+    from storage import create_storage
+    from security import SecurityUtils
+    from passwordManager import PasswordManager
+    startup.mark("import backend")
+
+    db = create_storage()
+    db.open()
+    if not db.is_open():
+        # open() segnala l'errore solo a video: senza database il gestore non può partire
+        raise RuntimeError("connessione al database non riuscita")
+    startup.mark("database aperto")
+    try:
+        kdf_params = None
+        if os.getenv("KDF_TARGET_MS"):
+            kdf_params = SecurityUtils.host_kdf_params(
+                db,
+                float(os.getenv("KDF_TARGET_MS")),
+                int(os.getenv("KDF_MAX_MEMORY_KIB", "65536")),
+                recalibrate,
+            )
+        cache_ttl = float(os.getenv("CACHE_TTL")) if os.getenv("CACHE_TTL") else None
+        return PasswordManager(db, kdf_params, cache_ttl=cache_ttl)
+    except Exception:
+        db.close()
+        raise
+
+
 def main() -> None:
     '''
     Funzione principale del programma.
-    
-    - Apre la connessione al database
-    - Inizializza il gestore delle password
-    - Configura la finestra principale dell'interfaccia grafica
+
+    - Con --check-import-budget misura l'import di questo modulo e termina
+    - Con --profile (o PM_PROFILE=1) strumenta gestore, GUI, KDF e Fernet e scrive le trace delle azioni
+    - Configura la finestra principale e disegna subito il login
+    - Appena la finestra è visibile prepara il gestore in background (`open_backend`):
+      login e registrazione restano disabilitati finché non è pronto
     - Avvia il ciclo principale dell'applicazione
     - Chiude la connessione al database alla fine
-     
+
     Valore di ritorno:
     None
     '''
-    db = DatabaseConnection()
-    db.open()
-    pm = PasswordManager(db)
+    args = parse_args()
+    if args.check_import_budget is not None:
+        sys.exit(0 if check_import_budget(args.check_import_budget) else 1)
+
+    startup = StartupTimer(_STARTED)
+    startup.mark("import")
+    from profiler import Profiler
+    profiler = Profiler.from_env(args.profile, trace_path=args.profile_trace,
+                                 cprofile_actions=args.profile_cprofile,
+                                 tracemalloc_actions=args.profile_tracemalloc)
+    if profiler:
+        profiler.install()
 
     root = ctk.CTk()
     ctk.set_appearance_mode("dark")
@@ -29,10 +111,29 @@ def main() -> None:
     root.minsize(600, 400)
     root.maxsize(1200, 800)
 
-    app = PasswordManagerGUI(root, pm)
+    app = PasswordManagerGUI(root)
+    backend = {}
+
+    def ready(pm) -> None:
+        app.attach_manager(pm)
+        startup.mark("gestore pronto")
+        if args.startup_report:
+            startup.print_report()
+
+    def start_backend() -> None:
+        startup.mark("finestra di login")
+        backend["future"] = app.executor.submit(open_backend, startup, args.recalibrate_kdf, on_success=ready,
+                                                on_error=app.backend_failed)
+
+    root.after_idle(start_backend)
     root.mainloop()
-    db.close()
+    app.executor.shutdown()
+    future = backend.get("future")
+    if future is not None and not future.cancelled() and future.exception() is None:
+        future.result().db.close()
+    if profiler:
+        profiler.close()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
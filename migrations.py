@@ -0,0 +1,237 @@
+from typing import Optional
+
+# Migrazioni versionate dello schema: (versione, descrizione, istruzioni per dialetto).
+# Una migrazione già applicata non va mai modificata: le correzioni diventano una nuova versione.
+# Le istruzioni devono poter essere ripetute: una migrazione interrotta viene rieseguita da capo
+# e le DDL già applicate (tabella, colonna o indice esistente) vengono saltate.
+MIGRATIONS: list[tuple[int, str, dict[str, list[str]]]] = [
+    (1, "tabelle di base", {
+        "mysql": [
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                username VARCHAR(255) NOT NULL,
+                password VARCHAR(255) NOT NULL,
+                salt VARBINARY(16) NOT NULL
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS user_credentials (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                user_id INT NOT NULL,
+                service VARCHAR(255) NOT NULL,
+                password TEXT NOT NULL,
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+            )
+            """,
+        ],
+        "sqlite": [
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT NOT NULL,
+                password TEXT NOT NULL,
+                salt BLOB NOT NULL
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS user_credentials (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+                service TEXT NOT NULL,
+                password TEXT NOT NULL
+            )
+            """,
+        ],
+    }),
+    (2, "iterazioni PBKDF2 per utente", {
+        "mysql": ["ALTER TABLE users ADD COLUMN kdf_iterations INT NOT NULL DEFAULT 100000"],
+        "sqlite": ["ALTER TABLE users ADD COLUMN kdf_iterations INTEGER NOT NULL DEFAULT 100000"],
+    }),
+    (3, "indice per la paginazione keyset dei servizi", {
+        "mysql": ["CREATE INDEX idx_credentials_user_service ON user_credentials (user_id, service, id)"],
+        "sqlite": ["CREATE INDEX IF NOT EXISTS idx_credentials_user_service ON user_credentials (user_id, service, id)"],
+    }),
+    # Gli indici univoci sostituiscono i controlli SELECT-poi-INSERT e coprono anche la paginazione
+    # (l'id è incluso implicitamente in ogni indice secondario). Gli eventuali servizi duplicati
+    # lasciati dai controlli precedenti vengono rimossi prima, tenendo la riga più recente
+    (4, "indici univoci su username e (user_id, service)", {
+        "mysql": [
+            """
+            DELETE old FROM user_credentials AS old
+            JOIN user_credentials AS newer
+                ON newer.user_id = old.user_id AND newer.service = old.service AND newer.id > old.id
+            """,
+            "CREATE UNIQUE INDEX uq_users_username ON users (username)",
+            "CREATE UNIQUE INDEX uq_credentials_user_service ON user_credentials (user_id, service)",
+            "DROP INDEX idx_credentials_user_service ON user_credentials",
+        ],
+        "sqlite": [
+            """
+            DELETE FROM user_credentials
+            WHERE id NOT IN (SELECT MAX(id) FROM user_credentials GROUP BY user_id, service)
+            """,
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_users_username ON users (username)",
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_credentials_user_service ON user_credentials (user_id, service)",
+            "DROP INDEX IF EXISTS idx_credentials_user_service",
+        ],
+    }),
+    # updated_at è gestito dal database (ON UPDATE in MySQL, trigger in SQLite) così ogni percorso
+    # di scrittura è coperto. Le righe già presenti restano NULL in SQLite (e contano come modificate),
+    # mentre in MySQL ricevono il DEFAULT, cioè l'istante della migrazione: in entrambi i casi finiscono
+    # nel primo export, perché ogni snapshot è successivo alla migrazione
+    (5, "data di modifica delle credenziali e snapshot del vault", {
+        "mysql": [
+            """
+            ALTER TABLE user_credentials ADD COLUMN updated_at DATETIME(6) NULL
+                DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS vault_snapshots (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                user_id INT NOT NULL,
+                taken_at DATETIME(6) NOT NULL,
+                incremental BOOLEAN NOT NULL,
+                row_count INT NOT NULL,
+                INDEX idx_snapshots_user (user_id, taken_at),
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+            )
+            """,
+        ],
+        "sqlite": [
+            "ALTER TABLE user_credentials ADD COLUMN updated_at TEXT",
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_credentials_inserted AFTER INSERT ON user_credentials
+            BEGIN
+                UPDATE user_credentials SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE id = NEW.id;
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_credentials_updated AFTER UPDATE OF service, password ON user_credentials
+            BEGIN
+                UPDATE user_credentials SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE id = NEW.id;
+            END
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS vault_snapshots (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+                taken_at TEXT NOT NULL,
+                incremental INTEGER NOT NULL,
+                row_count INTEGER NOT NULL
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_snapshots_user ON vault_snapshots (user_id, taken_at)",
+        ],
+    }),
+    # Chiavi dati per utente, cifrate con la chiave derivata dalla master password (versione 0);
+    # ogni credenziale ricorda la versione della chiave che l'ha cifrata
+    (6, "chiavi dati versionate e rotazione", {
+        "mysql": [
+            "ALTER TABLE user_credentials ADD COLUMN key_version INT NOT NULL DEFAULT 0",
+            """
+            CREATE TABLE IF NOT EXISTS user_keys (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                user_id INT NOT NULL,
+                version INT NOT NULL,
+                wrapped_key VARCHAR(255) NOT NULL,
+                sweep_cursor VARCHAR(255) NULL,
+                swept_rows INT NOT NULL DEFAULT 0,
+                swept_at DATETIME(6) NULL,
+                UNIQUE KEY uq_user_keys_version (user_id, version),
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+            )
+            """,
+        ],
+        "sqlite": [
+            "ALTER TABLE user_credentials ADD COLUMN key_version INTEGER NOT NULL DEFAULT 0",
+            """
+            CREATE TABLE IF NOT EXISTS user_keys (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+                version INTEGER NOT NULL,
+                wrapped_key TEXT NOT NULL,
+                sweep_cursor TEXT,
+                swept_rows INTEGER NOT NULL DEFAULT 0,
+                swept_at TEXT
+            )
+            """,
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_user_keys_version ON user_keys (user_id, version)",
+        ],
+    }),
+    # Token Fernet in binario (byte di formato + token decodificato) invece che in base64:
+    # le righe esistenti vengono convertite in background, le nuove lasciano '' nella colonna testuale
+    (7, "password cifrate in formato binario", {
+        "mysql": ["ALTER TABLE user_credentials ADD COLUMN ciphertext VARBINARY(4096) NULL"],
+        "sqlite": ["ALTER TABLE user_credentials ADD COLUMN ciphertext BLOB"],
+    }),
+    # Impostazioni dell'installazione come coppie nome/valore (es. parametri KDF calibrati per host)
+    (8, "impostazioni", {
+        "mysql": ["CREATE TABLE IF NOT EXISTS settings (name VARCHAR(255) PRIMARY KEY, value TEXT NOT NULL)"],
+        "sqlite": ["CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT NOT NULL)"],
+    }),
+    # Le riscritture di manutenzione (rotazione delle chiavi, conversione in binario) cambiano il
+    # testo cifrato ma non la password: non devono far finire la riga nel successivo export
+    # incrementale. Le modifiche dell'utente impostano updated_at esplicitamente; il trigger SQLite
+    # resta solo per i cambi di nome, mentre in MySQL le riscritture assegnano `updated_at = updated_at`,
+    # che sospende ON UPDATE CURRENT_TIMESTAMP
+    (9, "updated_at solo per le modifiche delle credenziali", {
+        "mysql": [],
+        "sqlite": [
+            "DROP TRIGGER IF EXISTS trg_credentials_updated",
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_credentials_updated AFTER UPDATE OF service ON user_credentials
+            BEGIN
+                UPDATE user_credentials SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE id = NEW.id;
+            END
+            """,
+        ],
+    }),
+]
+
+
+def current_version(db) -> Optional[int]:
+    '''
+    Legge la versione dello schema applicata al database.
+
+    Parametri:
+    db (StorageEngine) -> motore di persistenza aperto
+
+    Valore di ritorno:
+    int -> versione attuale (0 se nessuna migrazione è stata applicata)
+    None -> se la versione non può essere letta
+    '''
+    db.execute_write("CREATE TABLE IF NOT EXISTS schema_version (version INT NOT NULL)")
+    result = db.execute_query("SELECT MAX(version) FROM schema_version")
+    if result is None:
+        return None
+    return result[0][0] or 0
+
+
+def migrate(db) -> int:
+    '''
+    Applica in ordine le migrazioni non ancora eseguite.
+
+    Parametri:
+    db (StorageEngine) -> motore di persistenza aperto
+
+    Valore di ritorno:
+    int -> versione dello schema dopo l'aggiornamento
+    '''
+    version = current_version(db)
+    if version is None:
+        raise RuntimeError("Impossibile leggere la versione dello schema")
+    for number, description, statements in MIGRATIONS:
+        if number <= version:
+            continue
+        for statement in statements[db.dialect]:
+            try:
+                db.execute_write(statement)
+            except Exception as e:
+                # Già eseguita da un tentativo precedente interrotto prima di registrare la versione
+                if not db.is_schema_exists_error(e):
+                    raise
+        db.execute_write("INSERT INTO schema_version (version) VALUES (%s)", (number,))
+        print(f"Migrazione {number} applicata: {description}")
+        version = number
+    return version
@@ -1,19 +1,62 @@
-from cryptography.fernet import Fernet
+import base64
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeoutError
+from cryptography.fernet import Fernet, MultiFernet, InvalidToken
 from security import SecurityUtils
-from typing import Optional, Any
+from credentialCache import CredentialCache
+from serviceIndex import ServiceIndex
+from importers import read_credentials
+from vaultArchive import write_archive, read_archive, VaultArchiveError
+from itertools import islice
+from typing import Optional, Any, Iterator, Iterable, Callable, Union
+
+# Versione del formato binario delle password cifrate (primo byte della colonna ciphertext)
+CIPHERTEXT_FORMAT = 1
+
 
 class PasswordManager:
-    def __init__(self, db_connection) -> None:
+    def __init__(self, db_connection, kdf_params: Optional[dict] = None,
+                 cache_ttl: Optional[float] = None, cache_size: int = 128) -> None:
         '''
         Costruttore della classe PasswordManager.
+        Il gestore contiene solo le risorse condivise (motore di persistenza, parametri KDF, pool di
+        worker) e può essere usato da più thread: ogni login restituisce una `Session`, e le sessioni
+        dello stesso utente condividono chiavi, cache e indice dei servizi. I metodi sulle credenziali
+        del gestore agiscono sulla sessione dell'ultimo login (`session`), per l'uso con un solo
+        utente come nella GUI.
 
         Parametri:
-        db_connection -> connessione al database
+        db_connection (StorageEngine) -> motore di persistenza (MySQL o SQLite)
+        kdf_params (dict | None) -> parametri KDF per i nuovi hash (vedi SecurityUtils.calibrate_kdf),
+                                    default SecurityUtils.DEFAULT_KDF_PARAMS
+        cache_ttl (float | None) -> se impostato, abilita per ogni utente collegato la cache delle password
+                                    decifrate con questa durata in secondi
+        cache_size (int) -> numero massimo di password decifrate in cache per utente
         '''
         self.db = db_connection
-        self.cipher: Optional[Fernet] = None
-        self.user_id: Optional[int] = None
-        
+        self.kdf_params = kdf_params or SecurityUtils.DEFAULT_KDF_PARAMS
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        # Pool per il lavoro CPU-bound (KDF): Argon2 e PBKDF2 rilasciano il GIL nel codice nativo
+        self._worker_count = max(2, os.cpu_count() or 2)
+        self._workers = ThreadPoolExecutor(max_workers=self._worker_count, thread_name_prefix="pm-kdf")
+        # Sessione dell'ultimo login; senza login i metodi delegati usano una sessione chiusa
+        self.session: Optional[Session] = None
+        self._closed_session = Session(self, None, [], 0)
+        self._session_lock = threading.Lock()
+        # Stato condiviso dalle sessioni aperte di ogni utente (chiavi, cache, indice), per user_id
+        self._users: dict[int, UserState] = {}
+        # Durata in secondi delle fasi dell'ultimo login (fetch, verify, derive, total)
+        self.last_login_timings: dict[str, float] = {}
+
+    @staticmethod
+    def _timed(fn, *args) -> tuple[Any, float]:
+        start = time.perf_counter()
+        result = fn(*args)
+        return result, time.perf_counter() - start
 
     def register_user(self, username: str, master_password: str) -> bool:
         '''
@@ -31,74 +74,777 @@ class PasswordManager:
                 print("Username o password devono essere di almeno 3 caratteri")
                 return False
 
-            # Verifica se l'utente esiste già
-            check_query = "SELECT id FROM users WHERE username = %s"
-            result = self.db.execute_query(check_query, (username,))
-
-            if result:
-                print(f"Username '{username}' già esistente!")
-                return False
-
             # 1) genera un salt casuale (per Fernet key derivation)
             salt = SecurityUtils.generate_salt()
 
-            # 2) calcola l'hash usando password (Argon2 include salt interno)
-            hashed_pwd = SecurityUtils.hash_password(master_password)
+            # 2) calcola l'hash usando password (Argon2 include salt e parametri interni)
+            hashed_pwd = SecurityUtils.hash_password(master_password, self.kdf_params)
 
-            # 3) inserisce il nuovo utente con hash + salt (salt per derive_key)
-            insert_query = "INSERT INTO users (username, password, salt) VALUES (%s, %s, %s)"
-            self.db.cursor.execute(insert_query, (username, hashed_pwd, salt))
-            self.db.conn.commit()
+            # 3) inserisce il nuovo utente con hash + salt + iterazioni (per derive_key);
+            #    un username già esistente viene rifiutato dall'indice univoco
+            insert_query = "INSERT INTO users (username, password, salt, kdf_iterations) VALUES (%s, %s, %s, %s)"
+            self.db.execute_write(insert_query, (username, hashed_pwd, salt, self.kdf_params["iterations"]))
 
             print(f"Utente '{username}' registrato con successo!")
             return True
         except Exception as e:
+            if self.db.is_duplicate_error(e):
+                print(f"Username '{username}' già esistente!")
+                return False
             print(f"Errore durante la registrazione: {e}")
             return False
 
     
-    def login(self, username: str, master_password: str) -> bool:
+    def open_session(self, username: str, master_password: str) -> Optional["Session"]:
         '''
-        Effettua il login e inizializza la cifratura.
+        Verifica le credenziali e apre una nuova sessione, senza toccare quella corrente.
+        La verifica Argon2 e la derivazione PBKDF2 della chiave vengono eseguite in parallelo:
+        la chiave derivata viene scartata se la verifica fallisce.
+        Se l'hash Argon2 usa parametri superati viene ricalcolato in background.
+        Dopo il login viene costruito in background l'indice dei servizi per la ricerca.
+        I tempi di ogni fase vengono salvati nella sessione (`login_timings`) e in `last_login_timings`.
 
         Parametri:
         username (str) -> nome utente
         master_password (str) -> password principale
 
         Valore di ritorno:
-        bool -> True se il login è avvenuto con successo, False altrimenti
+        Session -> sessione dell'utente
+        None -> se le credenziali non sono valide o in caso di errore
         '''
         try:
+            start = time.perf_counter()
             # Recupero id, hash e salt per quello username
-            query = "SELECT id, password, salt FROM users WHERE username = %s"
+            query = "SELECT id, password, salt, kdf_iterations FROM users WHERE username = %s"
             result = self.db.execute_query(query, (username,))
+            timings = {"fetch": time.perf_counter() - start}
 
             if not result:
                 print("Credenziali non valide!")
-                return False
+                return None
+
+            user_id, stored_hash, salt, iterations = result[0]  # salt è bytes (VARBINARY)
 
-            user_id, stored_hash, salt = result[0]  # salt è bytes (VARBINARY)
+            # Derivo la chiave di cifratura (stesso salt) mentre verifico la password
+            derivation = self._workers.submit(self._timed, SecurityUtils.derive_key, master_password, salt, iterations)
 
             # Verifico la password (Argon2 contiene salt internamente)
-            if not SecurityUtils.verify_password(master_password, stored_hash):
+            verified, timings["verify"] = self._timed(SecurityUtils.verify_password, master_password, stored_hash)
+            if not verified:
+                # La chiave derivata non viene mai letta: il future viene abbandonato
+                derivation.cancel()
+                self.last_login_timings = timings
                 print("Credenziali non valide!")
-                return False
+                return None
+
+            key, timings["derive"] = derivation.result()
 
-            # Login OK: salvo id utente
-            self.user_id = user_id
+            # Login OK: la sessione tiene id utente e chiavi; le altre sessioni dello stesso utente
+            # condividono chiavi, cache e indice, quindi indice e sweeper partono solo per la prima
+            keys, version = self._load_keys(user_id, Fernet(key))
+            state, first = self._attach_user(user_id, keys, version)
+            session = Session(self, user_id, keys, version, username, state)
+            if first:
+                session._schedule_index(user_id)
+                session._start_sweeper(user_id, version)
+            timings["total"] = time.perf_counter() - start
+            session.login_timings = self.last_login_timings = timings
 
-            # Uso lo stesso salt per derivare la chiave di cifratura
-            key = SecurityUtils.derive_key(master_password, salt)
-            self.cipher = Fernet(key)
+            if SecurityUtils.needs_rehash(stored_hash, self.kdf_params):
+                self._workers.submit(self._upgrade_hash, user_id, master_password, stored_hash)
 
             print(f" Login effettuato come '{username}'!")
-            return True
+            return session
 
         except Exception as e:
             print(f" Errore durante il login: {e}")
+            return None
+
+    def login(self, username: str, master_password: str) -> Optional["Session"]:
+        '''
+        Effettua il login e rende la nuova sessione quella corrente del gestore
+        (la sessione corrente precedente viene chiusa). Vedi `open_session`.
+
+        Parametri:
+        username (str) -> nome utente
+        master_password (str) -> password principale
+
+        Valore di ritorno:
+        Session -> sessione dell'utente (vera in un contesto booleano)
+        None -> se le credenziali non sono valide o in caso di errore
+        '''
+        session = self.open_session(username, master_password)
+        if session is not None:
+            with self._session_lock:
+                previous, self.session = self.session, session
+            if previous is not None:
+                previous.close()
+        return session
+
+    def logout(self) -> None:
+        '''
+        Chiude la sessione corrente: dimentica utente e chiave e svuota la cache.
+
+        Valore di ritorno:
+        None
+        '''
+        with self._session_lock:
+            session, self.session = self.session, None
+        if session is not None:
+            session.close()
+
+    def close(self) -> None:
+        '''
+        Chiude la sessione corrente e il pool di worker; il motore di persistenza resta aperto.
+        Da usare quando il gestore non serve più.
+
+        Valore di ritorno:
+        None
+        '''
+        self.logout()
+        self._workers.shutdown(wait=False)
+
+    def _attach_user(self, user_id: int, keys: list[Fernet], version: int) -> tuple["UserState", bool]:
+        '''
+        Restituisce lo stato condiviso dell'utente per una nuova sessione, creandolo se è la prima.
+        Le chiavi appena lette dal database sostituiscono quelle condivise: se un altro processo
+        ha cambiato la master password, le sessioni già aperte usano da ora quelle nuove.
+
+        Parametri:
+        user_id (int) -> identificativo dell'utente
+        keys (list[Fernet]) -> chiavi caricate al login
+        version (int) -> versione della chiave dati più recente
+
+        Valore di ritorno:
+        tuple[UserState, bool] -> stato condiviso e True se la sessione è la prima dell'utente
+        '''
+        with self._session_lock:
+            state = self._users.get(user_id)
+            first = state is None
+            if first:
+                cache = CredentialCache(self.cache_ttl, self.cache_size) if self.cache_ttl else None
+                state = self._users[user_id] = UserState(user_id, cache)
+            state.sessions += 1
+        with state.key_lock:
+            if version >= state.keyring[1]:
+                state.set_keys(keys, version)
+        return state, first
+
+    def _detach_user(self, state: "UserState") -> None:
+        '''
+        Rilascia lo stato condiviso alla chiusura di una sessione: con l'ultima sessione
+        dell'utente chiavi, indice e cache vengono dimenticati.
+
+        Parametri:
+        state (UserState) -> stato condiviso della sessione chiusa
+        '''
+        with self._session_lock:
+            state.sessions -= 1
+            if state.sessions > 0:
+                return
+            if self._users.get(state.user_id) is state:
+                del self._users[state.user_id]
+        state.set_keys([], 0)
+        state.index = None
+        if state.cache:
+            state.cache.clear()
+
+    def _upgrade_hash(self, user_id: int, master_password: str, stored_hash: str) -> None:
+        '''
+        Ricalcola l'hash Argon2 di un utente con i parametri attuali.
+        Le iterazioni PBKDF2 non cambiano: sono legate alla chiave che cifra le password salvate.
+        L'hash viene sostituito solo se è ancora quello verificato al login: se nel frattempo la
+        master password è stata cambiata, il nuovo hash (della vecchia password) viene scartato.
+
+        Parametri:
+        user_id (int) -> identificativo dell'utente
+        master_password (str) -> password principale appena verificata
+        stored_hash (str) -> hash con cui è stata verificata
+        '''
+        try:
+            hashed_pwd = SecurityUtils.hash_password(master_password, self.kdf_params)
+            updated = self.db.execute_write("UPDATE users SET password = %s WHERE id = %s AND password = %s",
+                                            (hashed_pwd, user_id, stored_hash))
+            if updated:
+                print("Hash della master password aggiornato ai nuovi parametri")
+        except Exception as e:
+            print(f"Errore durante l'aggiornamento dell'hash: {e}")
+
+    def _load_keys(self, user_id: int, master: Fernet) -> tuple[list[Fernet], int]:
+        '''
+        Decifra le chiavi dati dell'utente con la chiave derivata dalla master password.
+        Al primo login dopo la migrazione viene creata la chiave dati versione 1.
+
+        Parametri:
+        user_id (int) -> identificativo dell'utente
+        master (Fernet) -> chiave derivata dalla master password
+
+        Valore di ritorno:
+        tuple[list[Fernet], int] -> chiavi dalla più recente alla master, versione della più recente
+        '''
+        query = "SELECT version, wrapped_key FROM user_keys WHERE user_id = %s ORDER BY version DESC"
+        rows = self.db.execute_query(query, (user_id,))
+        if rows is None:
+            raise RuntimeError("Lettura delle chiavi non riuscita")
+        if not rows:
+            wrapped = master.encrypt(Fernet.generate_key()).decode()
+            try:
+                self.db.execute_write("INSERT INTO user_keys (user_id, version, wrapped_key) VALUES (%s, %s, %s)",
+                                      (user_id, 1, wrapped))
+            except Exception as e:
+                # Un login concorrente l'ha già creata: si usa quella
+                if not self.db.is_duplicate_error(e):
+                    raise
+            rows = self.db.execute_query(query, (user_id,)) or []
+        keys = [Fernet(master.decrypt(wrapped.encode())) for _, wrapped in rows]
+        return keys + [master], rows[0][0]
+
+    # ---------------- SESSIONE CORRENTE ----------------
+    # Per l'uso con un solo utente (GUI, strumenti a riga di comando): i metodi seguenti agiscono
+    # sulla sessione dell'ultimo `login`. Con più utenti in parallelo si usano direttamente le sessioni.
+
+    def _current(self) -> "Session":
+        # Senza login si usa una sessione chiusa: i suoi metodi segnalano "Devi prima effettuare il login!"
+        return self.session or self._closed_session
+
+    @property
+    def user_id(self) -> Optional[int]:
+        return self._current().user_id
+
+    @property
+    def cipher(self) -> Optional[MultiFernet]:
+        return self._current().cipher
+
+    @property
+    def key_version(self) -> int:
+        return self._current().key_version
+
+    @property
+    def index(self) -> Optional[ServiceIndex]:
+        return self._current().index
+
+    @property
+    def cache(self) -> Optional[CredentialCache]:
+        return self._current().cache
+
+    def clear_cache(self) -> None:
+        '''Come `Session.clear_cache`, sulla sessione corrente.'''
+        self._current().clear_cache()
+
+    def cache_stats(self) -> dict[str, int]:
+        '''Come `Session.cache_stats`, sulla sessione corrente.'''
+        return self._current().cache_stats()
+
+    def wait_index(self, timeout: Optional[float] = None) -> bool:
+        '''Come `Session.wait_index`, sulla sessione corrente.'''
+        return self._current().wait_index(timeout)
+
+    def rotate_key(self) -> Optional[int]:
+        '''Come `Session.rotate_key`, sulla sessione corrente.'''
+        return self._current().rotate_key()
+
+    def key_rotation_status(self) -> dict[str, Any]:
+        '''Come `Session.key_rotation_status`, sulla sessione corrente.'''
+        return self._current().key_rotation_status()
+
+    def change_master_password(self, old_password: str, new_password: str, batch_size: int = 2000) -> bool:
+        '''Come `Session.change_master_password`, sulla sessione corrente.'''
+        return self._current().change_master_password(old_password, new_password, batch_size)
+
+    def add_password(self, service: str, password: str) -> bool:
+        '''Come `Session.add_password`, sulla sessione corrente.'''
+        return self._current().add_password(service, password)
+
+    def upsert_password(self, service: str, password: str) -> bool:
+        '''Come `Session.upsert_password`, sulla sessione corrente.'''
+        return self._current().upsert_password(service, password)
+
+    def import_credentials(self, source, fmt: Optional[str] = None, on_duplicate: str = "skip",
+                           batch_size: int = 1000,
+                           progress: Optional[Callable[[dict[str, int]], None]] = None) -> dict[str, int]:
+        '''Come `Session.import_credentials`, sulla sessione corrente.'''
+        return self._current().import_credentials(source, fmt, on_duplicate, batch_size, progress)
+
+    def export_vault(self, path: str, passphrase: Optional[str] = None, incremental: bool = False,
+                     batch_size: int = 500) -> Optional[int]:
+        '''Come `Session.export_vault`, sulla sessione corrente.'''
+        return self._current().export_vault(path, passphrase, incremental, batch_size)
+
+    def import_vault(self, path: str, passphrase: Optional[str] = None, on_duplicate: str = "overwrite",
+                     batch_size: int = 1000) -> dict[str, int]:
+        '''Come `Session.import_vault`, sulla sessione corrente.'''
+        return self._current().import_vault(path, passphrase, on_duplicate, batch_size)
+
+    def get_password(self, service: str) -> Optional[str]:
+        '''Come `Session.get_password`, sulla sessione corrente.'''
+        return self._current().get_password(service)
+
+    def get_passwords(self, services: Iterable[str], chunk_size: int = 500,
+                      parallel_threshold: int = 64) -> dict[str, Optional[str]]:
+        '''Come `Session.get_passwords`, sulla sessione corrente.'''
+        return self._current().get_passwords(services, chunk_size, parallel_threshold)
+
+    def list_services(self) -> list[tuple[int, str]]:
+        '''Come `Session.list_services`, sulla sessione corrente.'''
+        return self._current().list_services()
+
+    def list_services_page(self, after: Optional[str] = None, limit: int = 200) -> tuple[list[tuple[int, str]], Optional[str]]:
+        '''Come `Session.list_services_page`, sulla sessione corrente.'''
+        return self._current().list_services_page(after, limit)
+
+    def iter_services(self, page_size: int = 500) -> Iterator[list[tuple[int, str]]]:
+        '''Come `Session.iter_services`, sulla sessione corrente.'''
+        return self._current().iter_services(page_size)
+
+    def search_services(self, keyword: str) -> list[tuple[int, str]]:
+        '''Come `Session.search_services`, sulla sessione corrente.'''
+        return self._current().search_services(keyword)
+
+    def update_password(self, service: str, new_password: str) -> bool:
+        '''Come `Session.update_password`, sulla sessione corrente.'''
+        return self._current().update_password(service, new_password)
+
+    def delete_password(self, service: str) -> bool:
+        '''Come `Session.delete_password`, sulla sessione corrente.'''
+        return self._current().delete_password(service)
+
+
+class UserState:
+    def __init__(self, user_id: Optional[int], cache: Optional[CredentialCache] = None) -> None:
+        '''
+        Costruttore della classe UserState.
+        Stato di un utente condiviso da tutte le sue sessioni aperte sullo stesso gestore:
+        una rotazione della chiave, una modifica o una nuova password fatta da una sessione
+        è subito visibile alle altre (chiavi, cache delle password decifrate e indice dei servizi).
+
+        Parametri:
+        user_id (int | None) -> identificativo dell'utente (None per una sessione chiusa)
+        cache (CredentialCache | None) -> cache delle password decifrate, None se disattivata
+        '''
+        self.user_id = user_id
+        # La cifratura usa chiavi dati versionate: `cipher` cifra con la più recente e decifra con
+        # tutte, compresa la chiave derivata dalla master password (versione 0, ultima della lista).
+        # Chiavi, versione e cipher cambiano insieme: i metodi leggono `keyring` una volta sola
+        self.keyring: tuple[list[Fernet], int, Optional[MultiFernet]] = ([], 0, None)
+        # Serializza rotazione della chiave e cambio della master password
+        self.key_lock = threading.Lock()
+        self.cache = cache
+        # Indice in memoria dei nomi dei servizi, costruito in background dopo il primo login,
+        # e ultima ricostruzione avviata (dopo il login o un import)
+        self.index: Optional[ServiceIndex] = None
+        self.index_lock = threading.Lock()
+        self.index_build: Optional[Future] = None
+        # Sessioni aperte che usano questo stato
+        self.sessions = 0
+
+    def set_keys(self, keys: list[Fernet], version: int) -> None:
+        self.keyring = (keys, version, MultiFernet(keys) if keys else None)
+
+
+class Session:
+    def __init__(self, manager: PasswordManager, user_id: Optional[int], keys: list[Fernet], version: int,
+                 username: Optional[str] = None, state: Optional[UserState] = None) -> None:
+        '''
+        Costruttore della classe Session.
+        Vista di un utente collegato: contiene id utente e usa motore di persistenza e pool di worker
+        del gestore. Chiavi, cache e indice dei servizi sono condivisi con le altre sessioni dello
+        stesso utente (`UserState`). Sessioni diverse possono lavorare in parallelo da thread diversi;
+        anche i metodi di una stessa sessione sono sicuri tra thread.
+        Si ottiene da `PasswordManager.login` o `PasswordManager.open_session`.
+
+        Parametri:
+        manager (PasswordManager) -> gestore che ha aperto la sessione
+        user_id (int | None) -> identificativo dell'utente (None per una sessione chiusa)
+        keys (list[Fernet]) -> chiavi dati dalla più recente alla chiave derivata dalla master password
+        version (int) -> versione della chiave dati più recente
+        username (str | None) -> nome dell'utente
+        state (UserState | None) -> stato condiviso dell'utente (default: uno stato solo per questa sessione)
+        '''
+        self.manager = manager
+        self.db = manager.db
+        self.kdf_params = manager.kdf_params
+        self.username = username
+        self.user_id = user_id
+        self._shared = state is not None
+        if state is None:
+            state = UserState(user_id, CredentialCache(manager.cache_ttl, manager.cache_size)
+                              if manager.cache_ttl and user_id is not None else None)
+            state.set_keys(keys, version)
+        self._state = state
+        self._workers = manager._workers
+        self._worker_count = manager._worker_count
+        # Durata in secondi delle fasi del login (fetch, verify, derive, total)
+        self.login_timings: dict[str, float] = {}
+
+    @property
+    def _keyring(self) -> tuple[list[Fernet], int, Optional[MultiFernet]]:
+        return self._state.keyring
+
+    @property
+    def _key_lock(self) -> threading.Lock:
+        return self._state.key_lock
+
+    @property
+    def cache(self) -> Optional[CredentialCache]:
+        return self._state.cache
+
+    @property
+    def index(self) -> Optional[ServiceIndex]:
+        return self._state.index
+
+    @property
+    def _index_lock(self) -> threading.Lock:
+        return self._state.index_lock
+
+    @property
+    def cipher(self) -> Optional[MultiFernet]:
+        return self._keyring[2]
+
+    @property
+    def key_version(self) -> int:
+        return self._keyring[1]
+
+    @property
+    def _keys(self) -> list[Fernet]:
+        return self._keyring[0]
+
+    def close(self) -> None:
+        '''
+        Termina la sessione: dimentica utente e chiave. Se era l'ultima sessione dell'utente
+        anche cache e indice condivisi vengono svuotati.
+        Sweeper e indice in background della sessione si fermano da soli.
+
+        Valore di ritorno:
+        None
+        '''
+        state, shared = self._state, self._shared
+        self.user_id = None
+        self._state, self._shared = UserState(None), False
+        if shared:
+            self.manager._detach_user(state)
+        else:
+            state.set_keys([], 0)
+            if state.cache:
+                state.cache.clear()
+
+    def logout(self) -> None:
+        '''
+        Come `close`; se è la sessione corrente del gestore, il gestore non ne ha più una.
+
+        Valore di ritorno:
+        None
+        '''
+        if self.manager.session is self:
+            self.manager.logout()
+        else:
+            self.close()
+
+    def clear_cache(self) -> None:
+        '''
+        Svuota la cache delle password decifrate (condivisa dalle sessioni dell'utente), azzerandone il contenuto.
+
+        Valore di ritorno:
+        None
+        '''
+        if self.cache:
+            self.cache.clear()
+
+    def _invalidate(self, service: str) -> None:
+        # Chiamata prima e dopo ogni scrittura: una lettura concorrente partita prima della scrittura
+        # potrebbe rimettere in cache la password precedente subito dopo la prima invalidazione
+        if self.cache:
+            self.cache.invalidate(service)
+
+    def cache_stats(self) -> dict[str, int]:
+        '''
+        Statistiche della cache delle password decifrate.
+
+        Valore di ritorno:
+        dict[str, int] -> hits, misses, evictions e numero di voci (vuoto se la cache è disattivata)
+        '''
+        return self.cache.stats() if self.cache else {}
+
+    def _schedule_index(self, user_id: int) -> None:
+        self._state.index_build = self._workers.submit(self._build_index, user_id)
+
+    def wait_index(self, timeout: Optional[float] = None) -> bool:
+        '''
+        Attende la fine dell'ultima costruzione dell'indice dei servizi avviata in background
+        (dopo il login o dopo un import), così le ricerche successive usano l'indice aggiornato.
+
+        Parametri:
+        timeout (float | None) -> secondi massimi di attesa (None per nessun limite)
+
+        Valore di ritorno:
+        bool -> True se l'indice è pronto, False se non lo è entro il timeout o la sessione è chiusa
+        '''
+        build = self._state.index_build
+        if build is not None:
+            try:
+                build.result(timeout)
+            except FutureTimeoutError:
+                return False
+        return self.index is not None
+
+    def _build_index(self, user_id: int) -> None:
+        '''
+        Carica i nomi dei servizi dell'utente nell'indice in memoria.
+        Le modifiche concorrenti aspettano sul lock dell'indice, quindi nessuna va persa.
+
+        Parametri:
+        user_id (int) -> identificativo dell'utente che ha effettuato il login
+        '''
+        with self._index_lock:
+            query = "SELECT id, service FROM user_credentials WHERE user_id = %s"
+            rows = self.db.execute_query(query, (user_id,))
+            # Se nel frattempo la sessione è stata chiusa l'indice non serve più
+            if rows is not None and self.user_id == user_id:
+                self._state.index = ServiceIndex(rows)
+
+    @staticmethod
+    def _pack(token: bytes) -> bytes:
+        # Il token Fernet è base64: salvato decodificato occupa un quarto in meno
+        return bytes((CIPHERTEXT_FORMAT,)) + base64.urlsafe_b64decode(token)
+
+    @staticmethod
+    def _unpack(ciphertext: Optional[bytes], legacy: str) -> bytes:
+        # Le righe non ancora convertite hanno il token base64 nella colonna testuale
+        if ciphertext is None:
+            return legacy.encode()
+        if ciphertext[0] != CIPHERTEXT_FORMAT:
+            raise ValueError(f"Formato della password cifrata non supportato: {ciphertext[0]}")
+        return base64.urlsafe_b64encode(memoryview(ciphertext)[1:])
+
+    def _set_keys(self, keys: list[Fernet], version: int) -> None:
+        self._state.set_keys(keys, version)
+
+    def rotate_key(self) -> Optional[int]:
+        '''
+        Crea una nuova chiave dati e la usa da subito per le nuove cifrature.
+        Le password esistenti restano leggibili e vengono cifrate di nuovo in modo graduale:
+        alla lettura oppure dallo sweeper in background, che salva l'avanzamento nel database.
+        La rotazione viene rifiutata se nel frattempo un'altra sessione ha cambiato la master password
+        o ruotato la chiave: la nuova chiave sarebbe cifrata con una master non più valida.
+
+        Valore di ritorno:
+        int -> versione della nuova chiave
+        None -> in caso di errore
+        '''
+        if not self.cipher or not self.user_id:
+            print("Devi prima effettuare il login!")
+            return None
+
+        try:
+            with self._key_lock:
+                keys, current, _ = self._keyring
+                key = Fernet.generate_key()
+                version = current + 1
+                with self.db.transaction() as tx:
+                    # Come nel cambio della master password, la riga dell'utente viene bloccata per prima
+                    tx.execute("UPDATE users SET salt = salt WHERE id = %s", (self.user_id,))
+                    latest = tx.query("SELECT version, wrapped_key FROM user_keys WHERE user_id = %s "
+                                      "ORDER BY version DESC LIMIT 1", (self.user_id,))
+                    if not self._owns_key(keys[-1], latest, current):
+                        print("Chiavi modificate da un'altra sessione: effettua di nuovo il login!")
+                        return None
+                    tx.execute("INSERT INTO user_keys (user_id, version, wrapped_key) VALUES (%s, %s, %s)",
+                               (self.user_id, version, keys[-1].encrypt(key).decode()))
+                self._set_keys([Fernet(key)] + keys, version)
+            self._start_sweeper(self.user_id, version)
+            print(f"Nuova chiave dati attiva (versione {version})")
+            return version
+        except Exception as e:
+            print(f"Errore durante la rotazione della chiave: {e}")
+            return None
+
+    @staticmethod
+    def _owns_key(master: Fernet, latest: list[tuple[int, str]], current: int) -> bool:
+        # La chiave più recente nel database deve essere quella della sessione e cifrata con la sua master
+        if not latest or latest[0][0] != current:
+            return False
+        try:
+            master.decrypt(latest[0][1].encode())
+            return True
+        except InvalidToken:
+            return False
+
+    def key_rotation_status(self) -> dict[str, Any]:
+        '''
+        Avanzamento della cifratura con la chiave dati attuale.
+
+        Valore di ritorno:
+        dict[str, Any] -> version (chiave attuale), pending (password cifrate con chiavi precedenti),
+            swept (password aggiornate dallo sweeper), done (True se lo sweeper ha terminato);
+            vuoto se non si è effettuato il login o in caso di errore
+        '''
+        if not self.user_id:
+            return {}
+        version = self.key_version
+        pending = self.db.execute_query(
+            "SELECT COUNT(*) FROM user_credentials WHERE user_id = %s AND key_version < %s",
+            (self.user_id, version))
+        progress = self.db.execute_query(
+            "SELECT swept_rows, swept_at FROM user_keys WHERE user_id = %s AND version = %s",
+            (self.user_id, version))
+        if not pending or not progress:
+            return {}
+        return {"version": version, "pending": pending[0][0],
+                "swept": progress[0][0], "done": progress[0][1] is not None}
+
+    def _start_sweeper(self, user_id: int, version: int) -> None:
+        # Thread dedicato e non il pool: lo sweeper è lungo e non deve rallentare login e ricerche
+        threading.Thread(target=self._sweep, args=(user_id, version),
+                         name="pm-key-sweeper", daemon=True).start()
+
+    def _sweep(self, user_id: int, version: int) -> None:
+        self._sweep_keys(user_id, version)
+        self._convert_ciphertexts(user_id)
+
+    def _sweep_keys(self, user_id: int, version: int, batch_size: int = 200, pause: float = 0.05) -> None:
+        '''
+        Cifra con la chiave `version` le password ancora cifrate con chiavi precedenti, a piccoli
+        blocchi con una pausa tra l'uno e l'altro. Dopo ogni blocco il punto raggiunto viene salvato
+        in user_keys nella stessa transazione, così lo sweeper riprende da lì al login successivo.
+        Si ferma se la sessione viene chiusa o cambia la chiave attuale.
+
+        Parametri:
+        user_id (int) -> identificativo dell'utente
+        version (int) -> versione della chiave dati di destinazione
+        batch_size (int) -> righe per blocco
+        pause (float) -> secondi di attesa tra due blocchi
+        '''
+        try:
+            result = self.db.execute_query(
+                "SELECT sweep_cursor, swept_at FROM user_keys WHERE user_id = %s AND version = %s", (user_id, version))
+            if not result or result[0][1] is not None:
+                return
+            update = ("UPDATE user_credentials SET password = '', ciphertext = %s, key_version = %s, "
+                      "updated_at = updated_at WHERE id = %s AND key_version < %s")
+            progress = "UPDATE user_keys SET sweep_cursor = %s, swept_rows = swept_rows + %s WHERE user_id = %s AND version = %s"
+            for rows in self._iter_credential_rows(batch_size, after=result[0][0], below_version=version, user_id=user_id):
+                _, current, cipher = self._keyring
+                if self.user_id != user_id or current != version or cipher is None:
+                    return
+                params = [(token, key_version, row_id, version)
+                          for token, key_version, row_id in self._reencrypt(cipher, version, rows)]
+                with self.db.transaction() as tx:
+                    swept = tx.execute_many(update, params)
+                    tx.execute(progress, (rows[-1][1], swept, user_id, version))
+                time.sleep(pause)
+            self.db.execute_write(
+                f"UPDATE user_keys SET sweep_cursor = NULL, swept_at = {self.db.timestamp_sql} "
+                "WHERE user_id = %s AND version = %s", (user_id, version))
+        except Exception as e:
+            print(f"Errore durante la rotazione in background: {e}")
+
+    def _convert_ciphertexts(self, user_id: int, batch_size: int = 500, pause: float = 0.05) -> None:
+        '''
+        Converte nel formato binario le password ancora salvate come token base64 nella colonna
+        testuale, a blocchi e senza decifrarle. Le righe convertite escono dal filtro, quindi
+        un'interruzione non richiede di salvare l'avanzamento.
+
+        Parametri:
+        user_id (int) -> identificativo dell'utente
+        batch_size (int) -> righe per blocco
+        pause (float) -> secondi di attesa tra due blocchi
+        '''
+        try:
+            update = ("UPDATE user_credentials SET password = '', ciphertext = %s, updated_at = updated_at "
+                      "WHERE id = %s AND ciphertext IS NULL")
+            for rows in self._iter_credential_rows(batch_size, user_id=user_id, legacy_only=True):
+                if self.user_id != user_id:
+                    return
+                self.db.execute_many(update, [(self._pack(token), row_id) for row_id, _, token in rows])
+                time.sleep(pause)
+        except Exception as e:
+            print(f"Errore durante la conversione delle password: {e}")
+
+    def _rewrap_on_read(self, rows: list[tuple[int, bytes, int]]) -> None:
+        # Rotazione pigra: le password appena lette con una chiave precedente (o nel formato testuale)
+        # vengono cifrate con quella attuale; la condizione esclude le righe riscritte nel frattempo
+        try:
+            _, version, cipher = self._keyring
+            self.db.execute_many(
+                "UPDATE user_credentials SET password = '', ciphertext = %s, key_version = %s, updated_at = updated_at "
+                "WHERE id = %s AND key_version = %s AND (key_version < %s OR ciphertext IS NULL)",
+                [(self._pack(cipher.encrypt(plaintext)), version, row_id, key_version, version)
+                 for row_id, plaintext, key_version in rows])
+        except Exception as e:
+            print(f"Errore durante l'aggiornamento della chiave: {e}")
+
+    @staticmethod
+    def _reencrypt(cipher: MultiFernet, version: int, rows: list[tuple[int, str, bytes]]) -> list[tuple[bytes, int, int]]:
+        return [(Session._pack(cipher.rotate(token)), version, row_id) for row_id, _, token in rows]
+
+    def change_master_password(self, old_password: str, new_password: str, batch_size: int = 2000) -> bool:
+        '''
+        Cambia la master password dell'utente collegato.
+        Le chiavi dati vengono cifrate di nuovo con la chiave derivata dalla nuova master password;
+        le password ancora cifrate direttamente con la vecchia (versione 0) vengono lette a blocchi
+        (keyset), cifrate con la chiave dati attuale in un pool dedicato e riscritte con executemany.
+        Tutto avviene in un'unica transazione insieme al nuovo hash Argon2, salt e iterazioni,
+        quindi in caso di errore il vault resta com'era.
+
+        Parametri:
+        old_password (str) -> master password attuale
+        new_password (str) -> nuova master password
+        batch_size (int) -> righe lette e riscritte per blocco
+
+        Valore di ritorno:
+        bool -> True se la master password è stata cambiata, False altrimenti
+        '''
+        if not self.cipher or not self.user_id:
+            print("Devi prima effettuare il login!")
+            return False
+        if len(new_password) < 3:
+            print("La nuova master password deve essere di almeno 3 caratteri")
+            return False
+
+        try:
+            result = self.db.execute_query("SELECT password FROM users WHERE id = %s", (self.user_id,))
+            if not result or not SecurityUtils.verify_password(old_password, result[0][0]):
+                print("Master password attuale non valida!")
+                return False
+
+            # Hash e chiave nuovi calcolati in parallelo, come al login. Il pool è dedicato e non
+            # quello del gestore: il metodo può essere chiamato da un task di quel pool, che
+            # aspettando altri task dello stesso pool già pieno resterebbe bloccato per sempre
+            workers = self._worker_count
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pm-rekey") as pool:
+                salt = SecurityUtils.generate_salt()
+                iterations = self.kdf_params["iterations"]
+                derivation = pool.submit(SecurityUtils.derive_key, new_password, salt, iterations)
+                hashed_pwd = SecurityUtils.hash_password(new_password, self.kdf_params)
+                new_master = Fernet(derivation.result())
+
+                update = ("UPDATE user_credentials SET password = '', ciphertext = %s, key_version = %s, "
+                          "updated_at = updated_at WHERE id = %s")
+                count = 0
+                with self._key_lock:
+                    keys, version, cipher = self._keyring
+                    with self.db.transaction() as tx:
+                        # La riga dell'utente viene aggiornata per prima: in MySQL il suo lock blocca gli
+                        # inserimenti concorrenti (controllo della foreign key) fino al commit
+                        tx.execute("UPDATE users SET password = %s, salt = %s, kdf_iterations = %s WHERE id = %s",
+                                   (hashed_pwd, salt, iterations, self.user_id))
+                        wrapped = tx.query("SELECT id, wrapped_key FROM user_keys WHERE user_id = %s", (self.user_id,))
+                        tx.execute_many("UPDATE user_keys SET wrapped_key = %s WHERE id = %s",
+                                        [(new_master.encrypt(keys[-1].decrypt(key.encode())).decode(), key_id)
+                                         for key_id, key in wrapped])
+                        for rows in self._iter_credential_rows(batch_size, run_query=tx.query, below_version=1):
+                            step = -(-len(rows) // workers)
+                            parts = pool.map(self._reencrypt, [cipher] * workers, [version] * workers,
+                                             [rows[i:i + step] for i in range(0, len(rows), step)])
+                            tx.execute_many(update, [param for part in parts for param in part])
+                            count += len(rows)
+                    self._set_keys(keys[:-1] + [new_master], version)
+            self.clear_cache()
+            print(f"Master password cambiata: {count} password cifrate di nuovo")
+            return True
+        except Exception as e:
+            print(f"Errore durante il cambio della master password: {e}")
             return False
 
-    
     def add_password(self, service: str, password: str) -> bool:
         '''
         Aggiunge un nuovo servizio con una nuova password cifrata, evitando duplicati.
@@ -115,31 +861,269 @@ class PasswordManager:
             return False
         
         try:
-            # Controllo se il servizio esiste già per questo utente
-            check_query = "SELECT id FROM user_credentials WHERE user_id = %s AND service = %s"
-            result = self.db.execute_query(check_query, (self.user_id, service))
+            # Inserimento nuova password: i duplicati vengono rifiutati dall'indice univoco (user_id, service)
+            _, version, cipher = self._keyring
+            encrypted_pwd = self._pack(cipher.encrypt(password.encode()))
             
-            if result and len(result) > 0:
+            insert_query = """
+                INSERT INTO user_credentials (user_id, service, password, ciphertext, key_version)
+                VALUES (%s, %s, '', %s, %s)
+            """
+            service_id = self.db.execute_insert(insert_query, (self.user_id, service, encrypted_pwd, version))
+            with self._index_lock:
+                if self.index is not None:
+                    self.index.add(service_id, service)
+            
+            print(f"Password per '{service}' salvata con successo!")
+            return True
+    
+        except Exception as e:
+            if self.db.is_duplicate_error(e):
                 print(f" Esiste già una password salvata per il servizio '{service}'!")
                 return False
+            print(f"Errore durante il salvataggio: {e}")
+            return False
+
+    def upsert_password(self, service: str, password: str) -> bool:
+        '''
+        Salva la password di un servizio, creandolo se non esiste o sostituendo quella esistente.
+        Usa una sola istruzione (INSERT ... ON DUPLICATE KEY / ON CONFLICT).
+
+        Parametri:
+        service (str) -> nome del servizio
+        password (str) -> password da salvare
+
+        Valore di ritorno:
+        bool -> True se la password è stata salvata, False altrimenti
+        '''
+        if not self.cipher or not self.user_id:
+            print("Devi prima effettuare il login!")
+            return False
+
+        self._invalidate(service)
+
+        try:
+            _, version, cipher = self._keyring
+            encrypted_pwd = self._pack(cipher.encrypt(password.encode()))
+            query = self.db.upsert_query("user_credentials", ("user_id", "service", "password", "ciphertext", "key_version"),
+                                         ("user_id", "service"), ("password", "ciphertext", "key_version"), "updated_at")
+            self.db.execute_write(query, (self.user_id, service, "", encrypted_pwd, version))
+            self._invalidate(service)
+            with self._index_lock:
+                if self.index is not None and service not in self.index:
+                    # Servizio nuovo: l'id generato serve all'indice in memoria
+                    result = self.db.execute_query(
+                        "SELECT id FROM user_credentials WHERE user_id = %s AND service = %s", (self.user_id, service))
+                    if result:
+                        self.index.add(result[0][0], service)
 
-            # Inserimento nuova password
-            encrypted_pwd = self.cipher.encrypt(password.encode()).decode()
-            
-            insert_query = "INSERT INTO user_credentials (user_id, service, password) VALUES (%s, %s, %s)"
-            self.db.cursor.execute(insert_query, (self.user_id, service, encrypted_pwd))
-            self.db.conn.commit()
-            
             print(f"Password per '{service}' salvata con successo!")
             return True
-    
         except Exception as e:
             print(f"Errore durante il salvataggio: {e}")
             return False
     
+    def import_credentials(self, source, fmt: Optional[str] = None, on_duplicate: str = "skip",
+                           batch_size: int = 1000,
+                           progress: Optional[Callable[[dict[str, int]], None]] = None) -> dict[str, int]:
+        '''
+        Importa molte credenziali in blocco.
+        Le righe vengono lette in streaming, cifrate a blocchi e scritte con executemany,
+        una transazione per blocco.
+
+        Parametri:
+        source -> percorso di un export CSV/JSON oppure iterabile di coppie (servizio, password)
+        fmt (str | None) -> formato del file ("csv" o "json"), dedotto dall'estensione se None
+        on_duplicate (str) -> "skip" mantiene le password esistenti, "overwrite" le sostituisce
+        batch_size (int) -> righe per blocco (e per transazione)
+        progress -> funzione chiamata dopo ogni blocco con i contatori parziali
+
+        Valore di ritorno:
+        dict[str, int] -> contatori: read (righe lette), written (righe scritte), skipped (duplicati ignorati),
+            errors (1 se l'importazione si è interrotta per un errore, compreso un file illeggibile)
+        '''
+        counters = {"read": 0, "written": 0, "skipped": 0, "errors": 0}
+        if not self.cipher or not self.user_id:
+            print("Devi prima effettuare il login!")
+            return counters
+        if on_duplicate not in ("skip", "overwrite"):
+            raise ValueError("on_duplicate deve essere 'skip' oppure 'overwrite'")
+
+        updates = ("password", "ciphertext", "key_version") if on_duplicate == "overwrite" else ()
+        query = self.db.upsert_query("user_credentials", ("user_id", "service", "password", "ciphertext", "key_version"),
+                                     ("user_id", "service"), updates, "updated_at")
+        try:
+            rows: Iterable[tuple[str, str]] = read_credentials(source, fmt) if isinstance(source, str) else source
+            iterator = iter(rows)
+            while True:
+                batch = list(islice(iterator, batch_size))
+                if not batch:
+                    break
+                _, version, cipher = self._keyring
+                encrypt, pack = cipher.encrypt, self._pack
+                params = [(self.user_id, service, "", pack(encrypt(password.encode())), version)
+                          for service, password in batch]
+                written = self.db.execute_many(query, params)
+                if on_duplicate == "overwrite":
+                    # MySQL conta 2 righe per un aggiornamento: si limita al numero di righe del blocco
+                    written = min(written, len(batch))
+                counters["read"] += len(batch)
+                counters["written"] += written
+                counters["skipped"] += len(batch) - written
+                if progress:
+                    progress(dict(counters))
+        except Exception as e:
+            counters["errors"] += 1
+            print(f"Errore durante l'importazione: {e}")
+        finally:
+            if counters["written"]:
+                self.clear_cache()
+                self._schedule_index(self.user_id)
+
+        print(f"Importate {counters['written']} password ({counters['skipped']} duplicati ignorati)")
+        return counters
+
+    def _iter_credential_rows(self, batch_size: int = 500, since: Optional[str] = None,
+                              run_query: Optional[Callable] = None, after: Optional[str] = None,
+                              below_version: Optional[int] = None,
+                              user_id: Optional[int] = None,
+                              legacy_only: bool = False) -> Iterator[list[tuple[int, str, bytes]]]:
+        '''
+        Generatore che legge le credenziali cifrate dell'utente a blocchi, con paginazione keyset
+        sull'indice univoco (user_id, service): in memoria resta un solo blocco alla volta.
+
+        Parametri:
+        batch_size (int) -> righe per blocco
+        since (str | None) -> se impostato, solo le righe modificate da questo istante in poi
+        run_query -> funzione (query, params) con cui leggere, ad esempio `Transaction.query`
+                     (default `self.db.execute_query`)
+        after (str | None) -> se impostato, riparte dal servizio successivo a questo
+        below_version (int | None) -> se impostato, solo le righe cifrate con chiavi precedenti a questa versione
+        user_id (int | None) -> utente di cui leggere le righe (default l'utente collegato)
+        legacy_only (bool) -> True per leggere solo le righe ancora nel formato testuale
+
+        Valore di ritorno:
+        Iterator[list[tuple[int, str, bytes]]] -> blocchi di terne (id, servizio, token Fernet)
+        '''
+        run_query = run_query or self.db.execute_query
+        user_id = user_id or self.user_id
+        changed = "" if since is None else " AND (updated_at IS NULL OR updated_at >= %s)"
+        extra = () if since is None else (since,)
+        if below_version is not None:
+            changed += " AND key_version < %s"
+            extra += (below_version,)
+        if legacy_only:
+            changed += " AND ciphertext IS NULL"
+        last_service = after
+        while True:
+            after = "" if last_service is None else " AND service > %s"
+            query = f"""
+                SELECT id, service, password, ciphertext FROM user_credentials
+                WHERE user_id = %s{after}{changed}
+                ORDER BY service LIMIT %s
+            """
+            params = (user_id,) + (() if last_service is None else (last_service,)) + extra + (batch_size,)
+            rows = run_query(query, params)
+            if rows is None:
+                raise RuntimeError("Lettura delle credenziali non riuscita")
+            if rows:
+                yield [(row_id, service, self._unpack(ciphertext, legacy)) for row_id, service, legacy, ciphertext in rows]
+            if len(rows) < batch_size:
+                return
+            last_service = rows[-1][1]
+
+    def _archive_cipher(self, passphrase: Optional[str], header: dict) -> Union[Fernet, MultiFernet]:
+        # Senza passphrase l'archivio usa la chiave della sessione (ripristinabile solo dallo stesso utente)
+        if passphrase is None:
+            if "salt" in header:
+                raise VaultArchiveError("L'archivio è protetto da una passphrase")
+            return self.cipher
+        if "salt" not in header:
+            raise VaultArchiveError("L'archivio non è protetto da passphrase")
+        salt = base64.b64decode(header["salt"])
+        return Fernet(SecurityUtils.derive_key(passphrase, salt, header["iterations"]))
+
+    def export_vault(self, path: str, passphrase: Optional[str] = None, incremental: bool = False,
+                     batch_size: int = 500) -> Optional[int]:
+        '''
+        Esporta le credenziali dell'utente in un archivio compresso e cifrato, un blocco alla volta.
+        In modalità incrementale vengono scritte solo le righe modificate dall'ultimo snapshot;
+        le eliminazioni non vengono registrate (il ripristino aggiunge o sostituisce soltanto).
+
+        Parametri:
+        path (str) -> percorso dell'archivio da creare
+        passphrase (str | None) -> se impostata, l'archivio viene cifrato con una chiave derivata da essa
+                                   (ripristinabile da qualunque utente); altrimenti con la chiave della sessione
+        incremental (bool) -> True per esportare solo le modifiche dall'ultimo snapshot
+        batch_size (int) -> righe per blocco dell'archivio
+
+        Valore di ritorno:
+        int -> numero di credenziali esportate
+        None -> in caso di errore
+        '''
+        if not self.cipher or not self.user_id:
+            print("Devi prima effettuare il login!")
+            return None
+
+        try:
+            since = None
+            if incremental:
+                result = self.db.execute_query(
+                    "SELECT MAX(taken_at) FROM vault_snapshots WHERE user_id = %s", (self.user_id,))
+                since = str(result[0][0]) if result and result[0][0] is not None else None
+            # L'istante viene letto prima delle righe: una modifica concorrente finisce nello snapshot successivo
+            taken_at = self.db.current_timestamp()
+            header = {"version": 1, "taken_at": taken_at, "since": since}
+            if passphrase is None:
+                cipher = self.cipher
+            else:
+                salt = SecurityUtils.generate_salt()
+                header.update(salt=base64.b64encode(salt).decode(), iterations=self.kdf_params["iterations"])
+                cipher = Fernet(SecurityUtils.derive_key(passphrase, salt, self.kdf_params["iterations"]))
+
+            decrypt = self.cipher.decrypt
+            chunks = ([[service, decrypt(token).decode()] for _, service, token in rows]
+                      for rows in self._iter_credential_rows(batch_size, since))
+            count = write_archive(path, cipher, header, chunks)
+
+            self.db.execute_write(
+                "INSERT INTO vault_snapshots (user_id, taken_at, incremental, row_count) VALUES (%s, %s, %s, %s)",
+                (self.user_id, taken_at, since is not None, count))
+            print(f"Esportate {count} password in '{path}'")
+            return count
+        except Exception as e:
+            print(f"Errore durante l'esportazione: {e}")
+            return None
+
+    def import_vault(self, path: str, passphrase: Optional[str] = None, on_duplicate: str = "overwrite",
+                     batch_size: int = 1000) -> dict[str, int]:
+        '''
+        Ripristina un archivio creato da `export_vault`, leggendolo un blocco alla volta.
+        Le password vengono cifrate con la chiave della sessione e scritte a blocchi con executemany.
+        Gli archivi incrementali vanno ripristinati in ordine, dopo il completo da cui partono.
+
+        Parametri:
+        path (str) -> percorso dell'archivio
+        passphrase (str | None) -> passphrase usata nell'esportazione (None se cifrato con la sessione)
+        on_duplicate (str) -> "overwrite" sostituisce le password esistenti, "skip" le mantiene
+        batch_size (int) -> righe per blocco (e per transazione)
+
+        Valore di ritorno:
+        dict[str, int] -> contatori: read (righe lette), written (righe scritte), skipped (duplicati ignorati)
+        '''
+        if not self.cipher or not self.user_id:
+            print("Devi prima effettuare il login!")
+            return {"read": 0, "written": 0, "skipped": 0}
+
+        chunks = read_archive(path, lambda header: self._archive_cipher(passphrase, header))
+        rows = (tuple(row) for chunk in chunks for row in chunk)
+        return self.import_credentials(rows, on_duplicate=on_duplicate, batch_size=batch_size)
+
     def get_password(self, service: str) -> Optional[str]:
         '''
         Recupera e decifra una password.
+        Con la cache attiva, le password lette di recente non richiedono query né decifratura.
+        Una password cifrata con una chiave dati precedente viene cifrata di nuovo con quella attuale.
 
         Parametri:
         service (str) -> nome del servizio
@@ -152,13 +1136,27 @@ class PasswordManager:
             print("Devi prima effettuare il login!")
             return None
         
+        if self.cache:
+            cached = self.cache.get(service)
+            if cached is not None:
+                return cached
+
         try:
-            query = "SELECT password FROM user_credentials WHERE user_id = %s AND service = %s"
+            query = """
+                SELECT id, password, ciphertext, key_version FROM user_credentials
+                WHERE user_id = %s AND service = %s
+            """
             result = self.db.execute_query(query, (self.user_id, service))
             
             if result and len(result) > 0:
-                encrypted_pwd = result[0][0]
-                decrypted_pwd = self.cipher.decrypt(encrypted_pwd.encode()).decode()
+                row_id, legacy, ciphertext, key_version = result[0]
+                _, version, cipher = self._keyring
+                plaintext = cipher.decrypt(self._unpack(ciphertext, legacy))
+                if key_version < version or ciphertext is None:
+                    self._rewrap_on_read([(row_id, plaintext, key_version)])
+                decrypted_pwd = plaintext.decode()
+                if self.cache:
+                    self.cache.put(service, decrypted_pwd)
                 return decrypted_pwd
             else:
                 print(f" Nessuna password trovata per '{service}'")
@@ -167,6 +1165,84 @@ class PasswordManager:
             print(f" Errore durante il recupero: {e}")
             return None
     
+    @staticmethod
+    def _decrypt_rows(cipher: MultiFernet, rows: list[tuple]) -> list[Optional[bytes]]:
+        plaintexts = []
+        for _, _, legacy, ciphertext, _ in rows:
+            try:
+                plaintexts.append(cipher.decrypt(Session._unpack(ciphertext, legacy)))
+            except Exception:
+                plaintexts.append(None)
+        return plaintexts
+
+    def get_passwords(self, services: Iterable[str], chunk_size: int = 500,
+                      parallel_threshold: int = 64) -> dict[str, Optional[str]]:
+        '''
+        Recupera e decifra le password di più servizi con una sola query (WHERE service IN ...).
+        I servizi in cache non vengono letti dal database; oltre `parallel_threshold` righe la
+        decifratura viene divisa tra i worker. Gli errori su una singola voce non interrompono le altre.
+
+        Parametri:
+        services (Iterable[str]) -> nomi dei servizi
+        chunk_size (int) -> numero massimo di servizi per query
+        parallel_threshold (int) -> righe oltre le quali decifrare in parallelo
+
+        Valore di ritorno:
+        dict[str, str | None] -> password decifrata per servizio, None se non trovata o illeggibile
+        '''
+        result: dict[str, Optional[str]] = dict.fromkeys(services)
+        if not self.cipher or not self.user_id:
+            print("Devi prima effettuare il login!")
+            return result
+
+        pending = []
+        for service in result:
+            cached = self.cache.get(service) if self.cache else None
+            if cached is not None:
+                result[service] = cached
+            else:
+                pending.append(service)
+
+        rows = []
+        for i in range(0, len(pending), chunk_size):
+            part = pending[i:i + chunk_size]
+            query = f"""
+                SELECT id, service, password, ciphertext, key_version FROM user_credentials
+                WHERE user_id = %s AND service IN ({", ".join(["%s"] * len(part))})
+            """
+            found = self.db.execute_query(query, (self.user_id, *part))
+            if found is None:
+                print(f" Errore durante il recupero di {len(part)} password")
+                continue
+            rows.extend(found)
+
+        _, version, cipher = self._keyring
+        if len(rows) >= parallel_threshold:
+            step = -(-len(rows) // self._worker_count)
+            parts = self._workers.map(self._decrypt_rows, [cipher] * self._worker_count,
+                                      [rows[i:i + step] for i in range(0, len(rows), step)])
+            plaintexts = [plaintext for part in parts for plaintext in part]
+        else:
+            plaintexts = self._decrypt_rows(cipher, rows)
+
+        stale = []
+        for (row_id, service, _, ciphertext, key_version), plaintext in zip(rows, plaintexts):
+            if plaintext is None:
+                print(f" Errore durante la decifratura della password di '{service}'")
+                continue
+            if key_version < version or ciphertext is None:
+                stale.append((row_id, plaintext, key_version))
+            result[service] = plaintext.decode()
+            if self.cache:
+                self.cache.put(service, result[service])
+        if stale:
+            self._rewrap_on_read(stale)
+
+        misses = sum(1 for value in result.values() if value is None)
+        if misses:
+            print(f" Nessuna password trovata per {misses} servizi su {len(result)}")
+        return result
+
     def list_services(self) -> list[tuple[int, str]]:
         '''
         Elenca tutti i servizi salvati.
@@ -188,9 +1264,91 @@ class PasswordManager:
             print(f" Errore durante il recupero dei servizi: {e}")
             return []
 
+    @staticmethod
+    def _encode_token(service: str, service_id: int) -> str:
+        return base64.urlsafe_b64encode(json.dumps([service, service_id]).encode()).decode()
+
+    @staticmethod
+    def _decode_token(token: str) -> tuple[str, int]:
+        try:
+            service, service_id = json.loads(base64.urlsafe_b64decode(token.encode()))
+        except (ValueError, TypeError, AttributeError):
+            raise ValueError("Token di continuazione non valido")
+        if not isinstance(service, str) or not isinstance(service_id, int) or isinstance(service_id, bool):
+            raise ValueError("Token di continuazione non valido")
+        return service, service_id
+
+    def list_services_page(self, after: Optional[str] = None, limit: int = 200) -> tuple[list[tuple[int, str]], Optional[str]]:
+        '''
+        Elenca una pagina di servizi salvati, ordinati per (service, id).
+        Usa la paginazione keyset: ogni pagina riparte dall'ultima riga della precedente
+        tramite l'indice, senza OFFSET, quindi il costo non cresce con la posizione nel vault.
+
+        Parametri:
+        after (str | None) -> token di continuazione restituito dalla pagina precedente (None per la prima)
+        limit (int) -> numero massimo di servizi nella pagina
+
+        Valore di ritorno:
+        tuple[list[tuple[int, str]], str | None] -> coppie (id, nome servizio) della pagina e
+            token per la pagina successiva (None se non ci sono altre pagine)
+
+        Eccezioni:
+        ValueError -> se `after` non è un token prodotto da questo metodo
+        '''
+        if not self.user_id:
+            print("Devi prima effettuare il login!")
+            return [], None
+
+        # Un token malformato è un errore del chiamante, non una pagina vuota
+        cursor = self._decode_token(after) if after is not None else None
+        try:
+            if cursor is None:
+                query = """
+                    SELECT id, service FROM user_credentials
+                    WHERE user_id = %s
+                    ORDER BY service, id LIMIT %s
+                """
+                params = (self.user_id, limit + 1)
+            else:
+                last_service, last_id = cursor
+                query = """
+                    SELECT id, service FROM user_credentials
+                    WHERE user_id = %s AND service >= %s AND (service > %s OR id > %s)
+                    ORDER BY service, id LIMIT %s
+                """
+                # "service >= %s" rende la condizione una ricerca sull'indice (user_id, service, id)
+                params = (self.user_id, last_service, last_service, last_id, limit + 1)
+            result = self.db.execute_query(query, params) or []
+            # Una riga in più dice se esiste una pagina successiva senza una query aggiuntiva
+            page = result[:limit]
+            token = self._encode_token(page[-1][1], page[-1][0]) if len(result) > limit else None
+            return page, token
+        except Exception as e:
+            print(f" Errore durante il recupero dei servizi: {e}")
+            return [], None
+
+    def iter_services(self, page_size: int = 500) -> Iterator[list[tuple[int, str]]]:
+        '''
+        Generatore che restituisce tutti i servizi dell'utente una pagina alla volta.
+
+        Parametri:
+        page_size (int) -> numero di servizi per pagina
+
+        Valore di ritorno:
+        Iterator[list[tuple[int, str]]] -> pagine di coppie (id, nome servizio)
+        '''
+        token = None
+        while True:
+            page, token = self.list_services_page(token, page_size)
+            if page:
+                yield page
+            if token is None:
+                return
+
     def search_services(self, keyword: str) -> list[tuple[int, str]]:
         '''
         Cerca servizi salvati che contengono una determinata parola chiave.
+        Se l'indice in memoria è pronto la ricerca non interroga il database.
 
         Parametri:
         keyword (str) -> testo da cercare all'interno del nome del servizio
@@ -205,14 +1363,18 @@ class PasswordManager:
             return []
 
         try:
-            query = """
-                SELECT id, service 
-                FROM user_credentials 
-                WHERE user_id = %s AND service LIKE %s 
-                ORDER BY service
-            """
-            # '%keyword%' permette di cercare la parola anche nel mezzo del nome
-            result = self.db.execute_query(query, (self.user_id, f"%{keyword}%"))
+            index = self.index
+            if index is not None:
+                result = index.search(keyword)
+            else:
+                query = """
+                    SELECT id, service 
+                    FROM user_credentials 
+                    WHERE user_id = %s AND service LIKE %s 
+                    ORDER BY service
+                """
+                # '%keyword%' permette di cercare la parola anche nel mezzo del nome
+                result = self.db.execute_query(query, (self.user_id, f"%{keyword}%"))
             
             if result and len(result) > 0:
                 print(f"Trovati {len(result)} servizi che contengono '{keyword}':")
@@ -239,14 +1401,21 @@ class PasswordManager:
             print(" Devi prima effettuare il login!")
             return False
         
+        self._invalidate(service)
+
         try:
-            encrypted_pwd = self.cipher.encrypt(new_password.encode()).decode()
-            
-            query = "UPDATE user_credentials SET password = %s WHERE user_id = %s AND service = %s"
-            self.db.cursor.execute(query, (encrypted_pwd, self.user_id, service))
-            self.db.conn.commit()
+            _, version, cipher = self._keyring
+            encrypted_pwd = self._pack(cipher.encrypt(new_password.encode()))
             
-            if self.db.cursor.rowcount > 0:
+            query = f"""
+                UPDATE user_credentials SET password = '', ciphertext = %s, key_version = %s,
+                    updated_at = {self.db.timestamp_sql}
+                WHERE user_id = %s AND service = %s
+            """
+            rowcount = self.db.execute_write(query, (encrypted_pwd, version, self.user_id, service))
+            self._invalidate(service)
+
+            if rowcount > 0:
                 print(f" Password per '{service}' aggiornata con successo!")
                 return True
             else:
@@ -270,17 +1439,21 @@ class PasswordManager:
             print(" Devi prima effettuare il login!")
             return False
         
+        self._invalidate(service)
+
         try:
             query = "DELETE FROM user_credentials WHERE user_id = %s AND service = %s"
-            self.db.cursor.execute(query, (self.user_id, service))
-            self.db.conn.commit()
-            
-            if self.db.cursor.rowcount > 0:
+            rowcount = self.db.execute_write(query, (self.user_id, service))
+            self._invalidate(service)
+
+            if rowcount > 0:
+                with self._index_lock:
+                    if self.index is not None:
+                        self.index.remove_name(service)
                 print(f" Password per '{service}' eliminata con successo!")
                 return True
             else:
                 print(f" Servizio '{service}' non trovato!")
                 return False
         except Exception as e:
-            print(f" Errore durante l'eliminazione: {e}")
-            return False
\ No newline at end of file
+            print(f" Errore durante l'eliminazione: {e}")
\ No newline at end of file
@@ -1,32 +1,45 @@
 import customtkinter as ctk
 import tkinter.ttk as ttk
 from tkinter import messagebox
+from backgroundExecutor import BackgroundExecutor
+from virtualTable import VirtualTable
 
 
 class PasswordManagerGUI:
-    def __init__(self, root, manager) -> None:
+    # Servizi caricati per ogni pagina della tabella
+    PAGE_SIZE = 200
+
+    def __init__(self, root, manager=None) -> None:
         '''
         Costruttore della classe PasswordManagerGUI.
 
         Parametri:
         root -> finestra principale Tkinter/CustomTkinter
-        manager -> istanza del gestore delle password (responsabile della logica di salvataggio e recupero)
+        manager -> istanza del gestore delle password (responsabile della logica di salvataggio e recupero);
+                   se None va collegato in seguito con `attach_manager`, e fino ad allora
+                   login e registrazione restano disabilitati
 
         Funzionamento:
         - Inizializza la finestra principale con titolo "Password Manager"
         - Definisce i frame principali (login, main, tabella, form di aggiunta e aggiornamento)
+        - Crea l'esecutore in background per le chiamate bloccanti al manager
         - Avvia la costruzione dell’interfaccia di login
         '''
         self.root = root
         self.manager = manager
         self.root.title("🔐 Password Manager")
+        self.executor = BackgroundExecutor(root, on_busy_change=self.set_busy)
 
         self.login_frame = None
         self.main_frame = None
         self.table = None
         self.add_form = None
         self.update_form = None
-
+        self.search_job = None
+        self.search_keyword = ""
+        self.next_page = None
+        self.loading_page = False
+        self.backend_status = "" if manager is not None else "Connessione al database in corso..."
 
         self.build_login_frame()
 
@@ -65,8 +78,68 @@ class PasswordManagerGUI:
         self.password_entry = ctk.CTkEntry(self.login_frame, show="*", placeholder_text="Inserisci password")
         self.password_entry.grid(row=1, column=2, padx=5, pady=5)
 
-        ctk.CTkButton(self.login_frame, text="Login", command=self.login).grid(row=2, column=1, pady=10)
-        ctk.CTkButton(self.login_frame, text="Registrati", command=self.register).grid(row=2, column=2, pady=10)
+        self.login_button = ctk.CTkButton(self.login_frame, text="Login", command=self.login)
+        self.login_button.grid(row=2, column=1, pady=10)
+        self.register_button = ctk.CTkButton(self.login_frame, text="Registrati", command=self.register)
+        self.register_button.grid(row=2, column=2, pady=10)
+        self.status_label = ctk.CTkLabel(self.login_frame, text=self.backend_status)
+        self.status_label.grid(row=3, column=1, columnspan=2, pady=5)
+        self.set_busy(self.executor.busy)
+        self.username_entry.focus_set()
+
+    def attach_manager(self, manager) -> None:
+        '''
+        Collega il gestore delle password preparato in background e abilita login e registrazione.
+
+        Parametri:
+        manager -> istanza del gestore delle password
+
+        Valore di ritorno:
+        None
+        '''
+        self.manager = manager
+        self._set_backend_status("")
+        self.set_busy(self.executor.busy)
+
+    def backend_failed(self, error: BaseException) -> None:
+        '''
+        Segnala che il gestore non è stato preparato; login e registrazione restano disabilitati.
+
+        Parametri:
+        error (BaseException) -> errore sollevato durante l'avvio in background
+
+        Valore di ritorno:
+        None
+        '''
+        self._set_backend_status("Database non disponibile")
+        messagebox.showerror("Errore", f"Impossibile avviare il gestore delle password: {error}")
+
+    def _set_backend_status(self, text: str) -> None:
+        self.backend_status = text
+        label = getattr(self, "status_label", None)
+        if label is not None and label.winfo_exists():
+            label.configure(text=text)
+
+    def set_busy(self, busy: bool) -> None:
+        '''
+        Mostra lo stato "occupato" mentre ci sono richieste in background.
+
+        Funzionamento:
+        - Imposta il cursore di attesa sulla finestra principale
+        - Disabilita i pulsanti di login e registrazione, se visibili
+          (restano disabilitati anche finché il gestore non è collegato)
+
+        Parametri:
+        busy (bool) -> True se ci sono richieste in corso
+
+        Valore di ritorno:
+        None
+        '''
+        self.root.configure(cursor="watch" if busy else "")
+        state = "disabled" if busy or self.manager is None else "normal"
+        for button in (getattr(self, "login_button", None), getattr(self, "register_button", None)):
+            if button is not None and button.winfo_exists():
+                button.configure(state=state)
 
 
     def build_main_frame(self)-> None:
@@ -79,7 +152,7 @@ class PasswordManagerGUI:
             • Sinistra: pulsanti di gestione (aggiorna, mostra, copia, elimina password, logout)
             • Destra: tabella dei servizi con pulsante per aggiungere nuove password
         - Applica uno stile scuro alla tabella (Treeview)
-        - Inizializza la tabella con le colonne "Servizio" e "Password"
+        - Inizializza la tabella virtualizzata con le colonne "Servizio" e "Password"
         - Popola la tabella con i dati salvati tramite `refresh_table`
 
         Parametri:
@@ -117,6 +190,8 @@ class PasswordManagerGUI:
         # Campo di testo accanto al pulsante di sinistra
         self.search_entry = ctk.CTkEntry(top_bar, width=200, placeholder_text="Cerca servizio...")
         self.search_entry.pack(side="left", padx=1)
+        # Ricerca mentre si digita
+        self.search_entry.bind("<KeyRelease>", self.schedule_search)
 
         # Pulsante "+" a destra
         add_button_right = ctk.CTkButton(top_bar, text="+", width=40, command=self.show_add_form)
@@ -139,9 +214,8 @@ class PasswordManagerGUI:
         style.map("Treeview", background=[("selected", "gray40")])
 
 
-        self.table = ttk.Treeview(right_frame, columns=("Servizio", "Password"), show="headings")
-        self.table.heading("Servizio", text="Servizio")
-        self.table.heading("Password", text="Password")
+        self.table = VirtualTable(right_frame, columns=("Servizio", "Password"), row_height=25)
+        self.table.on_scroll_end = self.load_more_services
         self.table.pack(fill="both", expand=True)
 
         self.refresh_table()
@@ -195,7 +269,7 @@ class PasswordManagerGUI:
         - Se entrambi i campi sono compilati:
             • Aggiunge la password tramite il manager
             • Mostra un messaggio di conferma
-            • Aggiorna la tabella dei servizi
+            • Inserisce il nuovo servizio nella tabella (se rispetta la ricerca attiva)
             • Chiude e rimuove il form di inserimento
         - Se uno dei campi è vuoto:
             • Mostra un messaggio di errore
@@ -209,10 +283,15 @@ class PasswordManagerGUI:
         service = self.new_service_entry.get()
         pwd = self.new_pwd_entry.get()
         if service and pwd:
-            added = self.manager.add_password(service, pwd)
-            if not added:
-                messagebox.showinfo("Errore", f"Password per {service} già esistente!")
-            self.refresh_table()
+            table = self.table
+
+            def done(added: bool) -> None:
+                if not added:
+                    messagebox.showinfo("Errore", f"Password per {service} già esistente!")
+                elif table is self.table and self.search_keyword.lower() in service.lower():
+                    table.insert_row(service)
+
+            self.executor.submit(self.manager.add_password, service, pwd, on_success=done)
             self.add_form.destroy()
             self.add_form = None
         else:
@@ -223,12 +302,10 @@ class PasswordManagerGUI:
         Aggiorna la tabella dei servizi mostrata nell'interfaccia.
 
         Funzionamento:
-        - Cancella tutte le righe attualmente presenti nella tabella
-        - Recupera tutti i servizi dell'utente
-        - Per ogni servizio trovato:
-            • Inserisce una nuova riga nella tabella
-            • Mostra il nome del servizio
-            • Mostra la password oscurata con asterischi
+        - Azzera la ricerca attiva
+        - Recupera in background la prima pagina dei servizi dell'utente
+        - Al termine sostituisce il contenuto della tabella tramite `fill_table`
+        - Le pagine successive vengono caricate durante lo scorrimento (`load_more_services`)
 
         Parametri:
         Nessuno
@@ -236,28 +313,88 @@ class PasswordManagerGUI:
         Valore di ritorno:
         None
         """
-        for row in self.table.get_children():
-            self.table.delete(row)
+        self.search_keyword = ""
+        self.next_page = None
+        self.loading_page = False
+        self.executor.cancel("page")
 
-        services = self.manager.list_services()
-        if services:
-            for service_id, service_name in services:
-                pwd =  "*****"
-                self.table.insert("", "end", values=(service_name, pwd))
+        def done(result: tuple[list[tuple[int, str]], str]) -> None:
+            services, self.next_page = result
+            self.fill_table(services)
 
+        self.executor.submit(self.manager.list_services_page, None, self.PAGE_SIZE, on_success=done, key="table")
+
+    def load_more_services(self) -> None:
+        '''
+        Carica in background la pagina successiva dei servizi, se esiste.
+        Viene chiamata dalla tabella quando la parte visibile si avvicina alla fine.
+
+        Parametri:
+        Nessuno
+
+        Valore di ritorno:
+        None
+        '''
+        if self.next_page is None or self.loading_page or self.search_keyword:
+            return
+        self.loading_page = True
+        table = self.table
+
+        def done(result: tuple[list[tuple[int, str]], str]) -> None:
+            self.loading_page = False
+            if table is not self.table:
+                return
+            services, self.next_page = result
+            table.append_rows(services)
+
+        def failed(error: BaseException) -> None:
+            self.loading_page = False
+            print(f"Errore durante il caricamento dei servizi: {error}")
+
+        self.executor.submit(self.manager.list_services_page, self.next_page, self.PAGE_SIZE,
+                             on_success=done, on_error=failed, key="page")
+
+    def fill_table(self, services: list[tuple[int, str]]) -> None:
+        '''
+        Sostituisce il contenuto della tabella con i servizi indicati.
+        La tabella disegna solo le righe visibili, mostrando le password oscurate con asterischi.
+
+        Parametri:
+        services (list[tuple[int, str]]) -> coppie (id, nome servizio) da mostrare
+
+        Valore di ritorno:
+        None
+        '''
+        self.table.set_rows(services or [])
+
+
+    def schedule_search(self, event=None, delay: int = 150) -> None:
+        """
+        Programma una ricerca dopo una breve pausa nella digitazione (debounce).
+
+        Funzionamento:
+        - Annulla la ricerca programmata in precedenza, se non ancora eseguita
+        - Programma `search_mode` dopo `delay` millisecondi
+
+        Parametri:
+        event -> evento Tk della tastiera (non utilizzato)
+        delay (int) -> millisecondi di attesa dopo l'ultimo tasto
+
+        Valore di ritorno:
+        None
+        """
+        if self.search_job is not None:
+            self.root.after_cancel(self.search_job)
+        self.search_job = self.root.after(delay, self.search_mode)
 
     def search_mode(self) -> None:
         """
         Filtra e mostra i servizi che contengono il testo inserito.
 
         Funzionamento:
-        - Cancella tutte le righe attualmente presenti nella tabella
         - Recupera il testo inserito nel campo di ricerca
-        - Cerca i servizi che contengono il testo specificato
-        - Per ogni servizio trovato:
-            • Inserisce una nuova riga nella tabella
-            • Mostra il nome del servizio
-            • Mostra la password oscurata con asterischi
+        - Cerca in background i servizi che contengono il testo specificato
+        - Al termine ripopola la tabella tramite `fill_table`
 
         Parametri:
         Nessuno
@@ -265,14 +402,14 @@ class PasswordManagerGUI:
         Valore di ritorno:
         None
         """
-        for row in self.table.get_children():
-            self.table.delete(row)
+        self.search_job = None
         keyword = self.search_entry.get().strip()
-        services = self.manager.search_services(keyword)
-        if services:
-            for service_id, service_name in services:
-                pwd =  "*****"
-                self.table.insert("", "end", values=(service_name, pwd))
+        self.search_keyword = keyword
+        # I risultati della ricerca sono completi: niente caricamento a pagine
+        self.next_page = None
+        self.loading_page = False
+        self.executor.cancel("page")
+        self.executor.submit(self.manager.search_services, keyword, on_success=self.fill_table, key="table")
 
     def clear_frames(self)-> None:
         '''
@@ -299,7 +436,7 @@ class PasswordManagerGUI:
 
         Funzionamento:
         - Recupera i valori inseriti nei campi di input (username e password)
-        - Chiama il metodo `login` del manager per verificare le credenziali
+        - Chiama in background il metodo `login` del manager per verificare le credenziali
         - Se il login ha successo:
             • Mostra un messaggio di conferma
             • Costruisce l’interfaccia principale tramite `build_main_frame`
@@ -314,10 +451,14 @@ class PasswordManagerGUI:
         '''
         username = self.username_entry.get()
         password = self.password_entry.get()
-        if self.manager.login(username, password):
-            self.build_main_frame()
-        else:
-            messagebox.showerror("Errore", "Credenziali non valide")
+
+        def done(logged: bool) -> None:
+            if logged:
+                self.build_main_frame()
+            else:
+                messagebox.showerror("Errore", "Credenziali non valide")
+
+        self.executor.submit(self.manager.login, username, password, on_success=done, key="auth")
 
     def register(self)-> None:
         '''
@@ -325,7 +466,7 @@ class PasswordManagerGUI:
 
         Funzionamento:
         - Recupera i valori inseriti nei campi di input (username e password)
-        - Chiama il metodo `register_user` del manager per tentare la registrazione
+        - Chiama in background il metodo `register_user` del manager per tentare la registrazione
         - Se la registrazione ha successo:
             • Mostra un messaggio di conferma
         - Se la registrazione fallisce:
@@ -339,10 +480,14 @@ class PasswordManagerGUI:
         '''
         username = self.username_entry.get()
         password = self.password_entry.get()
-        if self.manager.register_user(username, password):
-            messagebox.showinfo("Successo", "Registrazione completata!")
-        else:
-            messagebox.showerror("Errore", "Registrazione fallita")
+
+        def done(registered: bool) -> None:
+            if registered:
+                messagebox.showinfo("Successo", "Registrazione completata!")
+            else:
+                messagebox.showerror("Errore", "Registrazione fallita")
+
+        self.executor.submit(self.manager.register_user, username, password, on_success=done, key="auth")
 
     def show_update_form(self)-> None:
         '''
@@ -362,13 +507,11 @@ class PasswordManagerGUI:
         Valore di ritorno:
         None
         '''
-        selected = self.table.selection()
-        if not selected:
+        service = self.table.selected_service()
+        if service is None:
             messagebox.showerror("Errore", "Seleziona un servizio dalla tabella")
             return
 
-        service = self.table.item(selected[0])["values"][0]
-
         # Se esiste già un form, lo distruggo
         if self.update_form:
             self.update_form.destroy()
@@ -407,24 +550,23 @@ class PasswordManagerGUI:
         Valore di ritorno:
         None
         '''
-        selected = self.table.selection()
-        if not selected:
+        service = self.table.selected_service()
+        if service is None:
             messagebox.showerror("Errore", "Seleziona un servizio dalla tabella")
             return
-        item_id = selected[0]  # salvo l'ID dell'elemento
-
-        service = self.table.item(item_id)["values"][0]
-        pwd =self.manager.get_password(service)
-        self.table.item(item_id, values=(service, pwd))
-        # Dopo 5 secondi torna a nasconderla
-        self.root.after(
-            4000,
-            lambda: (
-                self.table.item(item_id, values=(service, "*****"))
-                if item_id in self.table.get_children()
-                else None
+        table = self.table
+
+        def done(pwd) -> None:
+            if pwd is None or table is not self.table:
+                return
+            table.reveal(service, pwd)
+            # Dopo 4 secondi torna a nasconderla
+            self.root.after(
+                4000,
+                lambda: table.conceal(service) if table is self.table else None
             )
-    )
+
+        self.executor.submit(self.manager.get_password, service, on_success=done, key="reveal")
 
 
     def copy_password(self)-> None:
@@ -448,15 +590,19 @@ class PasswordManagerGUI:
         Valore di ritorno:
         None
         '''
-        selected = self.table.selection()
-        if not selected:
+        service = self.table.selected_service()
+        if service is None:
             messagebox.showerror("Errore", "Seleziona un servizio dalla tabella")
             return
-        service = self.table.item(selected[0])["values"][0]
-        pwd =self.manager.get_password(service)
-        self.root.clipboard_clear()
-        self.root.clipboard_append(pwd)
-        self.root.update()
+
+        def done(pwd) -> None:
+            if pwd is None:
+                return
+            self.root.clipboard_clear()
+            self.root.clipboard_append(pwd)
+            self.root.update()
+
+        self.executor.submit(self.manager.get_password, service, on_success=done, key="copy")
 
 
     def save_updated_password(self)-> None:
@@ -473,7 +619,7 @@ class PasswordManagerGUI:
             • Se la nuova password è valida:
                 ◦ Aggiorna la password tramite il manager
                 ◦ Mostra un messaggio di conferma
-                ◦ Aggiorna la tabella dei servizi
+                ◦ Nasconde l'eventuale vecchia password mostrata nella tabella
                 ◦ Chiude e rimuove il form di aggiornamento
             • Se la nuova password non è stata inserita:
                 ◦ Mostra un messaggio di errore
@@ -484,15 +630,15 @@ class PasswordManagerGUI:
         Valore di ritorno:
         None
         '''
-        selected = self.table.selection()
-        if not selected:
+        service = self.table.selected_service()
+        if service is None:
             messagebox.showerror("Errore", "Seleziona un servizio dalla tabella")
             return
-        service = self.table.item(selected[0])["values"][0]
         new_pwd = self.update_pwd_entry.get()
         if new_pwd:
-            self.manager.update_password(service, new_pwd)
-            self.refresh_table()
+            table = self.table
+            self.executor.submit(self.manager.update_password, service, new_pwd,
+                                 on_success=lambda updated: table.conceal(service) if table is self.table else None)
             self.update_form.destroy()
             self.update_form = None
         else:
@@ -510,7 +656,7 @@ class PasswordManagerGUI:
         - Se un servizio è selezionato:
             • Recupera il nome del servizio dalla tabella
             • Elimina la password corrispondente tramite il manager
-            • Aggiorna la tabella per riflettere la modifica
+            • Rimuove dalla tabella solo la riga eliminata
 
         Parametri:
         Nessuno
@@ -519,22 +665,28 @@ class PasswordManagerGUI:
         None
 
         '''
-        selected = self.table.selection()
-        if not selected:
+        service = self.table.selected_service()
+        if service is None:
             messagebox.showerror("Errore", "Seleziona un servizio dalla tabella")
             return
-        service = self.table.item(selected[0])["values"][0]
-        self.manager.delete_password(service)
-        self.refresh_table()
+        table = self.table
+
+        def done(deleted: bool) -> None:
+            if deleted and table is self.table:
+                table.remove_row(service)
+
+        self.executor.submit(self.manager.delete_password, service, on_success=done)
 
     def logout(self)-> None:
         '''
         Esegue il logout dell’utente corrente.
 
         Funzionamento:
-        - Reimposta i dati sensibili del manager:
+        - Scarta le richieste in background ancora in corso
+        - Reimposta i dati sensibili del manager tramite `logout`:
             • `user_id` viene azzerato
             • `cipher` viene rimosso
+            • la cache delle password decifrate viene svuotata
         - Mostra un messaggio di conferma del logout
         - Ricostruisce l’interfaccia di login tramite `build_login_frame`
 
@@ -544,7 +696,7 @@ class PasswordManagerGUI:
         Valore di ritorno:
         None
         '''
-        self.manager.user_id = None
-        self.manager.cipher = None
+        self.executor.cancel_all()
+        self.manager.logout()
         self.build_login_frame()
 
@@ -0,0 +1,267 @@
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from typing import Optional, Any, Callable, Iterable
+from dotenv import load_dotenv
+
+# Metodi strumentati in modalità profiling
+MANAGER_ACTIONS = (
+    "register_user", "open_session", "login", "logout", "add_password", "upsert_password", "import_credentials",
+    "get_password", "get_passwords", "list_services_page", "search_services", "update_password",
+    "delete_password", "export_vault", "import_vault", "change_master_password", "rotate_key",
+)
+SESSION_ACTIONS = (
+    "add_password", "upsert_password", "import_credentials", "get_password", "get_passwords",
+    "list_services_page", "search_services", "update_password", "delete_password", "export_vault",
+    "import_vault", "change_master_password", "rotate_key", "close",
+)
+GUI_ACTIONS = (
+    "login", "register", "refresh_table", "load_more_services", "fill_table", "search_mode",
+    "save_new_password", "show_password", "copy_password", "save_updated_password", "delete_password",
+    "logout", "build_main_frame",
+)
+SECURITY_DETAILS = ("hash_password", "verify_password", "derive_key", "needs_rehash")
+FERNET_DETAILS = ("encrypt", "decrypt", "rotate")
+
+
+class _ActionStats:
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+class Profiler:
+    def __init__(self, trace_path: str = "profile-trace.jsonl", output_dir: str = "profiles",
+                 cprofile_actions: Iterable[str] = (), tracemalloc_actions: Iterable[str] = (),
+                 tracemalloc_top: int = 10) -> None:
+        '''
+        Costruttore della classe Profiler.
+        Misura le azioni strumentate (metodi del gestore, callback della GUI) e scrive una riga JSON
+        per ogni azione nel file di trace, con la durata e il tempo speso nelle operazioni di dettaglio
+        (KDF, Fernet) eseguite al suo interno. Per le azioni indicate può salvare un profilo cProfile
+        e le allocazioni più pesanti rilevate da tracemalloc.
+
+        Parametri:
+        trace_path (str) -> file JSON lines in cui aggiungere le trace
+        output_dir (str) -> cartella dei profili cProfile (.prof, leggibili con pstats o snakeviz)
+        cprofile_actions (Iterable[str]) -> azioni da profilare con cProfile ("*" per tutte)
+        tracemalloc_actions (Iterable[str]) -> azioni di cui misurare le allocazioni ("*" per tutte)
+        tracemalloc_top (int) -> righe di codice riportate per le allocazioni
+        '''
+        self.trace_path = trace_path
+        self.output_dir = output_dir
+        self.cprofile_actions = set(cprofile_actions)
+        self.tracemalloc_actions = set(tracemalloc_actions)
+        self.tracemalloc_top = tracemalloc_top
+        self._stats: dict[str, _ActionStats] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._profiling = False   # cProfile ammette un solo profilo attivo alla volta
+        self._patched: list[tuple[Any, str, Any]] = []
+        self._trace = open(trace_path, "a", encoding="utf-8")
+
+    @classmethod
+    def from_env(cls, enabled: bool = False, **overrides) -> Optional["Profiler"]:
+        '''
+        Crea il profiler se la modalità profiling è attiva (PM_PROFILE=1 oppure `enabled`).
+        Configurazione: PM_PROFILE_TRACE, PM_PROFILE_DIR, PM_PROFILE_CPROFILE e PM_PROFILE_TRACEMALLOC
+        (elenchi di azioni separati da virgole, ad esempio "manager.login,gui.refresh_table").
+
+        Parametri:
+        enabled (bool) -> True per attivare il profiling indipendentemente da PM_PROFILE
+        overrides -> argomenti del costruttore che hanno la precedenza sulle variabili d'ambiente
+
+        Valore di ritorno:
+        Profiler -> profiler pronto da installare
+        None -> se la modalità profiling non è attiva
+        '''
+        load_dotenv()
+        if not enabled and os.getenv("PM_PROFILE", "").lower() not in ("1", "true", "yes"):
+            return None
+
+        def actions(name: str) -> list[str]:
+            return [action.strip() for action in os.getenv(name, "").split(",") if action.strip()]
+
+        options = {
+            "trace_path": os.getenv("PM_PROFILE_TRACE", "profile-trace.jsonl"),
+            "output_dir": os.getenv("PM_PROFILE_DIR", "profiles"),
+            "cprofile_actions": actions("PM_PROFILE_CPROFILE"),
+            "tracemalloc_actions": actions("PM_PROFILE_TRACEMALLOC"),
+        }
+        options.update({key: value for key, value in overrides.items() if value is not None})
+        return cls(**options)
+
+    def _wants(self, selected: set[str], action: str) -> bool:
+        return "*" in selected or action in selected
+
+    def wrap(self, action: str, fn: Callable, detail: bool = False) -> Callable:
+        '''
+        Restituisce `fn` avvolta da un timer.
+        Un'azione chiamata fuori da altre azioni dello stesso thread scrive una riga di trace;
+        le operazioni di dettaglio non scrivono trace proprie ma vengono sommate all'azione che le contiene.
+
+        Parametri:
+        action (str) -> nome dell'azione (ad esempio "manager.login")
+        fn (Callable) -> funzione da misurare
+        detail (bool) -> True per le operazioni frequenti (KDF, Fernet)
+
+        Valore di ritorno:
+        Callable -> funzione strumentata
+        '''
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            stack = getattr(self._local, "stack", None)
+            if stack is None:
+                stack = self._local.stack = []
+            top_level = not stack and not detail
+            frame = {"action": action, "details": {}}
+            stack.append(frame)
+            profile = snapshot = None
+            if top_level and self._wants(self.cprofile_actions, action):
+                with self._lock:
+                    if not self._profiling:
+                        profile = cProfile.Profile()
+                        self._profiling = True
+            if top_level and self._wants(self.tracemalloc_actions, action):
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                snapshot = tracemalloc.take_snapshot()
+            start = time.perf_counter()
+            error = None
+            try:
+                if profile is not None:
+                    return profile.runcall(fn, *args, **kwargs)
+                return fn(*args, **kwargs)
+            except BaseException as e:
+                error = type(e).__name__
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                stack.pop()
+                self._account(action, elapsed)
+                if stack:
+                    details = stack[-1]["details"]
+                    details[action] = details.get(action, 0.0) + elapsed
+                if top_level:
+                    if profile is not None:
+                        self._profiling = False
+                    self._write_trace(frame, elapsed, error, profile, snapshot)
+
+        return timed
+
+    def _account(self, action: str, elapsed: float) -> None:
+        with self._lock:
+            stats = self._stats.get(action)
+            if stats is None:
+                stats = self._stats[action] = _ActionStats()
+            stats.count += 1
+            stats.total += elapsed
+            stats.max = max(stats.max, elapsed)
+
+    def _write_trace(self, frame: dict, elapsed: float, error: Optional[str],
+                     profile: Optional[cProfile.Profile], snapshot) -> None:
+        record = {
+            "action": frame["action"],
+            "start": time.time() - elapsed,
+            "ms": round(elapsed * 1000, 3),
+            "thread": threading.current_thread().name,
+            "details_ms": {name: round(seconds * 1000, 3) for name, seconds in frame["details"].items()},
+        }
+        if error:
+            record["error"] = error
+        if profile is not None:
+            os.makedirs(self.output_dir, exist_ok=True)
+            path = os.path.join(self.output_dir, f"{frame['action']}-{time.strftime('%Y%m%d-%H%M%S')}-{id(profile):x}.prof")
+            profile.dump_stats(path)
+            record["cprofile"] = path
+        if snapshot is not None:
+            diff = tracemalloc.take_snapshot().compare_to(snapshot, "lineno")[:self.tracemalloc_top]
+            record["allocations"] = [{"where": str(stat.traceback), "kib": round(stat.size_diff / 1024, 1),
+                                      "count": stat.count_diff} for stat in diff]
+        line = json.dumps(record)
+        with self._lock:
+            self._trace.write(line + "\n")
+            self._trace.flush()
+
+    def _patch(self, owner: Any, name: str, action: str, detail: bool = False) -> None:
+        original = owner.__dict__.get(name) if isinstance(owner, type) else getattr(owner, name, None)
+        if original is None:
+            return
+        if isinstance(original, staticmethod):
+            replacement = staticmethod(self.wrap(action, original.__func__, detail))
+        else:
+            replacement = self.wrap(action, original, detail)
+        setattr(owner, name, replacement)
+        self._patched.append((owner, name, original))
+
+    def instrument(self, owner: Any, names: Iterable[str], prefix: str, detail: bool = False) -> None:
+        '''
+        Sostituisce i metodi indicati di una classe (o di un oggetto) con le versioni strumentate.
+        Strumentare la classe prima di creare le istanze copre anche i callback già collegati ai widget.
+
+        Parametri:
+        owner -> classe oppure oggetto da strumentare
+        names (Iterable[str]) -> nomi dei metodi
+        prefix (str) -> prefisso del nome delle azioni (ad esempio "gui")
+        detail (bool) -> True per le operazioni frequenti, che non scrivono trace proprie
+        '''
+        for name in names:
+            self._patch(owner, name, f"{prefix}.{name}", detail)
+
+    def install(self) -> None:
+        '''
+        Strumenta gestore, sessioni, interfaccia grafica, KDF e Fernet con le azioni predefinite.
+
+        Valore di ritorno:
+        None
+        '''
+        from cryptography.fernet import MultiFernet
+        from passwordManager import PasswordManager, Session
+        from passwordManagerGUI import PasswordManagerGUI
+        from security import SecurityUtils
+        self.instrument(PasswordManager, MANAGER_ACTIONS, "manager")
+        self.instrument(Session, SESSION_ACTIONS, "session")
+        self.instrument(PasswordManagerGUI, GUI_ACTIONS, "gui")
+        self.instrument(SecurityUtils, SECURITY_DETAILS, "kdf", detail=True)
+        self.instrument(MultiFernet, FERNET_DETAILS, "fernet", detail=True)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        '''
+        Riepilogo per azione di tutte le chiamate misurate.
+
+        Valore di ritorno:
+        dict[str, dict[str, float]] -> count, total_ms, mean_ms e max_ms per azione
+        '''
+        with self._lock:
+            return {
+                action: {"count": s.count, "total_ms": round(s.total * 1000, 3),
+                         "mean_ms": round(s.total * 1000 / s.count, 3), "max_ms": round(s.max * 1000, 3)}
+                for action, s in sorted(self._stats.items(), key=lambda item: -item[1].total)
+            }
+
+    def close(self) -> None:
+        '''
+        Ripristina i metodi originali, aggiunge il riepilogo al file di trace e lo chiude.
+
+        Valore di ritorno:
+        None
+        '''
+        for owner, name, original in reversed(self._patched):
+            setattr(owner, name, original)
+        self._patched.clear()
+        summary = self.summary()
+        with self._lock:
+            self._trace.write(json.dumps({"summary": summary}) + "\n")
+            self._trace.close()
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        print(f"Trace di profiling salvata in '{self.trace_path}'")
+        for action, stats in list(summary.items())[:10]:
+            print(f"  {action}: {stats['count']} chiamate, {stats['total_ms']} ms totali, max {stats['max_ms']} ms")
@@ -0,0 +1,228 @@
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Optional, Any, Iterator
+from dotenv import load_dotenv
+
+# Limiti superiori (secondi) dei bucket degli istogrammi di latenza, come negli istogrammi Prometheus
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_SPACES = re.compile(r"\s+")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*%s(?:\s*,\s*%s)*\s*\)")
+
+
+@lru_cache(maxsize=1024)
+def normalize_query(query: str) -> str:
+    '''
+    Riduce una query alla sua forma normalizzata: spazi compattati e liste di segnaposto
+    (ad esempio `IN (%s, %s, ...)` o i VALUES di una INSERT) ridotte a `(...)`, così query
+    che differiscono solo per il numero di parametri finiscono nello stesso istogramma.
+
+    Parametri:
+    query (str) -> query SQL con segnaposto `%s`
+
+    Valore di ritorno:
+    str -> query normalizzata
+    '''
+    return _PLACEHOLDER_LIST.sub("(...)", _SPACES.sub(" ", query).strip())
+
+
+class _Sample:
+    __slots__ = ("rows",)
+
+    def __init__(self) -> None:
+        self.rows = 0
+
+
+class _QueryMetrics:
+    __slots__ = ("count", "errors", "rows", "total", "max", "buckets")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.errors = 0
+        self.rows = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)   # l'ultimo bucket è +Inf
+
+
+class QueryStats:
+    def __init__(self, slow_threshold: Optional[float] = None, slow_log: Optional[str] = None) -> None:
+        '''
+        Costruttore della classe QueryStats.
+        Raccoglie, per ogni query normalizzata, numero di esecuzioni, errori, righe, tempo totale,
+        tempo massimo e istogramma delle latenze; le istruzioni più lente della soglia vengono
+        registrate nel log delle query lente.
+
+        Parametri:
+        slow_threshold (float | None) -> secondi oltre cui un'istruzione è considerata lenta (None per disattivare)
+        slow_log (str | None) -> file a cui aggiungere le query lente; se None vengono stampate
+        '''
+        self.slow_threshold = slow_threshold
+        self.slow_log = slow_log
+        self.slow_queries = 0
+        self._metrics: dict[str, _QueryMetrics] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "QueryStats":
+        '''
+        Crea le statistiche leggendo la configurazione da variabili d'ambiente (.env):
+        DB_SLOW_QUERY_MS (soglia in millisecondi, default 200; 0 per disattivare) e DB_SLOW_QUERY_LOG.
+
+        Valore di ritorno:
+        QueryStats -> statistiche vuote
+        '''
+        load_dotenv()
+        threshold_ms = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+        return cls(threshold_ms / 1000 if threshold_ms > 0 else None, os.getenv("DB_SLOW_QUERY_LOG") or None)
+
+    @contextmanager
+    def measure(self, query: str) -> Iterator[_Sample]:
+        '''
+        Context manager che misura l'esecuzione di un'istruzione.
+        Il blocco può impostare `sample.rows` con le righe lette o modificate;
+        un'eccezione viene conteggiata come errore e propagata.
+
+        Parametri:
+        query (str) -> istruzione SQL eseguita nel blocco
+
+        Valore di ritorno:
+        _Sample -> campione su cui impostare il numero di righe
+        '''
+        sample = _Sample()
+        start = time.perf_counter()
+        try:
+            yield sample
+        except BaseException:
+            self.record(query, time.perf_counter() - start, 0, error=True)
+            raise
+        self.record(query, time.perf_counter() - start, sample.rows)
+
+    def record(self, query: str, seconds: float, rows: int = 0, error: bool = False) -> None:
+        '''
+        Registra una singola esecuzione.
+
+        Parametri:
+        query (str) -> istruzione SQL eseguita
+        seconds (float) -> durata in secondi
+        rows (int) -> righe lette o modificate
+        error (bool) -> True se l'istruzione è fallita
+        '''
+        key = normalize_query(query)
+        bucket = len(BUCKETS)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                bucket = i
+                break
+        with self._lock:
+            metrics = self._metrics.get(key)
+            if metrics is None:
+                metrics = self._metrics[key] = _QueryMetrics()
+            metrics.count += 1
+            metrics.errors += error
+            metrics.rows += max(rows, 0)
+            metrics.total += seconds
+            metrics.max = max(metrics.max, seconds)
+            metrics.buckets[bucket] += 1
+            slow = self.slow_threshold is not None and seconds >= self.slow_threshold
+            if slow:
+                self.slow_queries += 1
+        if slow:
+            self._log_slow(key, seconds, rows, error)
+
+    def _log_slow(self, query: str, seconds: float, rows: int, error: bool) -> None:
+        line = (f"{time.strftime('%Y-%m-%d %H:%M:%S')} {seconds * 1000:.1f} ms rows={rows}"
+                f"{' error' if error else ''} {query}")
+        if self.slow_log is None:
+            print(f"Query lenta: {line}")
+            return
+        try:
+            with open(self.slow_log, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            print(f"Errore durante la scrittura del log delle query lente: {e}")
+
+    def snapshot(self) -> dict[str, Any]:
+        '''
+        Copia coerente dei contatori raccolti.
+
+        Valore di ritorno:
+        dict[str, Any] -> slow_queries e, per ogni query normalizzata, count, errors, rows,
+            total_seconds, max_seconds e buckets (conteggi non cumulativi, con limite "+Inf" finale)
+        '''
+        with self._lock:
+            queries = {
+                query: {
+                    "count": m.count,
+                    "errors": m.errors,
+                    "rows": m.rows,
+                    "total_seconds": m.total,
+                    "max_seconds": m.max,
+                    "buckets": dict(zip([str(b) for b in BUCKETS] + ["+Inf"], m.buckets)),
+                }
+                for query, m in self._metrics.items()
+            }
+            return {"slow_queries": self.slow_queries, "queries": queries}
+
+    def reset(self) -> None:
+        '''
+        Azzera tutti i contatori.
+
+        Valore di ritorno:
+        None
+        '''
+        with self._lock:
+            self._metrics.clear()
+            self.slow_queries = 0
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        '''
+        Esporta i contatori in JSON.
+
+        Parametri:
+        indent (int | None) -> indentazione del JSON
+
+        Valore di ritorno:
+        str -> snapshot in formato JSON
+        '''
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self, prefix: str = "password_manager_db") -> str:
+        '''
+        Esporta i contatori nel formato di testo di Prometheus.
+
+        Parametri:
+        prefix (str) -> prefisso dei nomi delle metriche
+
+        Valore di ritorno:
+        str -> metriche in formato di esposizione Prometheus
+        '''
+        snapshot = self.snapshot()
+        lines = [
+            f"# HELP {prefix}_query_duration_seconds Durata delle istruzioni SQL.",
+            f"# TYPE {prefix}_query_duration_seconds histogram",
+        ]
+        counters = {"rows": [], "errors": []}
+        for query, m in snapshot["queries"].items():
+            label = 'query="' + query.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+            cumulative = 0
+            for bound, count in m["buckets"].items():
+                cumulative += count
+                lines.append(f'{prefix}_query_duration_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f"{prefix}_query_duration_seconds_sum{{{label}}} {m['total_seconds']}")
+            lines.append(f"{prefix}_query_duration_seconds_count{{{label}}} {m['count']}")
+            counters["rows"].append(f"{prefix}_query_rows_total{{{label}}} {m['rows']}")
+            counters["errors"].append(f"{prefix}_query_errors_total{{{label}}} {m['errors']}")
+        lines += [f"# HELP {prefix}_query_rows_total Righe lette o modificate.",
+                  f"# TYPE {prefix}_query_rows_total counter"] + counters["rows"]
+        lines += [f"# HELP {prefix}_query_errors_total Istruzioni SQL fallite.",
+                  f"# TYPE {prefix}_query_errors_total counter"] + counters["errors"]
+        lines += [f"# HELP {prefix}_slow_queries_total Istruzioni oltre la soglia del log delle query lente.",
+                  f"# TYPE {prefix}_slow_queries_total counter",
+                  f"{prefix}_slow_queries_total {snapshot['slow_queries']}"]
+        return "\n".join(lines) + "\n"
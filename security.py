@@ -1,12 +1,29 @@
 import base64
+import json
 import os
+import socket
+import time
+from functools import lru_cache
+from typing import Optional
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from argon2 import PasswordHasher
 from argon2.exceptions import VerifyMismatchError
 
 
+@lru_cache(maxsize=8)
+def _hasher(time_cost: int, memory_cost: int, parallelism: int) -> PasswordHasher:
+    # PasswordHasher è immutabile: un'istanza per combinazione di parametri basta
+    return PasswordHasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+
+
 class SecurityUtils:
+    # Parametri storici: Argon2 (time_cost, memory_cost in KiB, parallelism) e iterazioni PBKDF2
+    DEFAULT_KDF_PARAMS = {"time_cost": 2, "memory_cost": 65536, "parallelism": 4, "iterations": 100000}
+    # Valori minimi che la calibrazione non scende mai sotto
+    MIN_MEMORY_COST = 19456
+    MIN_ITERATIONS = 100000
+
     @staticmethod
     def generate_salt(length: int = 16) -> bytes:
         '''
@@ -21,13 +38,14 @@ class SecurityUtils:
         return os.urandom(length)
 
     @staticmethod
-    def derive_key(master_password: str, salt: bytes) -> bytes:
+    def derive_key(master_password: str, salt: bytes, iterations: int = 100000) -> bytes:
         '''
         Genera una chiave derivata a partire dalla master password e da un salt.
 
         Parametri:
         master_password (str) -> password principale dell'utente
         salt (bytes) -> valore salt da utilizzare per la derivazione
+        iterations (int) -> iterazioni PBKDF2 (salvate per utente nella tabella users)
 
         Valore di ritorno:
         bytes -> chiave derivata codificata in base64 urlsafe
@@ -36,24 +54,25 @@ class SecurityUtils:
             algorithm=hashes.SHA256(),
             length=32,
             salt=salt,
-            iterations=100000,
+            iterations=iterations,
         )
         key = base64.urlsafe_b64encode(kdf.derive(master_password.encode()))
         return key
 
     @staticmethod
-    def hash_password(password: str) -> str:
+    def hash_password(password: str, params: Optional[dict] = None) -> str:
         '''
         Calcola l'hash Argon2 della password.
 
         Parametri:
         password (str) -> password in chiaro
+        params (dict | None) -> parametri KDF (vedi DEFAULT_KDF_PARAMS)
 
         Valore di ritorno:
-        str -> hash Argon2 serializzato (include salt + hash)
+        str -> hash Argon2 serializzato (include salt, parametri e hash)
         '''
-        ph = PasswordHasher(time_cost=2, memory_cost=65536, parallelism=4)
-        return ph.hash(password)
+        p = params or SecurityUtils.DEFAULT_KDF_PARAMS
+        return _hasher(p["time_cost"], p["memory_cost"], p["parallelism"]).hash(password)
     
     @staticmethod
     def verify_password(password: str, stored_hash: str) -> bool:
@@ -67,9 +86,106 @@ class SecurityUtils:
         Valore di ritorno:
         bool -> True se combaciano, False altrimenti
         '''
-        ph = PasswordHasher(time_cost=2, memory_cost=65536, parallelism=4)
+        # I parametri usati per la verifica sono quelli codificati nell'hash
+        p = SecurityUtils.DEFAULT_KDF_PARAMS
         try:
-            ph.verify(stored_hash, password)
+            _hasher(p["time_cost"], p["memory_cost"], p["parallelism"]).verify(stored_hash, password)
             return True
         except VerifyMismatchError:
-            return False
\ No newline at end of file
+            return False
+
+    @staticmethod
+    def needs_rehash(stored_hash: str, params: Optional[dict] = None) -> bool:
+        '''
+        Controlla se un hash Argon2 è stato calcolato con parametri diversi da quelli attuali.
+
+        Parametri:
+        stored_hash (str) -> hash Argon2 salvato nel DB
+        params (dict | None) -> parametri KDF attuali (vedi DEFAULT_KDF_PARAMS)
+
+        Valore di ritorno:
+        bool -> True se l'hash va ricalcolato
+        '''
+        p = params or SecurityUtils.DEFAULT_KDF_PARAMS
+        return _hasher(p["time_cost"], p["memory_cost"], p["parallelism"]).check_needs_rehash(stored_hash)
+
+    @staticmethod
+    def calibrate_kdf(target_ms: float = 500, max_memory_kib: int = 65536, parallelism: Optional[int] = None) -> dict:
+        '''
+        Misura questa macchina e sceglie i parametri KDF per una latenza obiettivo.
+        Argon2 e PBKDF2 girano in parallelo durante il login, quindi ciascuno può usare
+        l'intero budget di tempo. I valori non scendono mai sotto i minimi di sicurezza.
+
+        Parametri:
+        target_ms (float) -> latenza obiettivo in millisecondi per ciascuna KDF
+        max_memory_kib (int) -> memoria massima in KiB per un hash Argon2
+        parallelism (int | None) -> thread Argon2 (default: core disponibili, massimo 4)
+
+        Valore di ritorno:
+        dict -> parametri KDF nello stesso formato di DEFAULT_KDF_PARAMS
+        '''
+        target = target_ms / 1000
+        lanes = parallelism or min(4, os.cpu_count() or 1)
+        memory_cost = max(SecurityUtils.MIN_MEMORY_COST, max_memory_kib)
+
+        def argon2_seconds(t: int, m: int) -> float:
+            start = time.perf_counter()
+            PasswordHasher(time_cost=t, memory_cost=m, parallelism=lanes).hash("calibration")
+            return time.perf_counter() - start
+
+        # Argon2: si parte dal budget di memoria e lo si riduce solo se un solo passaggio è già troppo lento
+        while argon2_seconds(1, memory_cost) > target and memory_cost // 2 >= SecurityUtils.MIN_MEMORY_COST:
+            memory_cost //= 2
+        # poi si aumenta time_cost finché si resta nella latenza obiettivo
+        time_cost = 1
+        while time_cost < 32 and argon2_seconds(time_cost + 1, memory_cost) <= target:
+            time_cost += 1
+
+        # PBKDF2: costo lineare nelle iterazioni, basta un campione
+        sample = 20000
+        start = time.perf_counter()
+        PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=b"\0" * 16, iterations=sample).derive(b"calibration")
+        per_iteration = (time.perf_counter() - start) / sample
+        iterations = int(target / per_iteration) // 1000 * 1000
+
+        return {
+            "time_cost": time_cost,
+            "memory_cost": memory_cost,
+            "parallelism": lanes,
+            "iterations": max(SecurityUtils.MIN_ITERATIONS, iterations),
+        }
+
+    @staticmethod
+    def host_kdf_params(db, target_ms: float, max_memory_kib: int = 65536, recalibrate: bool = False) -> dict:
+        '''
+        Parametri KDF calibrati per questa macchina, salvati nella tabella settings.
+        La calibrazione richiede alcuni secondi e i suoi risultati variano di poco a ogni misura
+        (ogni variazione farebbe ricalcolare gli hash al login): viene quindi eseguita solo la prima
+        volta, quando cambiano latenza obiettivo o memoria massima, oppure su richiesta.
+
+        Parametri:
+        db (StorageEngine) -> motore di persistenza aperto
+        target_ms (float) -> latenza obiettivo in millisecondi per ciascuna KDF
+        max_memory_kib (int) -> memoria massima in KiB per un hash Argon2
+        recalibrate (bool) -> se True misura di nuovo la macchina anche se esistono parametri salvati
+
+        Valore di ritorno:
+        dict -> parametri KDF nello stesso formato di DEFAULT_KDF_PARAMS
+        '''
+        name = f"kdf_params:{socket.gethostname()}"
+        target = {"target_ms": target_ms, "max_memory_kib": max_memory_kib}
+        if not recalibrate:
+            result = db.execute_query("SELECT value FROM settings WHERE name = %s", (name,))
+            if result:
+                stored = json.loads(result[0][0])
+                if stored.get("target") == target:
+                    return stored["params"]
+
+        params = SecurityUtils.calibrate_kdf(target_ms, max_memory_kib)
+        try:
+            query = db.upsert_query("settings", ("name", "value"), ("name",), ("value",))
+            db.execute_write(query, (name, json.dumps({"target": target, "params": params})))
+            print(f"Parametri KDF calibrati per questa macchina: {params}")
+        except Exception as e:
+            print(f"Errore durante il salvataggio dei parametri KDF: {e}")
+        return params
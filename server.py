@@ -0,0 +1,482 @@
+# ---------------- SERVER ----------------
+import argparse
+import asyncio
+import json
+import os
+import secrets
+import sys
+import time
+from http import HTTPStatus
+from typing import Optional, Any, Callable
+from urllib.parse import urlsplit, parse_qs, unquote
+from storage import StorageEngine, create_storage
+from passwordManager import PasswordManager
+from asyncPasswordManager import AsyncPasswordManager, AsyncSession
+from security import SecurityUtils
+
+LOCAL_HOSTS = ("127.0.0.1", "::1", "localhost")
+MAX_BODY = 1024 * 1024
+MAX_HEADERS = 100
+# Login falliti consentiti per utente prima del blocco, e durata massima del blocco in secondi
+LOGIN_FREE_ATTEMPTS = 5
+LOGIN_MAX_DELAY = 300
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class _Request:
+    __slots__ = ("method", "path", "query", "headers", "body", "keep_alive")
+
+    def __init__(self, method: str, target: str, version: str, headers: dict[str, str], body: bytes) -> None:
+        url = urlsplit(target)
+        self.method = method
+        self.path = url.path
+        self.query = {name: values[0] for name, values in parse_qs(url.query).items()}
+        self.headers = headers
+        self.body = body
+        connection = headers.get("connection", "").lower()
+        self.keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+
+    def json(self) -> dict[str, Any]:
+        if not self.body:
+            return {}
+        try:
+            data = json.loads(self.body)
+        except ValueError:
+            raise HTTPError(400, "JSON non valido")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "Il corpo della richiesta deve essere un oggetto JSON")
+        return data
+
+    def field(self, data: dict[str, Any], name: str) -> str:
+        value = data.get(name)
+        if not isinstance(value, str):
+            raise HTTPError(400, f"Campo '{name}' mancante")
+        return value
+
+
+class _LoginThrottle:
+    def __init__(self, free_attempts: int = LOGIN_FREE_ATTEMPTS, max_delay: float = LOGIN_MAX_DELAY) -> None:
+        '''
+        Costruttore della classe _LoginThrottle.
+        Limita i tentativi di login per username: dopo `free_attempts` fallimenti consecutivi
+        ogni nuovo tentativo viene rifiutato per un tempo che raddoppia a ogni fallimento.
+        Anche i tentativi in corso contano, così richieste parallele non aggirano il limite.
+
+        Parametri:
+        free_attempts (int) -> fallimenti consentiti prima del blocco
+        max_delay (float) -> durata massima del blocco in secondi
+        '''
+        self.free_attempts = free_attempts
+        self.max_delay = max_delay
+        self._failures: dict[str, tuple[int, float]] = {}   # username -> (fallimenti, bloccato fino a)
+        self._pending: dict[str, int] = {}
+
+    def begin(self, username: str) -> None:
+        '''Registra un tentativo, oppure solleva HTTPError 429 se l'utente è bloccato.'''
+        failures, until = self._failures.get(username, (0, 0.0))
+        pending = self._pending.get(username, 0)
+        wait = until - time.monotonic()
+        # Finito il blocco si accetta un tentativo alla volta finché non va a buon fine
+        if wait > 0 or failures + pending >= self.free_attempts and (failures < self.free_attempts or pending):
+            raise HTTPError(429, f"Troppi tentativi di login: riprova tra {max(1, int(wait) + 1)} secondi")
+        self._pending[username] = pending + 1
+
+    def end(self, username: str, success: bool) -> None:
+        '''Chiude un tentativo: un login riuscito azzera i fallimenti.'''
+        pending = self._pending.pop(username, 1) - 1
+        if pending:
+            self._pending[username] = pending
+        if success:
+            self._failures.pop(username, None)
+            return
+        failures = self._failures.get(username, (0, 0.0))[0] + 1
+        delay = min(2.0 ** (failures - self.free_attempts), self.max_delay) if failures >= self.free_attempts else 0
+        self._failures[username] = (failures, time.monotonic() + delay if delay else 0.0)
+        if len(self._failures) > 10000:
+            self._prune()
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        for username, (_, until) in list(self._failures.items()):
+            if until < now - self.max_delay:
+                del self._failures[username]
+
+
+class _ServerSession:
+    __slots__ = ("session", "expires", "active")
+
+    def __init__(self, session: AsyncSession, expires: float) -> None:
+        self.session = session
+        self.expires = expires
+        self.active = 0   # richieste in corso: una sessione occupata non scade
+
+
+class VaultServer:
+    def __init__(self, db: StorageEngine, kdf_params: Optional[dict] = None, cache_ttl: Optional[float] = None,
+                 workers: Optional[int] = None, session_ttl: float = 900, keep_alive: float = 75,
+                 request_timeout: float = 10) -> None:
+        '''
+        Costruttore della classe VaultServer.
+        Espone le operazioni del gestore delle password come API HTTP/JSON locale (asyncio), così
+        script e strumenti a riga di comando condividono un unico processo e un unico pool di connessioni.
+        Ogni login apre una sessione del gestore condiviso, associata a un token; KDF, cifratura e
+        query vengono eseguite sul pool di thread di AsyncPasswordManager, senza bloccare il ciclo
+        di eventi, e le richieste di una stessa sessione possono procedere in parallelo.
+        Su TCP vengono accettate solo richieste con Host locale e senza Origin di altri siti (contro
+        DNS rebinding e POST da pagine web); i login falliti ripetuti bloccano l'utente per un tempo crescente.
+
+        Parametri:
+        db (StorageEngine) -> motore di persistenza già aperto
+        kdf_params (dict | None) -> parametri KDF per i nuovi utenti
+        cache_ttl (float | None) -> durata della cache delle password decifrate per sessione
+        workers (int | None) -> thread del pool per KDF, cifratura e database (vedi AsyncPasswordManager)
+        session_ttl (float) -> secondi di inattività dopo cui una sessione scade
+        keep_alive (float) -> secondi di attesa di una nuova richiesta su una connessione aperta
+        request_timeout (float) -> secondi massimi per ricevere intestazioni e corpo di una richiesta
+        '''
+        self.db = db
+        self.session_ttl = session_ttl
+        self.keep_alive = keep_alive
+        self.request_timeout = request_timeout
+        # Valori accettati per l'intestazione Host (None su socket Unix: i browser non vi accedono)
+        self._hosts: Optional[set[str]] = None
+        self._logins = _LoginThrottle()
+        self._sessions: dict[str, _ServerSession] = {}
+        self._expiry: Optional[asyncio.Task] = None
+        self.manager = AsyncPasswordManager(PasswordManager(db, kdf_params, cache_ttl=cache_ttl), workers)
+        self._routes: list[tuple[str, str, Callable, bool]] = [
+            ("GET", "/health", self._health, False),
+            ("POST", "/register", self._register, False),
+            ("POST", "/login", self._login, False),
+            ("POST", "/logout", self._logout, True),
+            ("GET", "/services", self._list, True),
+            ("POST", "/services", self._add, True),
+            ("GET", "/search", self._search, True),
+            ("GET", "/services/", self._get, True),
+            ("PUT", "/services/", self._update, True),
+            ("DELETE", "/services/", self._delete, True),
+        ]
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8765,
+                    unix_path: Optional[str] = None) -> asyncio.AbstractServer:
+        '''
+        Avvia il server in ascolto su localhost oppure su un socket Unix.
+
+        Parametri:
+        host (str) -> indirizzo locale (solo loopback)
+        port (int) -> porta TCP
+        unix_path (str | None) -> percorso del socket Unix; se indicato host e porta vengono ignorati
+
+        Valore di ritorno:
+        asyncio.AbstractServer -> server in ascolto
+        '''
+        self._expiry = asyncio.get_running_loop().create_task(self._expire_sessions())
+        if unix_path:
+            # Solo l'utente che ha avviato il server può connettersi: il socket nasce già con
+            # permessi 0600, senza un intervallo in cui altri utenti possano aprirlo
+            umask = os.umask(0o077)
+            try:
+                server = await asyncio.start_unix_server(self._handle_connection, path=unix_path)
+            finally:
+                os.umask(umask)
+            os.chmod(unix_path, 0o600)
+            print(f"Server in ascolto su {unix_path}")
+            return server
+        if host not in LOCAL_HOSTS:
+            raise ValueError(f"Il server accetta solo indirizzi locali, non '{host}'")
+        server = await asyncio.start_server(self._handle_connection, host, port)
+        port = server.sockets[0].getsockname()[1]
+        self._hosts = {f"{name}:{port}" for name in ("127.0.0.1", "[::1]", "localhost")}
+        print(f"Server in ascolto su http://{host}:{port}")
+        return server
+
+    async def close(self) -> None:
+        '''
+        Chiude tutte le sessioni, il pool di thread e quello dei worker del gestore.
+
+        Valore di ritorno:
+        None
+        '''
+        if self._expiry is not None:
+            self._expiry.cancel()
+        for entry in self._sessions.values():
+            await entry.session.close()
+        self._sessions.clear()
+        await self.manager.close()
+        self.manager.manager.close()
+
+    async def _expire_sessions(self, interval: float = 60) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            for token, entry in list(self._sessions.items()):
+                if entry.expires < now and not entry.active:
+                    del self._sessions[token]
+                    await entry.session.close()
+
+    # ---------------- HTTP ----------------
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[_Request]:
+        '''
+        Legge una richiesta HTTP/1.1 dalla connessione.
+        Dopo la riga iniziale, intestazioni e corpo devono arrivare entro `request_timeout` secondi.
+
+        Valore di ritorno:
+        _Request -> richiesta letta
+        None -> se il client ha chiuso la connessione o è rimasto inattivo oltre il keep-alive
+        '''
+        try:
+            line = await asyncio.wait_for(reader.readline(), self.keep_alive)
+        except asyncio.TimeoutError:
+            return None
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise HTTPError(400, "Richiesta non valida")
+        try:
+            headers, body = await asyncio.wait_for(self._read_message(reader), self.request_timeout)
+        except asyncio.TimeoutError:
+            raise HTTPError(408, "Tempo scaduto durante la lettura della richiesta")
+        return _Request(method.upper(), target, version.upper(), headers, body)
+
+    async def _read_message(self, reader: asyncio.StreamReader) -> tuple[dict[str, str], bytes]:
+        headers: dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= MAX_HEADERS:
+                raise HTTPError(431, "Troppe intestazioni")
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise HTTPError(400, "Content-Length non valido")
+        if length > MAX_BODY:
+            raise HTTPError(413, "Corpo della richiesta troppo grande")
+        body = await reader.readexactly(length) if length > 0 else b""
+        return headers, body
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        '''
+        Serve le richieste di una connessione finché il client la mantiene aperta (keep-alive).
+        '''
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    keep_alive = request.keep_alive
+                    status, payload = await self._dispatch(request)
+                except HTTPError as e:
+                    status, payload = e.status, {"error": str(e)}
+                    if status == 408:
+                        keep_alive = False
+                except asyncio.IncompleteReadError:
+                    break
+                except Exception as e:
+                    print(f"Errore durante la gestione della richiesta: {e}")
+                    status, payload = 500, {"error": "Errore interno"}
+                body = json.dumps(payload).encode()
+                writer.write((f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                              "Content-Type: application/json\r\n"
+                              f"Content-Length: {len(body)}\r\n"
+                              f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode() + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    def _check_origin(self, request: _Request) -> None:
+        # Un nome a dominio che punta a 127.0.0.1 (DNS rebinding) arriva con un Host diverso;
+        # un browser invia sempre Origin, che deve essere il server stesso
+        if self._hosts is None:
+            return
+        if request.headers.get("host", "").lower() not in self._hosts:
+            raise HTTPError(403, "Host non consentito")
+        origin = request.headers.get("origin")
+        if origin is not None and urlsplit(origin).netloc.lower() not in self._hosts:
+            raise HTTPError(403, "Origin non consentita")
+
+    async def _dispatch(self, request: _Request) -> tuple[int, dict[str, Any]]:
+        self._check_origin(request)
+        allowed = False
+        for method, path, handler, authenticated in self._routes:
+            # I percorsi che terminano con "/" hanno il nome del servizio come ultimo segmento
+            if path.endswith("/"):
+                if not request.path.startswith(path) or len(request.path) == len(path):
+                    continue
+                args = (unquote(request.path[len(path):]),)
+            elif request.path == path:
+                args = ()
+            else:
+                continue
+            allowed = True
+            if method != request.method:
+                continue
+            if not authenticated:
+                return await handler(request, *args)
+            token, entry = self._session(request)
+            entry.active += 1
+            try:
+                return await handler(request, entry.session, *args, token=token)
+            finally:
+                entry.active -= 1
+                entry.expires = time.monotonic() + self.session_ttl
+        if allowed:
+            raise HTTPError(405, "Metodo non consentito")
+        raise HTTPError(404, "Risorsa non trovata")
+
+    def _session(self, request: _Request) -> tuple[str, _ServerSession]:
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        entry = self._sessions.get(token) if scheme.lower() == "bearer" else None
+        if entry is None or (entry.expires < time.monotonic() and not entry.active):
+            raise HTTPError(401, "Sessione non valida o scaduta")
+        return token, entry
+
+    # ---------------- API ----------------
+
+    async def _health(self, request: _Request) -> tuple[int, dict[str, Any]]:
+        return 200, {"status": "ok", "sessions": len(self._sessions)}
+
+    async def _register(self, request: _Request) -> tuple[int, dict[str, Any]]:
+        data = request.json()
+        username, password = request.field(data, "username"), request.field(data, "password")
+        if not await self.manager.register_user(username, password):
+            raise HTTPError(400, "Registrazione non riuscita")
+        return 201, {"username": username}
+
+    async def _login(self, request: _Request) -> tuple[int, dict[str, Any]]:
+        data = request.json()
+        username, password = request.field(data, "username"), request.field(data, "password")
+        self._logins.begin(username)
+        session = None
+        try:
+            session = await self.manager.open_session(username, password)
+        finally:
+            self._logins.end(username, session is not None)
+        if session is None:
+            raise HTTPError(401, "Credenziali non valide")
+        token = secrets.token_urlsafe(32)
+        self._sessions[token] = _ServerSession(session, time.monotonic() + self.session_ttl)
+        return 200, {"token": token, "expires_in": self.session_ttl}
+
+    async def _logout(self, request: _Request, session: AsyncSession, token: str) -> tuple[int, dict[str, Any]]:
+        self._sessions.pop(token, None)
+        await session.close()
+        return 200, {}
+
+    async def _list(self, request: _Request, session: AsyncSession, token: str) -> tuple[int, dict[str, Any]]:
+        try:
+            limit = min(max(int(request.query.get("limit", "200")), 1), 1000)
+        except ValueError:
+            raise HTTPError(400, "Parametro 'limit' non valido")
+        try:
+            page, next_token = await session.list_services_page(request.query.get("after"), limit)
+        except ValueError:
+            raise HTTPError(400, "Parametro 'after' non valido")
+        return 200, {"services": [{"id": service_id, "service": service} for service_id, service in page],
+                     "next": next_token}
+
+    async def _search(self, request: _Request, session: AsyncSession, token: str) -> tuple[int, dict[str, Any]]:
+        rows = await session.search_services(request.query.get("q", ""))
+        return 200, {"services": [{"id": service_id, "service": service} for service_id, service in rows]}
+
+    async def _get(self, request: _Request, session: AsyncSession, service: str,
+                   token: str) -> tuple[int, dict[str, Any]]:
+        password = await session.get_password(service)
+        if password is None:
+            raise HTTPError(404, f"Servizio '{service}' non trovato")
+        return 200, {"service": service, "password": password}
+
+    async def _add(self, request: _Request, session: AsyncSession, token: str) -> tuple[int, dict[str, Any]]:
+        data = request.json()
+        service, password = request.field(data, "service"), request.field(data, "password")
+        if not await session.add_password(service, password):
+            raise HTTPError(409, f"Impossibile salvare la password per '{service}'")
+        return 201, {"service": service}
+
+    async def _update(self, request: _Request, session: AsyncSession, service: str,
+                      token: str) -> tuple[int, dict[str, Any]]:
+        password = request.field(request.json(), "password")
+        if not await session.update_password(service, password):
+            raise HTTPError(404, f"Servizio '{service}' non trovato")
+        return 200, {"service": service}
+
+    async def _delete(self, request: _Request, session: AsyncSession, service: str,
+                      token: str) -> tuple[int, dict[str, Any]]:
+        if not await session.delete_password(service):
+            raise HTTPError(404, f"Servizio '{service}' non trovato")
+        return 200, {"service": service}
+
+
+async def serve(args: argparse.Namespace) -> None:
+    db = create_storage()
+    db.open()
+    kdf_params = None
+    if os.getenv("KDF_TARGET_MS"):
+        kdf_params = SecurityUtils.host_kdf_params(
+            db,
+            float(os.getenv("KDF_TARGET_MS")),
+            int(os.getenv("KDF_MAX_MEMORY_KIB", "65536")),
+            args.recalibrate_kdf,
+        )
+    cache_ttl = float(os.getenv("CACHE_TTL")) if os.getenv("CACHE_TTL") else None
+    vault = VaultServer(db, kdf_params, cache_ttl, args.workers, args.session_ttl, args.keep_alive)
+    try:
+        server = await vault.start(args.host, args.port, args.unix)
+        async with server:
+            await server.serve_forever()
+    finally:
+        await vault.close()
+        db.close()
+
+
+def main() -> int:
+    '''
+    Avvia il server HTTP/JSON locale del Password Manager.
+
+    - Apre la connessione al database (un solo pool condiviso da tutti i client)
+    - Ascolta su localhost oppure su un socket Unix
+    - Serve le richieste finché il processo non viene interrotto (Ctrl+C)
+
+    Valore di ritorno:
+    int -> codice di uscita del processo
+    '''
+    parser = argparse.ArgumentParser(description="Server HTTP/JSON locale del Password Manager")
+    parser.add_argument("--host", default="127.0.0.1", help="indirizzo locale (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="porta TCP (default: 8765)")
+    parser.add_argument("--unix", metavar="PATH", help="ascolta su un socket Unix invece che su TCP")
+    parser.add_argument("--workers", type=int, help="thread per KDF, cifratura e database (default: core, minimo 4)")
+    parser.add_argument("--session-ttl", type=float, default=900,
+                        help="secondi di inattività dopo cui una sessione scade (default: 900)")
+    parser.add_argument("--keep-alive", type=float, default=75,
+                        help="secondi di attesa su una connessione inattiva (default: 75)")
+    parser.add_argument("--recalibrate-kdf", action="store_true",
+                        help="con KDF_TARGET_MS, misura di nuovo la macchina invece di usare i parametri salvati")
+    args = parser.parse_args()
+    if args.unix is None and args.host not in LOCAL_HOSTS:
+        print(f"Il server accetta solo indirizzi locali, non '{args.host}'")
+        return 1
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
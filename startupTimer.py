@@ -0,0 +1,117 @@
+import re
+import sys
+import threading
+import time
+from typing import Optional
+
+# Moduli che non devono essere importati prima che la finestra di login sia disegnata:
+# vengono caricati in background insieme alla connessione al database
+DEFERRED_MODULES = ("cryptography", "argon2", "mysql", "passwordManager", "security", "storage", "connection")
+
+_IMPORT_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)")
+
+
+class StartupTimer:
+    def __init__(self, started: Optional[float] = None) -> None:
+        '''
+        Costruttore della classe StartupTimer.
+        Registra il tempo trascorso dall'avvio del processo fino alle fasi principali
+        (import, finestra disegnata, database pronto), anche da thread diversi.
+
+        Parametri:
+        started (float | None) -> istante di avvio secondo time.perf_counter (default: adesso)
+        '''
+        self.started = time.perf_counter() if started is None else started
+        self._phases: list[tuple[str, float, str]] = []
+        self._lock = threading.Lock()
+
+    def mark(self, phase: str) -> None:
+        '''
+        Registra il completamento di una fase.
+
+        Parametri:
+        phase (str) -> nome della fase
+
+        Valore di ritorno:
+        None
+        '''
+        elapsed = time.perf_counter() - self.started
+        with self._lock:
+            self._phases.append((phase, elapsed, threading.current_thread().name))
+
+    def report(self) -> list[dict]:
+        '''
+        Fasi registrate in ordine di completamento.
+
+        Valore di ritorno:
+        list[dict] -> phase, ms (dall'avvio) e thread per ogni fase
+        '''
+        with self._lock:
+            phases = sorted(self._phases, key=lambda phase: phase[1])
+        return [{"phase": phase, "ms": round(elapsed * 1000, 1), "thread": thread}
+                for phase, elapsed, thread in phases]
+
+    def print_report(self) -> None:
+        '''
+        Stampa il report di avvio.
+
+        Valore di ritorno:
+        None
+        '''
+        print("Tempi di avvio:")
+        for phase in self.report():
+            print(f"  {phase['phase']:<24} {phase['ms']:>9.1f} ms  ({phase['thread']})")
+
+
+def measure_imports(module: str = "main") -> tuple[float, dict[str, float]]:
+    '''
+    Importa un modulo in un interprete nuovo con `-X importtime` e ne misura il costo.
+    Misurare in un processo separato evita che i moduli già caricati falsino il risultato.
+
+    Parametri:
+    module (str) -> modulo da importare
+
+    Valore di ritorno:
+    tuple[float, dict[str, float]] -> millisecondi totali e tempo cumulativo (ms) di ogni pacchetto importato
+    '''
+    import subprocess
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, check=True)
+    packages: dict[str, float] = {}
+    total = 0.0
+    for line in result.stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match is None:
+            continue
+        cumulative, indent, name = int(match.group(2)) / 1000, len(match.group(3)), match.group(4)
+        if indent == 1:
+            # Import di primo livello: il tempo cumulativo include già i sotto-moduli
+            total += cumulative
+        package = name.split(".")[0]
+        packages[package] = max(packages.get(package, 0.0), cumulative)
+    return total, packages
+
+
+def check_import_budget(budget_ms: float, module: str = "main") -> bool:
+    '''
+    Verifica che l'import del modulo resti entro il budget e che non carichi
+    nessuno dei moduli da caricare in background (DEFERRED_MODULES).
+
+    Parametri:
+    budget_ms (float) -> tempo massimo di import in millisecondi
+    module (str) -> modulo da verificare
+
+    Valore di ritorno:
+    bool -> True se il budget è rispettato e nessun modulo differito è stato importato
+    '''
+    total, packages = measure_imports(module)
+    print(f"Import di '{module}': {total:.1f} ms (budget {budget_ms:.0f} ms)")
+    packages.pop(module, None)
+    for package, ms in sorted(packages.items(), key=lambda item: -item[1])[:10]:
+        print(f"  {package:<24} {ms:>9.1f} ms")
+    eager = [name for name in DEFERRED_MODULES if name in packages]
+    if eager:
+        print(f"Moduli importati prima della finestra di login: {', '.join(eager)}")
+    if total > budget_ms:
+        print("Budget di import superato")
+    return not eager and total <= budget_ms
@@ -0,0 +1,533 @@
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Optional, Any, Iterator
+from dotenv import load_dotenv
+from queryStats import QueryStats
+
+
+class Transaction:
+    def __init__(self, cursor, translate=None, stats: Optional[QueryStats] = None) -> None:
+        '''
+        Costruttore della classe Transaction.
+        Raccoglie le istruzioni eseguite dentro `StorageEngine.transaction()`: vengono confermate
+        tutte insieme all'uscita dal blocco, oppure annullate se si verifica un errore.
+
+        Parametri:
+        cursor -> cursore DB-API della connessione riservata alla transazione
+        translate -> funzione che adatta i segnaposto `%s` al driver (None se non serve)
+        stats (QueryStats | None) -> statistiche in cui registrare le istruzioni eseguite
+        '''
+        self.cursor = cursor
+        self.translate = translate or (lambda query: query)
+        self.stats = stats or QueryStats()
+
+    def execute(self, query: str, params: Optional[tuple[Any, ...]] = None) -> int:
+        '''
+        Esegue un'istruzione di scrittura nella transazione.
+
+        Parametri:
+        query (str) -> stringa contenente l'istruzione SQL (segnaposto `%s`)
+        params (tuple[Any, ...] | None) -> parametri opzionali per l'istruzione
+
+        Valore di ritorno:
+        int -> numero di righe modificate
+        '''
+        with self.stats.measure(query) as sample:
+            self.cursor.execute(self.translate(query), params or ())
+            sample.rows = self.cursor.rowcount
+        return self.cursor.rowcount
+
+    def execute_many(self, query: str, rows: list[tuple[Any, ...]]) -> int:
+        '''
+        Esegue la stessa istruzione per più righe di parametri (executemany).
+
+        Parametri:
+        query (str) -> stringa contenente l'istruzione SQL (segnaposto `%s`)
+        rows (list[tuple[Any, ...]]) -> parametri, una tupla per riga
+
+        Valore di ritorno:
+        int -> numero totale di righe modificate
+        '''
+        if not rows:
+            return 0
+        with self.stats.measure(query) as sample:
+            self.cursor.executemany(self.translate(query), rows)
+            sample.rows = self.cursor.rowcount
+        return self.cursor.rowcount
+
+    def query(self, query: str, params: Optional[tuple[Any, ...]] = None) -> list[tuple[Any, ...]]:
+        '''
+        Esegue una query di lettura nella transazione.
+
+        Parametri:
+        query (str) -> stringa contenente la query SQL (segnaposto `%s`)
+        params (tuple[Any, ...] | None) -> parametri opzionali per la query
+
+        Valore di ritorno:
+        list[tuple[Any, ...]] -> risultati della query
+        '''
+        with self.stats.measure(query) as sample:
+            self.cursor.execute(self.translate(query), params or ())
+            result = self.cursor.fetchall()
+            sample.rows = len(result)
+        return result
+
+
+class StorageEngine(ABC):
+    '''
+    Interfaccia comune dei motori di persistenza usati da PasswordManager.
+    Le query vengono scritte con i segnaposto `%s`; ogni motore li adatta al proprio driver.
+    Ogni istruzione eseguita viene misurata in `query_stats` (vedi QueryStats).
+    '''
+    dialect: str = ""
+    query_stats: QueryStats
+    # Espressione SQL dell'istante corrente, nello stesso formato di user_credentials.updated_at
+    timestamp_sql: str = ""
+
+    @abstractmethod
+    def open(self) -> None:
+        '''
+        Prepara il motore all'uso (connessioni, schema).
+
+        Valore di ritorno:
+        None
+        '''
+
+    @abstractmethod
+    def is_open(self) -> bool:
+        '''
+        Controlla se `open` è riuscita e il motore è pronto all'uso.
+
+        Valore di ritorno:
+        bool -> True se il motore è aperto
+        '''
+
+    @abstractmethod
+    def execute_query(self, query: str, params: Optional[tuple[Any, ...]] = None) -> Optional[list[tuple[Any, ...]]]:
+        '''
+        Esegue una query di lettura.
+
+        Parametri:
+        query (str) -> stringa contenente la query SQL
+        params (tuple[Any, ...] | None) -> parametri opzionali per la query
+
+        Valore di ritorno:
+        list[tuple[Any, ...]] -> risultati della query
+        None -> se la connessione non è attiva o si verifica un errore
+        '''
+
+    @abstractmethod
+    def execute_write(self, query: str, params: Optional[tuple[Any, ...]] = None) -> int:
+        '''
+        Esegue un'istruzione di scrittura propagando eventuali errori al chiamante.
+
+        Parametri:
+        query (str) -> stringa contenente l'istruzione SQL
+        params (tuple[Any, ...] | None) -> parametri opzionali per l'istruzione
+
+        Valore di ritorno:
+        int -> numero di righe modificate
+        '''
+
+    @abstractmethod
+    def execute_insert(self, query: str, params: Optional[tuple[Any, ...]] = None) -> int:
+        '''
+        Esegue una INSERT propagando eventuali errori al chiamante.
+
+        Parametri:
+        query (str) -> stringa contenente l'istruzione SQL
+        params (tuple[Any, ...] | None) -> parametri opzionali per l'istruzione
+
+        Valore di ritorno:
+        int -> id generato per la riga inserita
+        '''
+
+    @abstractmethod
+    def transaction(self):
+        '''
+        Context manager che apre una transazione su una connessione riservata.
+        Le istruzioni vengono confermate all'uscita dal blocco, annullate in caso di errore.
+        Gli errori vengono propagati al chiamante.
+
+        Valore di ritorno:
+        Transaction -> oggetto per eseguire le istruzioni della transazione
+        '''
+
+    def execute_many(self, query: str, rows: list[tuple[Any, ...]]) -> int:
+        '''
+        Esegue la stessa istruzione per più righe in un'unica transazione (executemany).
+        Gli errori vengono propagati al chiamante e nessuna riga viene scritta.
+
+        Parametri:
+        query (str) -> stringa contenente l'istruzione SQL
+        rows (list[tuple[Any, ...]]) -> parametri, una tupla per riga
+
+        Valore di ritorno:
+        int -> numero totale di righe modificate
+        '''
+        with self.transaction() as tx:
+            return tx.execute_many(query, rows)
+
+    @abstractmethod
+    def is_duplicate_error(self, error: Exception) -> bool:
+        '''
+        Controlla se un errore è una violazione di un vincolo univoco.
+
+        Parametri:
+        error (Exception) -> eccezione sollevata da `execute_write` o `execute_insert`
+
+        Valore di ritorno:
+        bool -> True se la riga esiste già
+        '''
+
+    @abstractmethod
+    def is_schema_exists_error(self, error: Exception) -> bool:
+        '''
+        Controlla se un'istruzione DDL è fallita perché la modifica è già presente
+        (tabella, colonna o indice già esistente, indice già eliminato).
+
+        Parametri:
+        error (Exception) -> eccezione sollevata da `execute_write`
+
+        Valore di ritorno:
+        bool -> True se l'istruzione era già stata applicata
+        '''
+
+    @abstractmethod
+    def upsert_query(self, table: str, columns: tuple[str, ...], keys: tuple[str, ...],
+                     updates: tuple[str, ...] = (), stamp: Optional[str] = None) -> str:
+        '''
+        Costruisce una INSERT che in caso di chiave duplicata aggiorna la riga esistente
+        (o la lascia invariata se `updates` è vuoto), in un solo round trip.
+
+        Parametri:
+        table (str) -> nome della tabella
+        columns (tuple[str, ...]) -> colonne inserite, nell'ordine dei parametri
+        keys (tuple[str, ...]) -> colonne dell'indice univoco
+        updates (tuple[str, ...]) -> colonne da aggiornare se la riga esiste già
+        stamp (str | None) -> colonna impostata all'istante corrente quando la riga esistente viene aggiornata
+
+        Valore di ritorno:
+        str -> istruzione SQL con segnaposto `%s`
+        '''
+
+    def current_timestamp(self) -> str:
+        '''
+        Legge l'istante corrente dall'orologio del database, confrontabile con `updated_at`.
+        Gli errori vengono propagati al chiamante.
+
+        Valore di ritorno:
+        str -> istante corrente
+        '''
+        result = self.execute_query(f"SELECT {self.timestamp_sql}")
+        if not result:
+            raise RuntimeError("Impossibile leggere l'ora del database")
+        return str(result[0][0])
+
+    def ensure_schema(self) -> None:
+        '''
+        Porta lo schema del database all'ultima versione applicando le migrazioni mancanti.
+
+        Valore di ritorno:
+        None
+        '''
+        from migrations import migrate
+        migrate(self)
+
+    @abstractmethod
+    def close(self) -> None:
+        '''
+        Rilascia tutte le risorse del motore.
+
+        Valore di ritorno:
+        None
+        '''
+
+
+@lru_cache(maxsize=512)
+def _to_qmark(query: str) -> str:
+    # Le query del progetto non contengono '%s' letterali: i pattern LIKE passano come parametri
+    return query.replace("%s", "?")
+
+
+class SQLiteStorage(StorageEngine):
+    dialect = "sqlite"
+    timestamp_sql = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+    def is_duplicate_error(self, error: Exception) -> bool:
+        return isinstance(error, sqlite3.IntegrityError) and "UNIQUE" in str(error)
+
+    def is_schema_exists_error(self, error: Exception) -> bool:
+        message = str(error)
+        return isinstance(error, sqlite3.OperationalError) and (
+            "duplicate column name" in message or "already exists" in message)
+
+    def upsert_query(self, table: str, columns: tuple[str, ...], keys: tuple[str, ...],
+                     updates: tuple[str, ...] = (), stamp: Optional[str] = None) -> str:
+        placeholders = ", ".join(["%s"] * len(columns))
+        query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders}) ON CONFLICT ({', '.join(keys)}) DO "
+        if not updates:
+            return query + "NOTHING"
+        assignments = [f"{column} = excluded.{column}" for column in updates]
+        if stamp:
+            assignments.append(f"{stamp} = {self.timestamp_sql}")
+        return query + "UPDATE SET " + ", ".join(assignments)
+
+    PRAGMAS = (
+        "PRAGMA synchronous = NORMAL",
+        "PRAGMA foreign_keys = ON",
+        "PRAGMA temp_store = MEMORY",
+        "PRAGMA cache_size = -16000",
+        "PRAGMA mmap_size = 268435456",
+    )
+
+    def __init__(self, path: str = None, busy_timeout: float = 5.0, cached_statements: int = 256) -> None:
+        '''
+        Costruttore della classe SQLiteStorage.
+        Ogni thread usa una propria connessione verso lo stesso file; un database in memoria
+        usa invece una sola connessione condivisa.
+
+        Parametri:
+        path (str) -> percorso del file SQLite, oppure ":memory:" (SQLITE_PATH, default "passwordManager.db")
+        busy_timeout (float) -> secondi di attesa quando un altro writer tiene il lock
+        cached_statements (int) -> numero di prepared statement mantenuti in cache per connessione
+        '''
+        load_dotenv()
+        self.path = path or os.getenv("SQLITE_PATH", "passwordManager.db")
+        self.busy_timeout = busy_timeout
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        # Connessioni aperte con il thread che le usa, e numero di blocchi `connection()` in corso per
+        # ognuna: una connessione in uso non viene mai chiusa da un altro thread
+        self._connections: dict[sqlite3.Connection, Optional[threading.Thread]] = {}
+        self._busy: dict[sqlite3.Connection, int] = {}
+        self._lock = threading.Lock()
+        self._opened = False
+        # Un database in memoria esiste solo dentro la sua connessione: i thread la condividono a turno
+        self._shared: Optional[sqlite3.Connection] = None
+        self._shared_lock = threading.RLock()
+        self.query_stats = QueryStats.from_env()
+
+    def _connect(self) -> sqlite3.Connection:
+        '''
+        Apre una connessione SQLite configurata con i pragma del progetto.
+        La connessione lavora in autocommit, come quelle MySQL.
+        Le connessioni dei thread terminati vengono chiuse.
+
+        Valore di ritorno:
+        sqlite3.Connection -> nuova connessione
+        '''
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        for pragma in self.PRAGMAS:
+            conn.execute(pragma)
+        owner = None if self.path == ":memory:" else threading.current_thread()
+        with self._lock:
+            self._connections[conn] = owner
+            orphans = [other for other, thread in self._connections.items()
+                       if thread is not None and not thread.is_alive() and other not in self._busy]
+            for other in orphans:
+                del self._connections[other]
+        for other in orphans:
+            other.close()
+        return conn
+
+    def _conn(self) -> sqlite3.Connection:
+        if not self._opened:
+            raise sqlite3.OperationalError("Connection is not active.")
+        if self.path == ":memory:":
+            if self._shared is None:
+                self._shared = self._connect()
+            return self._shared
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    def open(self) -> None:
+        '''
+        Apre il database, attiva il journal WAL e applica le migrazioni mancanti.
+
+        Valore di ritorno:
+        None
+        '''
+        try:
+            self._opened = True
+            with self.connection() as conn:
+                if self.path != ":memory:":
+                    conn.execute("PRAGMA journal_mode = WAL")
+            self.ensure_schema()
+            print("Connection established successfully!")
+        except sqlite3.Error as e:
+            self._opened = False
+            print("Connection error:", e)
+
+    def is_open(self) -> bool:
+        '''
+        Controlla se il database è stato aperto.
+
+        Valore di ritorno:
+        bool -> True se il database è aperto
+        '''
+        return self._opened
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        '''
+        Context manager che presta al chiamante la connessione del thread corrente.
+        Con un database in memoria la connessione unica resta riservata fino all'uscita dal blocco.
+
+        Valore di ritorno:
+        sqlite3.Connection
+        '''
+        if self.path == ":memory:":
+            with self._shared_lock:
+                with self._borrow() as conn:
+                    yield conn
+        else:
+            with self._borrow() as conn:
+                yield conn
+
+    @contextmanager
+    def _borrow(self) -> Iterator[sqlite3.Connection]:
+        # Segna la connessione come in uso; se nel frattempo `close` l'ha rilasciata, la chiude all'uscita
+        conn = self._conn()
+        with self._lock:
+            if conn not in self._connections:
+                raise sqlite3.OperationalError("Connection is not active.")
+            self._busy[conn] = self._busy.get(conn, 0) + 1
+        try:
+            yield conn
+        finally:
+            with self._lock:
+                count = self._busy.pop(conn) - 1
+                if count:
+                    self._busy[conn] = count
+                release = not count and conn not in self._connections
+            if release:
+                conn.close()
+
+    def execute_query(self, query: str, params: Optional[tuple[Any, ...]] = None) -> Optional[list[tuple[Any, ...]]]:
+        '''
+        Esegue una query SQL sul database.
+
+        Parametri:
+        query (str) -> stringa contenente la query SQL (segnaposto `%s`)
+        params (tuple[Any, ...] | None) -> parametri opzionali per la query
+
+        Valore di ritorno:
+        list[tuple[Any, ...]] -> risultati della query
+        None -> se la connessione non è attiva o si verifica un errore
+        '''
+        try:
+            with self.connection() as conn, self.query_stats.measure(query) as sample:
+                result = conn.execute(_to_qmark(query), params or ()).fetchall()
+                sample.rows = len(result)
+                return result
+        except sqlite3.Error as e:
+            print("Error while executing query:", e)
+            return None
+
+    def execute_write(self, query: str, params: Optional[tuple[Any, ...]] = None) -> int:
+        '''
+        Esegue un'istruzione di scrittura (INSERT, UPDATE, DELETE) sul database.
+        Gli errori vengono propagati al chiamante.
+
+        Parametri:
+        query (str) -> stringa contenente l'istruzione SQL (segnaposto `%s`)
+        params (tuple[Any, ...] | None) -> parametri opzionali per l'istruzione
+
+        Valore di ritorno:
+        int -> numero di righe modificate
+        '''
+        with self.connection() as conn, self.query_stats.measure(query) as sample:
+            sample.rows = conn.execute(_to_qmark(query), params or ()).rowcount
+            return sample.rows
+
+    def execute_insert(self, query: str, params: Optional[tuple[Any, ...]] = None) -> int:
+        '''
+        Esegue una INSERT sul database e restituisce l'id generato.
+        Gli errori vengono propagati al chiamante.
+
+        Parametri:
+        query (str) -> stringa contenente l'istruzione SQL (segnaposto `%s`)
+        params (tuple[Any, ...] | None) -> parametri opzionali per l'istruzione
+
+        Valore di ritorno:
+        int -> id della riga inserita
+        '''
+        with self.connection() as conn, self.query_stats.measure(query) as sample:
+            sample.rows = 1
+            return conn.execute(_to_qmark(query), params or ()).lastrowid
+
+    @contextmanager
+    def transaction(self) -> Iterator[Transaction]:
+        '''
+        Context manager che apre una transazione sulla connessione del thread corrente.
+        Usa BEGIN IMMEDIATE: il lock di scrittura viene preso subito, evitando deadlock
+        tra transazioni che leggono e poi scrivono.
+
+        Valore di ritorno:
+        Transaction -> oggetto per eseguire le istruzioni della transazione
+        '''
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                yield Transaction(cursor, _to_qmark, self.query_stats)
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            else:
+                cursor.execute("COMMIT")
+            finally:
+                cursor.close()
+
+    def close(self) -> None:
+        '''
+        Chiude tutte le connessioni aperte dai vari thread. Quelle in uso in quel momento
+        vengono chiuse dal loro thread al termine dell'operazione in corso.
+
+        Valore di ritorno:
+        None
+        '''
+        with self._lock:
+            connections, self._connections = self._connections, {}
+            idle = [conn for conn in connections if conn not in self._busy]
+        for conn in idle:
+            conn.close()
+        self._local = threading.local()
+        self._shared = None
+        if self._opened:
+            self._opened = False
+            print("Connection closed.")
+
+
+def create_storage(engine: str = None) -> StorageEngine:
+    '''
+    Crea il motore di persistenza scelto da configurazione.
+
+    Parametri:
+    engine (str) -> "mysql" oppure "sqlite" (DB_ENGINE, default "mysql")
+
+    Valore di ritorno:
+    StorageEngine -> motore non ancora aperto
+    '''
+    load_dotenv()
+    engine = (engine or os.getenv("DB_ENGINE", "mysql")).lower()
+    if engine == "sqlite":
+        return SQLiteStorage()
+    if engine == "mysql":
+        from connection import DatabaseConnection
+        return DatabaseConnection()
+    raise ValueError(f"Motore di database non supportato: {engine}")
@@ -0,0 +1,13 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_main_import_budget():
+    # Stesso budget documentato nel README: crittografia e database non devono essere
+    # importati prima della finestra di login
+    result = subprocess.run([sys.executable, "main.py", "--check-import-budget", "300"],
+                            cwd=ROOT, capture_output=True, text=True)
+    assert result.returncode == 0, result.stdout + result.stderr
@@ -0,0 +1,105 @@
+import base64
+import json
+import os
+import struct
+import zlib
+from typing import Callable, Iterable, Iterator
+from cryptography.fernet import Fernet
+
+# Formato dell'archivio:
+#   MAGIC | lunghezza header (4 byte) | header JSON in chiaro
+#   blocchi: lunghezza (4 byte) | token Fernet in binario di JSON compresso con zlib
+#   blocco di lunghezza 0 come terminatore
+MAGIC = b"PMVAULT1"
+_LENGTH = struct.Struct(">I")
+
+
+class VaultArchiveError(Exception):
+    '''
+    Archivio non valido, troncato o cifrato con una chiave diversa.
+    '''
+
+
+def write_archive(path: str, cipher: Fernet, header: dict, chunks: Iterable[list[list[str]]]) -> int:
+    '''
+    Scrive un archivio cifrato un blocco alla volta, senza tenere in memoria l'intero vault.
+    Il file viene scritto accanto alla destinazione e rinominato solo a scrittura completata.
+
+    Parametri:
+    path (str) -> percorso del file da creare
+    cipher (Fernet) -> chiave con cui cifrare i blocchi
+    header (dict) -> metadati in chiaro (parametri KDF, snapshot)
+    chunks (Iterable[list[list[str]]]) -> blocchi di righe [servizio, password]
+
+    Valore di ritorno:
+    int -> numero di righe scritte
+    '''
+    count = 0
+    partial = path + ".part"
+    try:
+        with open(partial, "wb") as f:
+            encoded = json.dumps(header).encode()
+            f.write(MAGIC + _LENGTH.pack(len(encoded)) + encoded)
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                compressed = zlib.compress(json.dumps(chunk, separators=(",", ":")).encode())
+                # Il token Fernet è base64: in binario occupa un terzo in meno
+                token = base64.urlsafe_b64decode(cipher.encrypt(compressed))
+                f.write(_LENGTH.pack(len(token)) + token)
+                count += len(chunk)
+            f.write(_LENGTH.pack(0))
+        os.replace(partial, path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    return count
+
+
+def read_header(f) -> dict:
+    '''
+    Legge l'intestazione di un archivio aperto in modalità binaria.
+
+    Parametri:
+    f -> file aperto in lettura binaria, posizionato all'inizio
+
+    Valore di ritorno:
+    dict -> metadati in chiaro dell'archivio
+    '''
+    if f.read(len(MAGIC)) != MAGIC:
+        raise VaultArchiveError("Il file non è un archivio del Password Manager")
+    (length,) = _LENGTH.unpack(_read_exact(f, _LENGTH.size))
+    return json.loads(_read_exact(f, length))
+
+
+def _read_exact(f, size: int) -> bytes:
+    data = f.read(size)
+    if len(data) != size:
+        raise VaultArchiveError("Archivio troncato")
+    return data
+
+
+def read_archive(path: str, cipher_for: Callable[[dict], Fernet]) -> Iterator[list[list[str]]]:
+    '''
+    Legge un archivio cifrato un blocco alla volta.
+
+    Parametri:
+    path (str) -> percorso dell'archivio
+    cipher_for -> funzione (header) -> Fernet che restituisce la chiave per decifrare i blocchi
+
+    Valore di ritorno:
+    Iterator[list[list[str]]] -> blocchi di righe [servizio, password]
+    '''
+    with open(path, "rb") as f:
+        cipher = cipher_for(read_header(f))
+        while True:
+            (length,) = _LENGTH.unpack(_read_exact(f, _LENGTH.size))
+            if length == 0:
+                return
+            token = base64.urlsafe_b64encode(_read_exact(f, length))
+            try:
+                compressed = cipher.decrypt(token)
+            except Exception as e:
+                raise VaultArchiveError("Chiave errata o archivio danneggiato") from e
+            yield json.loads(zlib.decompress(compressed))
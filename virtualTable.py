@@ -0,0 +1,289 @@
+import tkinter as tk
+import tkinter.ttk as ttk
+from typing import Optional
+
+
+class VirtualTable:
+    MASK = "*****"
+
+    def __init__(self, parent, columns: tuple[str, str] = ("Servizio", "Password"), row_height: int = 25) -> None:
+        '''
+        Costruttore della classe VirtualTable.
+        Tabella dei servizi che disegna solo le righe visibili: il Treeview contiene un numero
+        fisso di righe "slot" e lo scorrimento cambia soltanto i valori degli slot.
+        Le modifiche (inserimento, rimozione, password mostrata) aggiornano il modello in memoria
+        e ridisegnano al più le righe visibili, indipendentemente dalla dimensione del vault.
+
+        Parametri:
+        parent -> widget contenitore
+        columns (tuple[str, str]) -> intestazioni delle colonne (servizio, password)
+        row_height (int) -> altezza in pixel di una riga, come nello stile del Treeview
+        '''
+        self.frame = tk.Frame(parent, background="black")
+        self.tree = ttk.Treeview(self.frame, columns=columns, show="headings", selectmode="browse")
+        for column in columns:
+            self.tree.heading(column, text=column)
+        self.scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        self.row_height = row_height
+        self.services: list[str] = []          # modello: nomi dei servizi nell'ordine ricevuto
+        self.known: set[str] = set()           # nomi presenti nel modello
+        self.revealed: dict[str, str] = {}     # password mostrate in chiaro, per servizio
+        self.offset = 0                        # indice della prima riga visibile
+        self.visible = 1                       # numero di righe visibili
+        self.slots: list[str] = []             # iid degli slot del Treeview
+        self.slot_values: list[Optional[tuple[str, str]]] = []
+        self.detached: set[str] = set()        # slot oltre la fine del modello, staccati dal Treeview
+        self.selected: Optional[str] = None    # servizio selezionato (indipendente dallo slot)
+        self.on_scroll_end = None              # funzione chiamata quando la vista si avvicina alla fine
+
+        self.tree.bind("<Configure>", self._on_configure)
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree.bind("<MouseWheel>", self._on_wheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(3))
+        self.tree.bind("<Up>", lambda e: self._move_selection(-1))
+        self.tree.bind("<Down>", lambda e: self._move_selection(1))
+
+    def pack(self, **kwargs) -> None:
+        self.frame.pack(**kwargs)
+
+    # ---------------- Modello ----------------
+
+    def set_rows(self, services: list[tuple[int, str]]) -> None:
+        '''
+        Sostituisce il contenuto della tabella.
+        L'ordine ricevuto viene mantenuto: riordinare in Python (con confronto tra maiuscole e
+        minuscole) darebbe un ordine diverso dall'ORDER BY del database, la cui collation in MySQL
+        non distingue maiuscole e minuscole, e le pagine caricate dopo finirebbero sopra la vista.
+
+        Parametri:
+        services (list[tuple[int, str]]) -> coppie (id, nome servizio)
+
+        Valore di ritorno:
+        None
+        '''
+        self.services = [name for _, name in services]
+        self.known = set(self.services)
+        self.revealed.clear()
+        self.offset = 0
+        if self.selected is not None and self._index_of(self.selected) is None:
+            self.selected = None
+        self.render()
+
+    def append_rows(self, services: list[tuple[int, str]]) -> None:
+        '''
+        Aggiunge in fondo una pagina di servizi caricata in un secondo momento, nell'ordine ricevuto.
+        I servizi già presenti (ad esempio appena aggiunti dall'utente) vengono ignorati.
+
+        Parametri:
+        services (list[tuple[int, str]]) -> coppie (id, nome servizio)
+
+        Valore di ritorno:
+        None
+        '''
+        for _, name in services:
+            if name not in self.known:
+                self.services.append(name)
+                self.known.add(name)
+        self.render()
+
+    def _index_of(self, service: str) -> Optional[int]:
+        if service not in self.known:
+            return None
+        return self.services.index(service)
+
+    def insert_row(self, service: str) -> None:
+        '''
+        Inserisce un servizio prima del primo nome che lo segue senza distinzione tra
+        maiuscole e minuscole, come nell'ordine del database.
+
+        Parametri:
+        service (str) -> nome del servizio
+
+        Valore di ritorno:
+        None
+        '''
+        if service in self.known:
+            return
+        folded = service.casefold()
+        i = next((i for i, name in enumerate(self.services) if name.casefold() > folded), len(self.services))
+        self.services.insert(i, service)
+        self.known.add(service)
+        if i < self.offset:
+            # La riga è sopra la finestra: si sposta la finestra per non far "saltare" la vista
+            self.offset += 1
+        self.render()
+
+    def remove_row(self, service: str) -> None:
+        '''
+        Rimuove un servizio dalla tabella.
+
+        Parametri:
+        service (str) -> nome del servizio
+
+        Valore di ritorno:
+        None
+        '''
+        i = self._index_of(service)
+        if i is None:
+            return
+        del self.services[i]
+        self.known.discard(service)
+        self.revealed.pop(service, None)
+        if self.selected == service:
+            self.selected = None
+        if i < self.offset:
+            self.offset -= 1
+        self.render()
+
+    def reveal(self, service: str, password: str) -> None:
+        '''
+        Mostra in chiaro la password di un servizio.
+
+        Parametri:
+        service (str) -> nome del servizio
+        password (str) -> password in chiaro
+
+        Valore di ritorno:
+        None
+        '''
+        self.revealed[service] = password
+        self.render()
+
+    def conceal(self, service: str) -> None:
+        '''
+        Torna a nascondere la password di un servizio.
+
+        Parametri:
+        service (str) -> nome del servizio
+
+        Valore di ritorno:
+        None
+        '''
+        if self.revealed.pop(service, None) is not None:
+            self.render()
+
+    def selected_service(self) -> Optional[str]:
+        '''
+        Restituisce il servizio selezionato.
+
+        Valore di ritorno:
+        str -> nome del servizio selezionato
+        None -> se nessun servizio è selezionato
+        '''
+        return self.selected
+
+    # ---------------- Vista ----------------
+
+    def _ensure_slots(self) -> None:
+        while len(self.slots) < self.visible:
+            # Uno slot nuovo nasce staccato: viene mostrato solo quando riceve una riga
+            iid = self.tree.insert("", "end", values=("", ""))
+            self.tree.detach(iid)
+            self.detached.add(iid)
+            self.slots.append(iid)
+            self.slot_values.append(None)
+        while len(self.slots) > self.visible:
+            iid = self.slots.pop()
+            self.detached.discard(iid)
+            self.tree.delete(iid)
+            self.slot_values.pop()
+
+    def render(self) -> None:
+        '''
+        Allinea gli slot visibili al modello, toccando solo quelli il cui contenuto è cambiato.
+
+        Valore di ritorno:
+        None
+        '''
+        total = len(self.services)
+        self.offset = max(0, min(self.offset, total - self.visible))
+        self._ensure_slots()
+        selected_slot = None
+        for slot, iid in enumerate(self.slots):
+            index = self.offset + slot
+            if index < total:
+                service = self.services[index]
+                values = (service, self.revealed.get(service, self.MASK))
+                if service == self.selected:
+                    selected_slot = iid
+            else:
+                values = None
+            if values != self.slot_values[slot]:
+                self.slot_values[slot] = values
+                if values is None:
+                    self.tree.detach(iid)
+                    self.detached.add(iid)
+                else:
+                    if iid in self.detached:
+                        # Gli slot staccati sono sempre in coda: si riattaccano nella loro posizione
+                        self.tree.move(iid, "", slot)
+                        self.detached.discard(iid)
+                    self.tree.item(iid, values=values)
+        current = self.tree.selection()
+        if selected_slot is None:
+            if current:
+                self.tree.selection_remove(*current)
+        elif tuple(current) != (selected_slot,):
+            self.tree.selection_set(selected_slot)
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.visible) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        if self.on_scroll_end is not None and self.offset + 2 * self.visible >= total:
+            self.on_scroll_end()
+
+    def scroll(self, rows: int) -> None:
+        '''
+        Scorre la finestra visibile di un certo numero di righe.
+
+        Parametri:
+        rows (int) -> righe di cui scorrere (negativo verso l'alto)
+
+        Valore di ritorno:
+        None
+        '''
+        self.offset += rows
+        self.render()
+
+    def _on_configure(self, event) -> None:
+        # La prima riga dell'area è occupata dalle intestazioni
+        visible = max(1, event.height // self.row_height - 1)
+        if visible != self.visible:
+            self.visible = visible
+            self.render()
+
+    def _on_scrollbar(self, action: str, *args) -> None:
+        if action == "moveto":
+            self.offset = int(float(args[0]) * len(self.services))
+        elif action == "scroll":
+            amount, unit = int(args[0]), args[1]
+            self.offset += amount * (self.visible if unit == "pages" else 1)
+        self.render()
+
+    def _on_wheel(self, event) -> None:
+        self.scroll(-3 if event.delta > 0 else 3)
+
+    def _on_select(self, event) -> None:
+        selection = self.tree.selection()
+        if not selection:
+            return
+        slot = self.slots.index(selection[0]) if selection[0] in self.slots else None
+        if slot is not None and self.slot_values[slot] is not None:
+            self.selected = self.slot_values[slot][0]
+
+    def _move_selection(self, step: int) -> str:
+        if not self.services:
+            return "break"
+        index = self._index_of(self.selected) if self.selected is not None else None
+        index = 0 if index is None else max(0, min(len(self.services) - 1, index + step))
+        self.selected = self.services[index]
+        if index < self.offset:
+            self.offset = index
+        elif index >= self.offset + self.visible:
+            self.offset = index - self.visible + 1
+        self.render()
+        return "break"